@@ -4,7 +4,7 @@
 """
 import uuid
 from decimal import Decimal
-from django.db import models
+from django.db import connections, models, router, transaction as db_transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.conf import settings
@@ -67,6 +67,55 @@ class BaseDocument(models.Model):
         if self.is_deleted and self.is_posted:
             self.is_posted = False
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения полей на момент загрузки - для проверки изменений при сохранении (см. has_changed)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changed(self, field_names):
+        """
+        Изменилось ли хотя бы одно из полей (attname) с момента загрузки из БД или последнего сохранения.
+        Для нового документа и для полей, не загруженных из БД, считается, что изменилось.
+        """
+        loaded_values = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded_values is None:
+            return True
+        return any(
+            field_name not in loaded_values or getattr(self, field_name) != loaded_values[field_name]
+            for field_name in field_names
+        )
+
+    def get_cash_balance(self, cash_register_field, currency_field):
+        """
+        Остаток кассы документа в валюте документа на дату документа (для проверок в clean()).
+        Запоминается на экземпляре: проверка формы (full_clean) и повторная проверка при save()
+        считают остаток один раз. Сбрасывается после сохранения и в refresh_from_db().
+        """
+        cache = self.__dict__.setdefault('_cash_balance_cache', {})
+        key = (getattr(self, f'{cash_register_field}_id'), getattr(self, f'{currency_field}_id'), self.date)
+        if key not in cache:
+            cache[key] = getattr(self, cash_register_field).get_balance(getattr(self, currency_field), self.date)
+        return cache[key]
+
+    def lock_for_posting(self, model, pk):
+        """
+        Заблокировать строку (касса, выдача подотчета) до конца транзакции сохранения документа:
+        параллельные сохранения документов по той же строке проверяют остатки по очереди.
+        Остаток кассы, посчитанный до блокировки (при проверке формы), будет пересчитан.
+        """
+        if pk is None:
+            return
+        db = router.db_for_write(model, instance=self)
+        list(model.objects.using(db).select_for_update().filter(pk=pk).values_list('pk', flat=True))
+        if connections[db].features.has_select_for_update:
+            self.__dict__.pop('_cash_balance_cache', None)
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop('_cash_balance_cache', None)
+        super().refresh_from_db(*args, **kwargs)
+
     def save(self, *args, **kwargs):
         """Сохранение документа с автоматической генерацией номера и даты"""
         # Устанавливаем дату на текущий момент, если она не указана
@@ -85,6 +134,9 @@ class BaseDocument(models.Model):
         self.full_clean()
         
         super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+        # Документ записан - остатки касс изменились
+        self.__dict__.pop('_cash_balance_cache', None)
 
     def generate_document_number(self):
         """
@@ -130,6 +182,127 @@ class BaseDocument(models.Model):
         
         return number_str
 
+    @classmethod
+    def fill_document_numbers(cls, documents):
+        """
+        Заполнить номера документов без номера для массовой загрузки (bulk_create минует save()).
+        Максимальный номер в году определяется один раз, далее номера выдаются по порядку.
+        """
+        next_numbers = {}
+        for document in documents:
+            if not document.date:
+                document.date = timezone.now()
+            if document.number:
+                continue
+            year = document.date.year
+            if year not in next_numbers:
+                number = document.generate_document_number()
+                next_numbers[year] = (number[:2], int(number[2:]))
+            prefix, counter = next_numbers[year]
+            document.number = f"{prefix}{counter:07d}"
+            next_numbers[year] = (prefix, counter + 1)
+
+    # Связанные объекты (ForeignKey), нужные _transaction_legs (наименования в описаниях операций):
+    # bulk_post загружает их одним запросом на модель вместо запроса на каждый документ
+    bulk_post_related_fields = ()
+    # bulk_post проверяет, что списания документов не превышают остатки касс (как clean() документа)
+    bulk_post_checks_balance = False
+
+    @classmethod
+    def bulk_post(cls, documents, user=None, batch_size=1000):
+        """
+        Массовая загрузка проведенных документов с операциями журнала (импорт данных).
+        Документы сохраняются сразу проведенными, операции (_transaction_legs) строятся в памяти;
+        документы и операции вставляются пакетами, без save() и full_clean() для каждой строки -
+        данные должны быть проверены заранее. Остатки касс проверяются для всего пакета сразу
+        (bulk_post_checks_balance): при нехватке ValidationError, ничего не записывается.
+        """
+        # Модели журнала и сигналов импортируют этот модуль
+        from .models import Transaction
+        from .signals import invalidate_report_cache
+        
+        documents = list(documents)
+        cls.fill_document_numbers(documents)
+        for document in documents:
+            document.is_posted = not document.is_deleted
+        posted = [document for document in documents if document.is_posted]
+        cls._load_bulk_related(posted)
+        legs = [(document, document._transaction_legs(user)) for document in posted]
+        
+        with db_transaction.atomic():
+            if cls.bulk_post_checks_balance:
+                cls._check_bulk_balances(legs)
+            cls.objects.bulk_create(documents, batch_size=batch_size)
+            Transaction.raw_bulk_insert(
+                [transaction for document, transactions in legs for transaction in transactions],
+                batch_size=batch_size
+            )
+        # bulk_create не отправляет post_save, поэтому кэш отчетов сбрасывается явно
+        invalidate_report_cache()
+        return documents
+
+    @classmethod
+    def _load_bulk_related(cls, documents):
+        """Загрузить связанные объекты bulk_post_related_fields документов через in_bulk, по запросу на модель"""
+        fields_by_model = {}
+        for field_name in cls.bulk_post_related_fields:
+            field = cls._meta.get_field(field_name)
+            fields_by_model.setdefault(field.related_model, []).append(field)
+        for model, fields in fields_by_model.items():
+            objects = model.objects.in_bulk({
+                getattr(document, field.attname)
+                for field in fields
+                for document in documents
+                if not field.is_cached(document)
+            })
+            for field in fields:
+                for document in documents:
+                    related = objects.get(getattr(document, field.attname))
+                    if not field.is_cached(document) and related is not None:
+                        field.set_cached_value(document, related)
+
+    @classmethod
+    def _check_bulk_balances(cls, legs):
+        """
+        Проверить остатки касс для операций пакета [(документ, операции)] до их записи.
+        Кассы списаний блокируются до конца транзакции (как lock_for_posting при save()),
+        остатки читаются одним запросом (CashRegister.get_balances_map) и изменяются
+        операциями пакета в порядке дат документов.
+        """
+        from .models import CashRegister, Currency
+        
+        outgoing = {
+            (transaction.cash_register_id, transaction.currency_id)
+            for document, transactions in legs
+            for transaction in transactions
+            if transaction.amount < 0
+        }
+        if not outgoing:
+            return
+        db = router.db_for_write(CashRegister)
+        cash_registers = CashRegister.objects.using(db).select_for_update().in_bulk(
+            {cash_register_id for cash_register_id, currency_id in outgoing}
+        )
+        currencies = Currency.objects.using(db).in_bulk({currency_id for cash_register_id, currency_id in outgoing})
+        balances = CashRegister.get_balances_map(cash_registers.values(), currencies.values())
+        for document, transactions in sorted(legs, key=lambda leg: leg[0].date):
+            for transaction in transactions:
+                key = (transaction.cash_register_id, transaction.currency_id)
+                if key not in outgoing:
+                    continue
+                balance = balances.get(key, Decimal('0'))
+                if balance + transaction.amount < 0:
+                    raise ValidationError(
+                        f'Документ №{document.number}: недостаточный остаток в кассе '
+                        f'{cash_registers[key[0]]} ({currencies[key[1]].code}). '
+                        f'Доступно: {balance}, требуется: {-transaction.amount}'
+                    )
+                balances[key] = balance + transaction.amount
+
+    def _transaction_legs(self, user=None):
+        """Несохраненные операции журнала документа (для bulk_post)"""
+        raise NotImplementedError(f'{self.__class__.__name__} не поддерживает массовую загрузку (bulk_post)')
+
     def __str__(self):
         return f"Документ №{self.number} от {self.date.strftime('%d.%m.%Y')}"
 
@@ -187,14 +360,19 @@ class BaseReference(models.Model):
         """Валидация модели"""
         super().clean()
 
-    def save(self, *args, **kwargs):
-        """Сохранение справочника с автоматической генерацией кода"""
+    def save(self, *args, skip_validation=False, **kwargs):
+        """
+        Сохранение справочника с автоматической генерацией кода.
+        skip_validation=True пропускает full_clean() - для массовой загрузки уже проверенных данных,
+        целостность которых обеспечивают ограничения БД.
+        """
         # Автоматическая генерация кода, если он не указан
         if not self.code:
             self.code = self.generate_reference_code()
         
         # Валидация перед сохранением
-        self.full_clean()
+        if not skip_validation:
+            self.full_clean()
         
         super().save(*args, **kwargs)
 
@@ -5,10 +5,18 @@
 from django import forms
 from django.contrib import admin
 from django.contrib.admin import AdminSite
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.html import format_html
-from django.db.models import Sum, Q
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.db import connections
+from django.db.models import Sum, Q, Prefetch
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from decimal import Decimal
 from .models import (
     Currency, CashRegister, IncomeExpenseItem, Employee, CurrencyRate,
@@ -16,10 +24,27 @@ from .models import (
     AdvancePayment, AdvanceReport, AdvanceReportItem,
     AdvanceReturn, AdditionalAdvancePayment, CashTransfer, CurrencyConversion
 )
+from .exports import transactions_csv_response
 from .admin_sites import references_admin, documents_admin, registers_admin
 from .forms import CurrencyRateAdminForm, EmployeeAdminForm, AdvancePaymentAdminForm, AdvanceReportAdminForm
 
 
+ZERO = Decimal('0.00')
+
+# Шаблоны вывода сумм в списках документов
+# Ключ: сумма дополнительных выдач равна нулю
+ADDITIONAL_PAYMENTS_TEMPLATES = {
+    True: '<span style="color: #999;">{}</span>',
+    False: '<span style="color: #007bff; font-weight: bold;">{}</span>',
+}
+# Ключ: (остаток равен нулю, остаток положительный)
+UNREPORTED_BALANCE_TEMPLATES = {
+    (True, False): '<span style="color: #28a745; font-weight: bold;">{}</span>',
+    (False, True): '<span style="color: #ffc107; font-weight: bold;">{}</span>',
+    (False, False): '<span style="color: #dc3545; font-weight: bold;">{}</span>',
+}
+
+
 # ============================================================================
 # СПРАВОЧНИКИ
 # ============================================================================
@@ -55,14 +80,25 @@ class CurrencyAdmin(admin.ModelAdmin):
         return queryset, use_distinct
 
 
+class CashRegisterChangeList(ChangeList):
+    """Остатки касс страницы списка загружаются одним запросом с группировкой"""
+    def get_results(self, request):
+        super().get_results(request)
+        balances = CashRegister.get_current_balances(self.result_list)
+        for cash_register in self.result_list:
+            cash_register.current_balances = balances.get(cash_register.pk, [])
+
+
 @admin.register(CashRegister)
 class CashRegisterAdmin(admin.ModelAdmin):
     """Админка для справочника касс"""
     list_display = ['name', 'balances_display', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
-    search_fields = ['name', 'description']
+    # Код кассы выводится в autocomplete (display_name), поэтому по нему тоже ищем
+    search_fields = ['name', 'code', 'description']
     ordering = ['name']
     list_editable = ['is_active']
+    readonly_fields = ['balances_display']
     
     def get_queryset(self, request):
         """Оптимизация запросов"""
@@ -89,6 +125,9 @@ class CashRegisterAdmin(admin.ModelAdmin):
         
         return queryset, use_distinct
     
+    def get_changelist(self, request, **kwargs):
+        return CashRegisterChangeList
+    
     @admin.display(description='Остатки по валютам')
     def balances_display(self, obj):
         """
@@ -97,23 +136,15 @@ class CashRegisterAdmin(admin.ModelAdmin):
         if not obj.pk:
             return '-'
         
-        # Получаем все активные валюты
-        currencies = Currency.objects.filter(is_active=True).order_by('code')
-        
-        if not currencies.exists():
-            return 'Нет активных валют'
-        
-        # Получаем остатки по каждой валюте
-        balances = []
-        for currency in currencies:
-            balance = obj.get_balance(currency)
-            if balance != Decimal('0.00'):
-                balances.append(f"{currency.code}: {balance:,.2f}")
+        # В списке остатки загружены для всей страницы (см. CashRegisterChangeList)
+        balances = getattr(obj, 'current_balances', None)
+        if balances is None:
+            balances = CashRegister.get_current_balances([obj]).get(obj.pk, [])
         
         if not balances:
             return format_html('<span style="color: #999;">Нет остатков</span>')
         
-        return format_html('<br>'.join(balances))
+        return format_html_join(mark_safe('<br>'), '{}: {}', ((code, f'{balance:,.2f}') for code, balance in balances))
 
 
 @admin.register(IncomeExpenseItem)
@@ -131,10 +162,11 @@ class IncomeExpenseItemAdmin(admin.ModelAdmin):
 class EmployeeAdmin(admin.ModelAdmin):
     """Админка для справочника сотрудников"""
     form = EmployeeAdminForm
-    list_display = ['full_name', 'position', 'is_active', 'created_at']
+    list_display = ['display_name', 'position', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
-    search_fields = ['first_name', 'last_name', 'middle_name', 'position', 'name']
-    ordering = ['last_name', 'first_name', 'middle_name']
+    # display_name хранит полное имя (фамилия, имя, отчество) одной индексированной колонкой
+    search_fields = ['display_name', 'position', 'name']
+    ordering = ['display_name']
     list_editable = ['is_active']
     fieldsets = (
         ('Основная информация', {
@@ -164,14 +196,81 @@ class CurrencyRateAdmin(admin.ModelAdmin):
 # ДОКУМЕНТЫ
 # ============================================================================
 
-class IncomeDocumentAdmin(admin.ModelAdmin):
+class DeferredFieldsChangeList(ChangeList):
+    """Список документов без текстовых полей, перечисленных в list_defer_fields админки"""
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).defer(*self.model_admin.list_defer_fields)
+
+
+class DeferredFieldsMixin:
+    """
+    Длинные текстовые поля (описание, назначение) не выводятся в списке документов,
+    поэтому не загружаются в changelist. Форма редактирования получает их как обычно.
+    """
+    list_defer_fields = []
+    
+    def get_changelist(self, request, **kwargs):
+        return DeferredFieldsChangeList
+
+
+class AdvancePaymentBalanceMixin:
+    """
+    Выдача в списке документов выводится через __str__ вместе с не закрытым остатком.
+    Выдачи подгружаются одним запросом с уже посчитанным остатком (with_balance),
+    а не отдельным запросом остатка на каждую строку.
+    """
+    advance_payment_field = 'advance_payment'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(Prefetch(
+            self.advance_payment_field,
+            queryset=AdvancePayment.objects.with_balance().select_related('employee', 'currency'),
+        ))
+
+
+class ReferenceDisplayMixin:
+    """
+    Колонки кассы и сотрудника в списках документов.
+    Выводят сохраненное отображаемое имя и сортируются по нему.
+    """
+    @admin.display(description='Касса', ordering='cash_register__display_name')
+    def cash_register_display(self, obj):
+        return obj.cash_register.display_name if obj.cash_register_id else None
+    
+    @admin.display(description='Сотрудник', ordering='employee__display_name')
+    def employee_display(self, obj):
+        return obj.employee.display_name if obj.employee_id else None
+
+
+class ReferenceAutocompleteMixin:
+    """
+    Autocomplete для полей-справочников документа.
+    Справочники не регистрируются в documents_admin повторно: если модель справочника
+    не зарегистрирована на текущем сайте, виджет обращается к autocomplete references_admin.
+    """
+    reference_autocomplete_fields = []
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.reference_autocomplete_fields and 'widget' not in kwargs:
+            related_model = db_field.remote_field.model
+            site = self.admin_site if self.admin_site.is_registered(related_model) else references_admin
+            kwargs['widget'] = AutocompleteSelect(db_field, site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class IncomeDocumentAdmin(ReferenceDisplayMixin, DeferredFieldsMixin, ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для документов оприходования денег"""
-    list_display = ['number', 'date_display', 'cash_register', 'currency', 'amount', 'item', 'employee', 'is_posted', 'is_deleted']
-    list_filter = ['cash_register', 'currency', 'item', 'employee', 'is_posted', 'is_deleted', 'date']
-    search_fields = ['number', 'description']
+    list_display = ['number', 'date_display', 'cash_register_display', 'currency', 'amount', 'item', 'employee_display', 'is_posted', 'is_deleted']
+    list_select_related = ['cash_register', 'currency', 'item', 'employee']
+    list_defer_fields = ['description']
+    list_filter = ['cash_register', 'currency', 'is_posted', 'is_deleted', 'date']
+    search_fields = ['number', 'description', 'item__name', 'employee__display_name']
     ordering = ['-date', '-created_at']
-    raw_id_fields = ['cash_register', 'currency', 'item', 'employee']
+    reference_autocomplete_fields = ['cash_register', 'currency', 'item', 'employee']
     date_hierarchy = 'date'
+    # Django сам строит диапазон date__gte/date__lt при переходе по датам;
+    # отключаем дополнительный COUNT(*) по всей таблице для строки «N из M»
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -197,14 +296,17 @@ class IncomeDocumentAdmin(admin.ModelAdmin):
         return '-'
 
 
-class ExpenseDocumentAdmin(admin.ModelAdmin):
+class ExpenseDocumentAdmin(ReferenceDisplayMixin, DeferredFieldsMixin, ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для документов расхода денег"""
-    list_display = ['number', 'date_display', 'cash_register', 'currency', 'amount', 'item', 'employee', 'is_posted', 'is_deleted']
-    list_filter = ['cash_register', 'currency', 'item', 'employee', 'is_posted', 'is_deleted', 'date']
-    search_fields = ['number', 'description']
+    list_display = ['number', 'date_display', 'cash_register_display', 'currency', 'amount', 'item', 'employee_display', 'is_posted', 'is_deleted']
+    list_select_related = ['cash_register', 'currency', 'item', 'employee']
+    list_defer_fields = ['description']
+    list_filter = ['cash_register', 'currency', 'is_posted', 'is_deleted', 'date']
+    search_fields = ['number', 'description', 'item__name', 'employee__display_name']
     ordering = ['-date', '-created_at']
-    raw_id_fields = ['cash_register', 'currency', 'item', 'employee']
+    reference_autocomplete_fields = ['cash_register', 'currency', 'item', 'employee']
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -230,16 +332,18 @@ class ExpenseDocumentAdmin(admin.ModelAdmin):
         return '-'
 
 
-class AdvancePaymentAdmin(admin.ModelAdmin):
+class AdvancePaymentAdmin(ReferenceDisplayMixin, DeferredFieldsMixin, ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для документов выдачи денег подотчетному лицу"""
     form = AdvancePaymentAdminForm
-    list_display = ['number', 'date_display', 'employee', 'cash_register', 'currency', 'amount', 'additional_payments_display', 'unreported_balance_display', 'expense_item', 'is_closed', 'is_posted', 'is_deleted']
-    list_filter = ['employee', 'currency', 'expense_item', 'is_closed', 'is_posted', 'is_deleted', 'date']
-    search_fields = ['number', 'purpose']
+    list_display = ['number', 'date_display', 'employee_display', 'cash_register_display', 'currency', 'amount', 'additional_payments_display', 'unreported_balance_display', 'expense_item', 'is_closed', 'is_posted', 'is_deleted']
+    list_defer_fields = ['purpose']
+    list_filter = ['currency', 'is_closed', 'is_posted', 'is_deleted', 'date']
+    search_fields = ['number', 'purpose', 'employee__display_name', 'expense_item__name']
     ordering = ['-date', '-created_at']
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'additional_payments_display', 'unreported_balance_display', 'created_at', 'updated_at']
-    autocomplete_fields = ['cash_register', 'currency', 'employee', 'expense_item']  # Autocomplete с фильтрацией через get_search_results
+    reference_autocomplete_fields = ['cash_register', 'currency', 'employee', 'expense_item']  # Autocomplete с фильтрацией через get_search_results
     
     fieldsets = (
         ('Основная информация', {
@@ -330,7 +434,16 @@ class AdvancePaymentAdmin(admin.ModelAdmin):
         
         return queryset, use_distinct
     
-    @admin.display(description='Доп. выдачи')
+    def get_queryset(self, request):
+        """Суммы доп. выдач и не закрытый остаток считаются в базе данных одним запросом"""
+        return super().get_queryset(request).select_related('employee', 'cash_register', 'currency', 'expense_item').with_balance()
+    
+    def _format_amount(self, obj, amount):
+        # Если валюта не установлена, используем общий формат
+        currency_code = obj.currency.code if obj.currency else ''
+        return f'{amount:,.2f} {currency_code}'
+    
+    @admin.display(description='Доп. выдачи', ordering='additional_payments_total')
     def additional_payments_display(self, obj):
         """
         Отображает сумму дополнительных выдач по этой выдаче
@@ -338,26 +451,17 @@ class AdvancePaymentAdmin(admin.ModelAdmin):
         if not obj.pk:
             return '-'
         
-        from django.apps import apps
-        AdditionalAdvancePayment = apps.get_model('accounting', 'AdditionalAdvancePayment')
-        
-        additional_sum = AdditionalAdvancePayment.objects.filter(
-            original_advance_payment=obj,
-            is_deleted=False
-        ).aggregate(total=Sum('amount'))['total']
-        
+        additional_sum = getattr(obj, 'additional_payments_total', None)
         if additional_sum is None:
-            additional_sum = Decimal('0.00')
-        
-        # Если валюта не установлена, используем общий формат
-        currency_code = obj.currency.code if obj.currency else ''
+            additional_sum = AdditionalAdvancePayment.objects.filter(
+                original_advance_payment=obj,
+                is_deleted=False
+            ).aggregate(total=Sum('amount'))['total'] or ZERO
         
-        if additional_sum == Decimal('0.00'):
-            return format_html('<span style="color: #999;">{}</span>', f'{additional_sum:,.2f} {currency_code}')
-        else:
-            return format_html('<span style="color: #007bff; font-weight: bold;">{}</span>', f'{additional_sum:,.2f} {currency_code}')
+        template = ADDITIONAL_PAYMENTS_TEMPLATES[additional_sum == ZERO]
+        return format_html(template, self._format_amount(obj, additional_sum))
     
-    @admin.display(description='Не закрытый остаток')
+    @admin.display(description='Не закрытый остаток', ordering='unreported_balance_total')
     def unreported_balance_display(self, obj):
         """
         Отображает не закрытый остаток по выдаче
@@ -365,21 +469,13 @@ class AdvancePaymentAdmin(admin.ModelAdmin):
         if not obj.pk:
             return '-'
         
-        try:
+        balance = getattr(obj, 'unreported_balance_total', None)
+        if balance is None:
             balance = obj.get_unreported_balance()
-        except (AttributeError, TypeError):
-            return '-'
-        
-        # Если валюта не установлена, используем общий формат
-        currency_code = obj.currency.code if obj.currency else ''
         
         # Форматируем остаток с цветом
-        if balance == Decimal('0.00'):
-            return format_html('<span style="color: #28a745; font-weight: bold;">{}</span>', f'{balance:,.2f} {currency_code}')
-        elif balance > Decimal('0.00'):
-            return format_html('<span style="color: #ffc107; font-weight: bold;">{}</span>', f'{balance:,.2f} {currency_code}')
-        else:
-            return format_html('<span style="color: #dc3545; font-weight: bold;">{}</span>', f'{balance:,.2f} {currency_code}')
+        template = UNREPORTED_BALANCE_TEMPLATES[(balance == ZERO, balance > ZERO)]
+        return format_html(template, self._format_amount(obj, balance))
     
     @admin.display(description='Дата', ordering='date')
     def date_display(self, obj):
@@ -398,6 +494,13 @@ class AdvanceReportItemInline(admin.TabularInline):
     fields = ['item', 'amount', 'description', 'date']
     readonly_fields = ['item']
     
+    def get_queryset(self, request):
+        """
+        Статья расходов и __str__ строки (номер и валюта отчета) выводятся в каждой строке -
+        загружаем их одним запросом со строками
+        """
+        return super().get_queryset(request).select_related('item', 'report__currency')
+    
     def get_readonly_fields(self, request, obj=None):
         """Статья расходов должна соответствовать статье из выданных подотчетных средств"""
         return ['item']
@@ -650,17 +753,21 @@ class AdvanceReportItemInline(admin.TabularInline):
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
-class AdvanceReportItemAdmin(admin.ModelAdmin):
+class AdvanceReportItemAdmin(ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для строк авансового отчета"""
     list_display = ['report', 'item', 'amount', 'date', 'description']
-    list_filter = ['item', 'date']
-    search_fields = ['description']
+    list_select_related = ['report', 'item']
+    list_filter = ['date']
+    search_fields = ['description', 'item__name', 'report__number']
     ordering = ['-date', 'report']
-    raw_id_fields = ['report', 'item', 'transaction']
+    autocomplete_fields = ['report']
+    reference_autocomplete_fields = ['item']
+    raw_id_fields = ['transaction']
     date_hierarchy = 'date'
+    show_full_result_count = False
 
 
-class AdvanceReportAdmin(admin.ModelAdmin):
+class AdvanceReportAdmin(AdvancePaymentBalanceMixin, ReferenceAutocompleteMixin, admin.ModelAdmin):
     """
     Админка для авансовых отчетов.
     Модель: AdvanceReport
@@ -672,9 +779,11 @@ class AdvanceReportAdmin(admin.ModelAdmin):
     search_fields = ['number']
     ordering = ['-date', '-created_at']
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'created_at', 'updated_at', 'approved_at', 'return_amount', 'additional_payment']
     inlines = [AdvanceReportItemInline]
-    autocomplete_fields = ['advance_payment', 'currency', 'approved_by']
+    autocomplete_fields = ['advance_payment', 'approved_by']
+    reference_autocomplete_fields = ['currency']
     
     fieldsets = (
         ('Основная информация', {
@@ -793,14 +902,18 @@ class AdvanceReportAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
-class AdvanceReturnAdmin(admin.ModelAdmin):
+class AdvanceReturnAdmin(AdvancePaymentBalanceMixin, ReferenceDisplayMixin, DeferredFieldsMixin, ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для документов возврата денег сотрудником"""
-    list_display = ['number', 'date_display', 'advance_payment', 'employee', 'cash_register', 'currency', 'amount', 'is_posted', 'is_deleted']
-    list_filter = ['employee', 'currency', 'cash_register', 'is_posted', 'is_deleted', 'date']
-    search_fields = ['number', 'description']
+    list_display = ['number', 'date_display', 'advance_payment', 'employee_display', 'cash_register_display', 'currency', 'amount', 'is_posted', 'is_deleted']
+    list_select_related = ['employee', 'cash_register', 'currency']
+    list_defer_fields = ['description']
+    list_filter = ['currency', 'cash_register', 'is_posted', 'is_deleted', 'date']
+    search_fields = ['number', 'description', 'employee__display_name']
     ordering = ['-date', '-created_at']
-    raw_id_fields = ['advance_payment', 'employee', 'cash_register', 'currency']
+    autocomplete_fields = ['advance_payment']
+    reference_autocomplete_fields = ['employee', 'cash_register', 'currency']
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -826,14 +939,18 @@ class AdvanceReturnAdmin(admin.ModelAdmin):
         return '-'
 
 
-class AdditionalAdvancePaymentAdmin(admin.ModelAdmin):
+class AdditionalAdvancePaymentAdmin(AdvancePaymentBalanceMixin, DeferredFieldsMixin, ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для документов дополнительной выдачи подотчетных средств"""
+    advance_payment_field = 'original_advance_payment'
     list_display = ['number', 'date_display', 'original_advance_payment', 'employee_display', 'cash_register', 'currency', 'amount', 'is_posted', 'is_deleted']
-    list_filter = ['currency', 'cash_register', 'is_posted', 'is_deleted', 'date', 'original_advance_payment__employee']
-    search_fields = ['number', 'purpose', 'original_advance_payment__number']
+    list_defer_fields = ['purpose']
+    list_filter = ['currency', 'cash_register', 'is_posted', 'is_deleted', 'date']
+    search_fields = ['number', 'purpose', 'original_advance_payment__number', 'original_advance_payment__employee__display_name']
     ordering = ['-date', '-created_at']
-    autocomplete_fields = ['original_advance_payment', 'cash_register', 'currency']
+    autocomplete_fields = ['original_advance_payment']
+    reference_autocomplete_fields = ['cash_register', 'currency']
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'employee_display', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -868,7 +985,7 @@ class AdditionalAdvancePaymentAdmin(admin.ModelAdmin):
         return '-'
 
 
-class CashTransferAdmin(admin.ModelAdmin):
+class CashTransferAdmin(ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для документов перемещения между кассами"""
     list_display = [
         "number",
@@ -882,8 +999,9 @@ class CashTransferAdmin(admin.ModelAdmin):
     list_filter = ['from_cash_register', 'to_cash_register', 'currency', 'is_posted', 'is_deleted', 'date']
     search_fields = ['number']
     ordering = ['-date', '-created_at']
-    raw_id_fields = ['from_cash_register', 'to_cash_register', 'currency']
+    reference_autocomplete_fields = ['from_cash_register', 'to_cash_register', 'currency']
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'created_at', 'updated_at']
 
     fieldsets = (
@@ -914,14 +1032,16 @@ class CashTransferAdmin(admin.ModelAdmin):
     
 
 
-class CurrencyConversionAdmin(admin.ModelAdmin):
+class CurrencyConversionAdmin(ReferenceDisplayMixin, ReferenceAutocompleteMixin, admin.ModelAdmin):
     """Админка для документов конвертации валют"""
-    list_display = ['number', 'date_display', 'from_currency', 'to_currency', 'cash_register', 'from_amount', 'to_amount', 'exchange_rate', 'is_posted', 'is_deleted']
+    list_display = ['number', 'date_display', 'from_currency', 'to_currency', 'cash_register_display', 'from_amount', 'to_amount', 'exchange_rate', 'is_posted', 'is_deleted']
+    list_select_related = ['from_currency', 'to_currency', 'cash_register']
     list_filter = ['from_currency', 'to_currency', 'cash_register', 'is_posted', 'is_deleted', 'date']
     search_fields = ['number']
     ordering = ['-date', '-created_at']
-    raw_id_fields = ['from_currency', 'to_currency', 'cash_register']
+    reference_autocomplete_fields = ['from_currency', 'to_currency', 'cash_register']
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['is_posted', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -951,11 +1071,59 @@ class CurrencyConversionAdmin(admin.ModelAdmin):
 # ЖУРНАЛ ОПЕРАЦИЙ
 # ============================================================================
 
-class TransactionAdmin(admin.ModelAdmin):
+# Поля операции со ссылками на документы-источники
+TRANSACTION_DOCUMENT_FIELDS = list(dict.fromkeys(Transaction.DOCUMENT_FIELDS.values()))
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц.
+    Для списка без фильтров на PostgreSQL берет оценку числа строк из статистики
+    планировщика (pg_class.reltuples) вместо SELECT COUNT(*) по всей таблице.
+    Для небольших таблиц и отфильтрованных списков считает точно.
+    """
+    # Ниже этого порога оценка неточна, а точный подсчет дешев
+    ESTIMATE_THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.has_filters():
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        estimate = row[0] if row else 0
+        if estimate < self.ESTIMATE_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class TransactionChangeList(ChangeList):
+    """
+    Список операций загружает только колонки, нужные для list_display.
+    Описание (TEXT) и ссылки на строки отчетов в списке не выводятся.
+    """
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).only(
+            'date', 'created_at', 'transaction_type', 'amount',
+            'cash_register__display_name',
+            'currency__code', 'currency__name',
+            'item__name',
+            'employee__display_name',
+            *(f'{field_name}_id' for field_name in TRANSACTION_DOCUMENT_FIELDS),
+        )
+
+
+class TransactionAdmin(ReferenceDisplayMixin, admin.ModelAdmin):
     """Админка для журнала операций"""
-    list_display = ['date_display', 'transaction_type', 'cash_register', 'currency', 'amount', 'employee', 'item', 'get_document_link']
-    list_filter = ['transaction_type', 'currency', 'cash_register', 'employee', 'item', 'date']
-    search_fields = ['description']
+    list_display = ['date_display', 'transaction_type', 'cash_register_display', 'currency', 'amount', 'employee_display', 'item', 'get_document_link']
+    # Фильтры по сотруднику и статье заменены поиском: выпадающие списки загружали справочники целиком
+    list_filter = ['transaction_type', 'currency', 'cash_register', 'date']
+    search_fields = ['description', 'employee__display_name', 'item__name']
     ordering = ['-date', '-created_at']
     raw_id_fields = [
         'cash_register', 'currency', 'item', 'employee',
@@ -964,6 +1132,7 @@ class TransactionAdmin(admin.ModelAdmin):
         'additional_advance_payment', 'cash_transfer', 'currency_conversion'
     ]
     date_hierarchy = 'date'
+    show_full_result_count = False
     readonly_fields = ['created_at', 'created_by']
     
     fieldsets = (
@@ -996,26 +1165,42 @@ class TransactionAdmin(admin.ModelAdmin):
             return obj.date.strftime('%d.%m.%Y')
         return '-'
     
+    def has_add_permission(self, request):
+        """
+        Операции создаются только проведением документов: ограничение tx_has_source_document
+        не допускает операцию без документа-источника
+        """
+        return False
+    
+    paginator = EstimatedCountPaginator
+    actions = ['export_csv']
+    
+    def get_changelist(self, request, **kwargs):
+        return TransactionChangeList
+    
+    @admin.action(description='Выгрузить в CSV')
+    def export_csv(self, request, queryset):
+        """Потоковая выгрузка выбранных операций в CSV"""
+        return transactions_csv_response(queryset)
+    
+    def get_queryset(self, request):
+        """
+        Документы подгружаются пачкой на страницу (один запрос на тип документа),
+        а не отдельным запросом на каждую строку списка
+        """
+        return super().get_queryset(request).with_references().prefetch_related(*(
+            Prefetch(field_name, queryset=Transaction._meta.get_field(field_name).related_model.objects.only('number'))
+            for field_name in TRANSACTION_DOCUMENT_FIELDS
+        ))
+    
     @admin.display(description='Документ')
     def get_document_link(self, obj):
         """Отображение ссылки на документ"""
-        if obj.income_document:
-            return format_html('<a href="/admin/accounting/incomedocument/{}/change/">{}</a>', obj.income_document.id, obj.income_document)
-        elif obj.expense_document:
-            return format_html('<a href="/admin/accounting/expensedocument/{}/change/">{}</a>', obj.expense_document.id, obj.expense_document)
-        elif obj.advance_payment:
-            return format_html('<a href="/admin/accounting/advancepayment/{}/change/">{}</a>', obj.advance_payment.id, obj.advance_payment)
-        elif obj.advance_report:
-            return format_html('<a href="/admin/accounting/advancereport/{}/change/">{}</a>', obj.advance_report.id, obj.advance_report)
-        elif obj.advance_return:
-            return format_html('<a href="/admin/accounting/advancereturn/{}/change/">{}</a>', obj.advance_return.id, obj.advance_return)
-        elif obj.additional_advance_payment:
-            return format_html('<a href="/admin/accounting/additionaladvancepayment/{}/change/">{}</a>', obj.additional_advance_payment.id, obj.additional_advance_payment)
-        elif obj.cash_transfer:
-            return format_html('<a href="/admin/accounting/cashtransfer/{}/change/">{}</a>', obj.cash_transfer.id, obj.cash_transfer)
-        elif obj.currency_conversion:
-            return format_html('<a href="/admin/accounting/currencyconversion/{}/change/">{}</a>', obj.currency_conversion.id, obj.currency_conversion)
-        return '-'
+        document = obj.source_document
+        if document is None:
+            return '-'
+        url = reverse(f'admin:accounting_{document._meta.model_name}_change', args=[document.pk])
+        return format_html('<a href="{}">{} №{}</a>', url, document._meta.verbose_name, document.number)
 
 
 # ============================================================================
@@ -1030,14 +1215,8 @@ references_admin.register(Employee, EmployeeAdmin)
 references_admin.register(CurrencyRate, CurrencyRateAdmin)
 
 # Регистрация документов в кастомном AdminSite
-# Сначала регистрируем связанные модели (справочники) в documents_admin для работы autocomplete_fields
-# Это необходимо, чтобы autocomplete_fields в документах могли находить связанные модели
-documents_admin.register(Currency, CurrencyAdmin)
-documents_admin.register(CashRegister, CashRegisterAdmin)
-documents_admin.register(IncomeExpenseItem, IncomeExpenseItemAdmin)
-documents_admin.register(Employee, EmployeeAdmin)
-
-# Затем регистрируем документы
+# Справочники здесь не регистрируются: autocomplete полей-справочников идет через references_admin
+# (см. ReferenceAutocompleteMixin)
 documents_admin.register(IncomeDocument, IncomeDocumentAdmin)
 documents_admin.register(ExpenseDocument, ExpenseDocumentAdmin)
 documents_admin.register(AdvancePayment, AdvancePaymentAdmin)
@@ -1,6 +1,7 @@
 """
 API Views для Django REST Framework.
 """
+from django.core.cache import cache
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -13,9 +14,73 @@ from .serializers import (
     EmployeeSerializer, CurrencyRateSerializer, AdvancePaymentSerializer,
     IncomeDocumentSerializer
 )
+from .signals import get_reference_cache_version, is_shared_cache
 
 
-class CurrencyViewSet(viewsets.ModelViewSet):
+# Значения булевых параметров запроса
+BOOLEAN_PARAM_VALUES = {
+    'true': True, '1': True, 'yes': True,
+    'false': False, '0': False, 'no': False,
+}
+
+
+def parse_bool_param(value):
+    """Значение булева параметра запроса; None, если параметр не передан или не распознан"""
+    if value is None:
+        return None
+    return BOOLEAN_PARAM_VALUES.get(value.lower())
+
+
+class QueryParamsFilterMixin:
+    """
+    Фильтрация queryset по параметрам запроса.
+    filter_params: {параметр запроса: lookup} - фильтр применяется, если параметр не пустой
+    boolean_filter_params: булевы поля, нераспознанное значение параметра игнорируется
+    """
+    filter_params = {}
+    boolean_filter_params = []
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        query_params = self.request.query_params
+        lookups = {}
+        for param, lookup in self.filter_params.items():
+            value = query_params.get(param)
+            if value:
+                lookups[lookup] = value
+        for field_name in self.boolean_filter_params:
+            value = parse_bool_param(query_params.get(field_name))
+            if value is not None:
+                lookups[field_name] = value
+        if lookups:
+            queryset = queryset.filter(**lookups)
+        return queryset
+
+
+class CachedListMixin:
+    """
+    Кэширование ответа list() для редко меняющихся справочников.
+    Ключ включает версию справочника, которая увеличивается при сохранении/удалении
+    записи (см. signals), поэтому изменения видны сразу, без ожидания таймаута.
+    Права доступа проверяются до вызова list(), так что ответ общий для всех пользователей.
+    Кэш используется только при общем для всех процессов бэкенде (см. is_shared_cache).
+    """
+    list_cache_timeout = 60 * 5
+    
+    def list(self, request, *args, **kwargs):
+        if not is_shared_cache():
+            return super().list(request, *args, **kwargs)
+        model = self.queryset.model
+        cache_key = f'api:{model._meta.label_lower}:{get_reference_cache_version(model)}:list:{request.get_full_path()}'
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(cache_key, response.data, self.list_cache_timeout)
+        return response
+
+
+class CurrencyViewSet(CachedListMixin, QueryParamsFilterMixin, viewsets.ModelViewSet):
     """ViewSet для валют"""
     queryset = Currency.objects.all()
     serializer_class = CurrencySerializer
@@ -23,17 +88,10 @@ class CurrencyViewSet(viewsets.ModelViewSet):
     search_fields = ['code', 'name']
     ordering_fields = ['code', 'name', 'created_at']
     ordering = ['code']
-    
-    def get_queryset(self):
-        """Фильтр по активным валютам"""
-        queryset = super().get_queryset()
-        is_active = self.request.query_params.get('is_active', None)
-        if is_active is not None:
-            queryset = queryset.filter(is_active=is_active.lower() == 'true')
-        return queryset
+    boolean_filter_params = ['is_active']
 
 
-class CashRegisterViewSet(viewsets.ModelViewSet):
+class CashRegisterViewSet(QueryParamsFilterMixin, viewsets.ModelViewSet):
     """ViewSet для касс"""
     queryset = CashRegister.objects.all()
     serializer_class = CashRegisterSerializer
@@ -41,17 +99,10 @@ class CashRegisterViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'code', 'description']
     ordering_fields = ['name', 'code', 'created_at']
     ordering = ['name']
-    
-    def get_queryset(self):
-        """Фильтр по активным кассам"""
-        queryset = super().get_queryset()
-        is_active = self.request.query_params.get('is_active', None)
-        if is_active is not None:
-            queryset = queryset.filter(is_active=is_active.lower() == 'true')
-        return queryset
+    boolean_filter_params = ['is_active']
 
 
-class IncomeExpenseItemViewSet(viewsets.ModelViewSet):
+class IncomeExpenseItemViewSet(CachedListMixin, QueryParamsFilterMixin, viewsets.ModelViewSet):
     """ViewSet для статей доходов/расходов"""
     queryset = IncomeExpenseItem.objects.all()
     serializer_class = IncomeExpenseItemSerializer
@@ -59,110 +110,57 @@ class IncomeExpenseItemViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'code', 'description']
     ordering_fields = ['name', 'type', 'created_at']
     ordering = ['type', 'name']
-    
-    def get_queryset(self):
-        """Фильтр по типу и активности"""
-        queryset = super().get_queryset()
-        item_type = self.request.query_params.get('type', None)
-        is_active = self.request.query_params.get('is_active', None)
-        parent = self.request.query_params.get('parent', None)
-        
-        if item_type:
-            queryset = queryset.filter(type=item_type)
-        if is_active is not None:
-            queryset = queryset.filter(is_active=is_active.lower() == 'true')
-        if parent:
-            queryset = queryset.filter(parent_id=parent)
-        
-        return queryset
+    filter_params = {
+        'type': 'type',
+        'parent': 'parent_id',
+    }
+    boolean_filter_params = ['is_active']
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(CachedListMixin, QueryParamsFilterMixin, viewsets.ModelViewSet):
     """ViewSet для сотрудников"""
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['first_name', 'last_name', 'middle_name', 'position', 'name']
-    ordering_fields = ['last_name', 'first_name', 'created_at']
-    ordering = ['last_name', 'first_name']
-    
-    def get_queryset(self):
-        """Фильтр по активным сотрудникам"""
-        queryset = super().get_queryset()
-        is_active = self.request.query_params.get('is_active', None)
-        if is_active is not None:
-            queryset = queryset.filter(is_active=is_active.lower() == 'true')
-        return queryset
+    # display_name хранит полное имя (фамилия, имя, отчество) одной индексированной колонкой
+    search_fields = ['display_name', 'position', 'name']
+    ordering_fields = ['display_name', 'last_name', 'first_name', 'created_at']
+    ordering = ['display_name']
+    boolean_filter_params = ['is_active']
 
 
-class CurrencyRateViewSet(viewsets.ModelViewSet):
+class CurrencyRateViewSet(QueryParamsFilterMixin, viewsets.ModelViewSet):
     """ViewSet для курсов валют"""
-    queryset = CurrencyRate.objects.all()
+    queryset = CurrencyRate.objects.select_related('from_currency', 'to_currency')
     serializer_class = CurrencyRateSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'from_currency__code', 'to_currency__code']
     ordering_fields = ['date', 'from_currency', 'to_currency', 'rate']
     ordering = ['-date', 'from_currency', 'to_currency']
-    
-    def get_queryset(self):
-        """Фильтр по валютам, дате и активности"""
-        queryset = super().get_queryset()
-        from_currency = self.request.query_params.get('from_currency', None)
-        to_currency = self.request.query_params.get('to_currency', None)
-        date = self.request.query_params.get('date', None)
-        is_active = self.request.query_params.get('is_active', None)
-        
-        if from_currency:
-            queryset = queryset.filter(from_currency_id=from_currency)
-        if to_currency:
-            queryset = queryset.filter(to_currency_id=to_currency)
-        if date:
-            queryset = queryset.filter(date=date)
-        if is_active is not None:
-            queryset = queryset.filter(is_active=is_active.lower() == 'true')
-        
-        return queryset
+    filter_params = {
+        'from_currency': 'from_currency_id',
+        'to_currency': 'to_currency_id',
+        'date': 'date',
+    }
+    boolean_filter_params = ['is_active']
 
 
-class AdvancePaymentViewSet(viewsets.ModelViewSet):
+class AdvancePaymentViewSet(QueryParamsFilterMixin, viewsets.ModelViewSet):
     """ViewSet для выдачи денег подотчетному лицу"""
-    queryset = AdvancePayment.objects.all()
+    queryset = AdvancePayment.objects.select_related('employee', 'cash_register', 'currency', 'expense_item').with_balance()
     serializer_class = AdvancePaymentSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['number', 'purpose', 'employee__last_name', 'employee__first_name']
     ordering_fields = ['date', 'number', 'amount', 'created_at']
     ordering = ['-date', '-created_at']
-    
-    def get_queryset(self):
-        """Фильтр по различным параметрам"""
-        queryset = super().get_queryset()
-        employee = self.request.query_params.get('employee', None)
-        cash_register = self.request.query_params.get('cash_register', None)
-        currency = self.request.query_params.get('currency', None)
-        expense_item = self.request.query_params.get('expense_item', None)
-        is_closed = self.request.query_params.get('is_closed', None)
-        is_posted = self.request.query_params.get('is_posted', None)
-        is_deleted = self.request.query_params.get('is_deleted', None)
-        date = self.request.query_params.get('date', None)
-        
-        if employee:
-            queryset = queryset.filter(employee_id=employee)
-        if cash_register:
-            queryset = queryset.filter(cash_register_id=cash_register)
-        if currency:
-            queryset = queryset.filter(currency_id=currency)
-        if expense_item:
-            queryset = queryset.filter(expense_item_id=expense_item)
-        if is_closed is not None:
-            queryset = queryset.filter(is_closed=is_closed.lower() == 'true')
-        if is_posted is not None:
-            queryset = queryset.filter(is_posted=is_posted.lower() == 'true')
-        if is_deleted is not None:
-            queryset = queryset.filter(is_deleted=is_deleted.lower() == 'true')
-        if date:
-            queryset = queryset.filter(date=date)
-        
-        return queryset
+    filter_params = {
+        'employee': 'employee_id',
+        'cash_register': 'cash_register_id',
+        'currency': 'currency_id',
+        'expense_item': 'expense_item_id',
+        'date': 'date',
+    }
+    boolean_filter_params = ['is_closed', 'is_posted', 'is_deleted']
     
     @action(detail=True, methods=['get'])
     def unreported_balance(self, request, pk=None):
@@ -172,37 +170,19 @@ class AdvancePaymentViewSet(viewsets.ModelViewSet):
         return Response({'unreported_balance': str(balance)})
 
 
-class IncomeDocumentViewSet(viewsets.ModelViewSet):
+class IncomeDocumentViewSet(QueryParamsFilterMixin, viewsets.ModelViewSet):
     """ViewSet для прихода денежных средств"""
-    queryset = IncomeDocument.objects.all()
+    queryset = IncomeDocument.objects.select_related('cash_register', 'currency', 'item')
     serializer_class = IncomeDocumentSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['number', 'description']
     ordering_fields = ['date', 'number', 'amount', 'created_at']
     ordering = ['-date', '-created_at']
-    
-    def get_queryset(self):
-        """Фильтр по кассе, дате и другим параметрам"""
-        queryset = super().get_queryset()
-        cash_register = self.request.query_params.get('cash_register', None)
-        currency = self.request.query_params.get('currency', None)
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
-        is_posted = self.request.query_params.get('is_posted', None)
-        is_deleted = self.request.query_params.get('is_deleted', None)
-        
-        if cash_register:
-            queryset = queryset.filter(cash_register_id=cash_register)
-        if currency:
-            queryset = queryset.filter(currency_id=currency)
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
-        if is_posted is not None:
-            queryset = queryset.filter(is_posted=is_posted.lower() == 'true')
-        if is_deleted is not None:
-            queryset = queryset.filter(is_deleted=is_deleted.lower() == 'true')
-        
-        return queryset
+    filter_params = {
+        'cash_register': 'cash_register_id',
+        'currency': 'currency_id',
+        'date_from': 'date__gte',
+        'date_to': 'date__lte',
+    }
+    boolean_filter_params = ['is_posted', 'is_deleted']
 
@@ -6,6 +6,47 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import authenticate, login, logout
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+
+# Поля пользователя, возвращаемые клиенту при входе и в current_user
+_USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser')
+
+
+def _serialize_user(user):
+    """Информация о пользователе для ответа API."""
+    return {field: getattr(user, field) for field in _USER_FIELDS}
+
+
+# Окно подсчета неудачных попыток входа, секунд
+LOGIN_FAILURE_TIMEOUT = 60
+
+# Сколько неудачных попыток входа под одним именем допускается за окно LOGIN_FAILURE_TIMEOUT:
+# следующие отклоняются без проверки пароля до истечения окна
+LOGIN_FAILURE_LIMIT = 5
+
+
+def _login_failure_key(username):
+    """
+    Ключ кэша счетчика неудачных попыток входа под именем username. Имя входит в ключ
+    через HMAC на SECRET_KEY: ключ фиксированной длины без произвольных символов из запроса.
+    Пароль в ключ не входит, иначе перебор разных паролей не ограничивался бы.
+    IP в ключ не входит: за прокси (nginx) REMOTE_ADDR - адрес прокси, и чужие неудачные
+    попытки блокировали бы вход всем пользователям.
+    """
+    digest = salted_hmac('auth.login_failure', username, algorithm='sha256').hexdigest()
+    return f'auth:login_failure:{digest}'
+
+
+def _register_login_failure(failure_key):
+    """Увеличить счетчик неудачных попыток; окно отсчитывается от первой неудачи"""
+    cache.add(failure_key, 0, LOGIN_FAILURE_TIMEOUT)
+    try:
+        cache.incr(failure_key)
+    except ValueError:
+        # Ключ истек между add и incr
+        cache.set(failure_key, 1, LOGIN_FAILURE_TIMEOUT)
 
 
 @api_view(['POST'])
@@ -24,26 +65,30 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    # После LOGIN_FAILURE_LIMIT неудачных попыток попытки отклоняются, не вычисляя хэш пароля.
+    # Ответ 429 отличается от 401: пароль в этом случае не проверялся
+    failure_key = _login_failure_key(username)
+    if cache.get(failure_key, 0) >= LOGIN_FAILURE_LIMIT:
+        return Response(
+            {'error': f'Слишком частые попытки входа. Повторите через {LOGIN_FAILURE_TIMEOUT} с.'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': str(LOGIN_FAILURE_TIMEOUT)}
+        )
+    
     user = authenticate(request, username=username, password=password)
     
     if user is not None:
         if user.is_active:
+            cache.delete(failure_key)
             login(request, user)
-            return Response({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'is_staff': user.is_staff,
-                'is_superuser': user.is_superuser,
-            }, status=status.HTTP_200_OK)
+            return Response(_serialize_user(user), status=status.HTTP_200_OK)
         else:
             return Response(
                 {'error': 'Учетная запись отключена'},
                 status=status.HTTP_403_FORBIDDEN
             )
     else:
+        _register_login_failure(failure_key)
         return Response(
             {'error': 'Неверное имя пользователя или пароль'},
             status=status.HTTP_401_UNAUTHORIZED
@@ -67,12 +112,4 @@ def current_user_view(request):
     Получить информацию о текущем авторизованном пользователе.
     """
     user = request.user
-    return Response({
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'first_name': user.first_name,
-        'last_name': user.last_name,
-        'is_staff': user.is_staff,
-        'is_superuser': user.is_superuser,
-    }, status=status.HTTP_200_OK)
+    return Response(_serialize_user(user), status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import CurrencyRate, Currency, Employee, CashRegister, AdvancePayment, AdvanceReport
+from .models import CurrencyRate, Currency, Employee, CashRegister, AdvancePayment, AdvanceReport, TWO_PLACES
 
 
 class CurrencyModelChoiceField(forms.ModelChoiceField):
@@ -9,18 +9,23 @@ class CurrencyModelChoiceField(forms.ModelChoiceField):
         return obj.code
 
 
+# Активные валюты для полей выбора; каждая форма получает копию queryset (ModelChoiceField.__deepcopy__).
+# Загружаем только поля, нужные для подписи варианта и __str__
+ACTIVE_CURRENCIES = Currency.objects.filter(is_active=True).only('id', 'code', 'name')
+
+
 class CurrencyRateAdminForm(forms.ModelForm):
     """Форма для админки CurrencyRate с автоматическим заполнением наименования"""
     
     # Используем кастомные поля для отображения кода валюты
     from_currency = CurrencyModelChoiceField(
-        queryset=Currency.objects.filter(is_active=True),
+        queryset=ACTIVE_CURRENCIES,
         label='Исходная валюта',
         required=True,
         help_text='Валюта, из которой происходит конвертация (1 единица)'
     )
     to_currency = CurrencyModelChoiceField(
-        queryset=Currency.objects.filter(is_active=True),
+        queryset=ACTIVE_CURRENCIES,
         label='Целевая валюта',
         required=True,
         help_text='Валюта, в которую происходит конвертация'
@@ -53,23 +58,19 @@ class CurrencyRateAdminForm(forms.ModelForm):
             to_currency = cleaned_data.get('to_currency')
             rate = cleaned_data.get('rate')
             
-            # Если данные еще не очищены, пытаемся получить из instance
-            if not from_currency and self.instance:
-                from_currency = self.instance.from_currency
-            if not to_currency and self.instance:
-                to_currency = self.instance.to_currency
-            if not rate and self.instance:
-                rate = self.instance.rate
+            # Если данные еще не очищены, берем недостающие из сохраненного объекта
+            if not (from_currency and to_currency and rate) and not self.instance._state.adding:
+                from_currency = from_currency or self.instance.from_currency
+                to_currency = to_currency or self.instance.to_currency
+                rate = rate or self.instance.rate
             
             if from_currency and to_currency and rate:
-                from decimal import Decimal
-                # Округляем курс до сотых (2 знака после запятой)
-                rate_rounded = Decimal(str(rate)).quantize(Decimal('0.01'))
+                # Округляем курс до сотых (2 знака после запятой); DecimalField уже вернул Decimal
+                rate_rounded = rate.quantize(TWO_PLACES)
                 name = f"{from_currency.code} - {rate_rounded} - {to_currency.code}"
                 cleaned_data['name'] = name
                 # Обновляем instance для сохранения
-                if self.instance:
-                    self.instance.name = name
+                self.instance.name = name
         
         return cleaned_data
 
@@ -102,13 +103,11 @@ class EmployeeAdminForm(forms.ModelForm):
             last_name = cleaned_data.get('last_name', '') or ''
             middle_name = cleaned_data.get('middle_name', '') or ''
             
-            # Если данные еще не очищены, пытаемся получить из instance
-            if not first_name and self.instance:
-                first_name = self.instance.first_name or ''
-            if not last_name and self.instance:
-                last_name = self.instance.last_name or ''
-            if not middle_name and self.instance:
-                middle_name = self.instance.middle_name or ''
+            # Если данные еще не очищены, берем недостающие из сохраненного объекта
+            if not (first_name and last_name and middle_name) and not self.instance._state.adding:
+                first_name = first_name or self.instance.first_name or ''
+                last_name = last_name or self.instance.last_name or ''
+                middle_name = middle_name or self.instance.middle_name or ''
             
             # Формируем полное ФИО
             if last_name and first_name:
@@ -118,8 +117,7 @@ class EmployeeAdminForm(forms.ModelForm):
                 name = ' '.join(parts)
                 cleaned_data['name'] = name
                 # Обновляем instance для сохранения
-                if self.instance:
-                    self.instance.name = name
+                self.instance.name = name
         
         return cleaned_data
 
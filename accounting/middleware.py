@@ -1,15 +1,18 @@
 """
 Middleware для отключения CSRF проверки для API endpoints.
 """
-from django.utils.deprecation import MiddlewareMixin
 
+API_PATH_PREFIX = '/api/'
 
-class DisableCSRFForAPI(MiddlewareMixin):
+
+class DisableCSRFForAPI:
     """
     Отключает CSRF проверку для API endpoints.
     """
-    def process_request(self, request):
-        if request.path.startswith('/api/'):
-            setattr(request, '_dont_enforce_csrf_checks', True)
-        return None
+    def __init__(self, get_response):
+        self.get_response = get_response
 
+    def __call__(self, request):
+        if request.path_info.startswith(API_PATH_PREFIX):
+            request._dont_enforce_csrf_checks = True
+        return self.get_response(request)
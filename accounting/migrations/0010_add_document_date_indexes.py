@@ -0,0 +1,210 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0009_remove_employee_from_additional_advance_payment"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="additionaladvancepayment",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_96daef_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="additionaladvancepayment",
+            index=models.Index(
+                fields=["cash_register", "date"], name="accounting__cash_re_7bc2e2_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="additionaladvancepayment",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_ca36d5_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancepayment",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_1726bd_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancepayment",
+            index=models.Index(
+                fields=["cash_register", "date"], name="accounting__cash_re_bc0602_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancepayment",
+            index=models.Index(
+                fields=["employee", "date"], name="accounting__employe_24a966_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancepayment",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_34ea68_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereport",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_b8cfe5_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereport",
+            index=models.Index(
+                fields=["advance_payment", "date"],
+                name="accounting__advance_020a8b_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereport",
+            index=models.Index(
+                fields=["status", "date"], name="accounting__status_3f3c2c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereport",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_136afd_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereportitem",
+            index=models.Index(fields=["-date"], name="accounting__date_4a0c4f_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="advancereturn",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_443b93_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereturn",
+            index=models.Index(
+                fields=["cash_register", "date"], name="accounting__cash_re_20eda4_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereturn",
+            index=models.Index(
+                fields=["employee", "date"], name="accounting__employe_1dc53b_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereturn",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_c9f131_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cashtransfer",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_c16e04_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cashtransfer",
+            index=models.Index(
+                fields=["from_cash_register", "date"],
+                name="accounting__from_ca_eea701_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cashtransfer",
+            index=models.Index(
+                fields=["to_cash_register", "date"],
+                name="accounting__to_cash_aff756_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cashtransfer",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_33ff68_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="currencyconversion",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_4d3ef7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="currencyconversion",
+            index=models.Index(
+                fields=["cash_register", "date"], name="accounting__cash_re_d476a7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="currencyconversion",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_58ab6a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expensedocument",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_184438_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expensedocument",
+            index=models.Index(
+                fields=["cash_register", "date"], name="accounting__cash_re_73926e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expensedocument",
+            index=models.Index(
+                fields=["employee", "date"], name="accounting__employe_ecd1ed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expensedocument",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_05a42c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incomedocument",
+            index=models.Index(
+                fields=["-date", "-created_at"], name="accounting__date_00d239_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incomedocument",
+            index=models.Index(
+                fields=["cash_register", "date"], name="accounting__cash_re_a2b182_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incomedocument",
+            index=models.Index(
+                fields=["employee", "date"], name="accounting__employe_e9b3e9_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incomedocument",
+            index=models.Index(
+                fields=["is_posted", "is_deleted", "date"],
+                name="accounting__is_post_24cbf2_idx",
+            ),
+        ),
+    ]
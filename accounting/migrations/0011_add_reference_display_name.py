@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:37
+
+from django.db import migrations, models
+
+
+def fill_display_names(apps, schema_editor):
+    """Заполнить отображаемые имена существующих касс и сотрудников"""
+    CashRegister = apps.get_model("accounting", "CashRegister")
+    Employee = apps.get_model("accounting", "Employee")
+
+    cash_registers = list(CashRegister.objects.all())
+    for cash_register in cash_registers:
+        if cash_register.code:
+            cash_register.display_name = f"{cash_register.name} ({cash_register.code})"
+        else:
+            cash_register.display_name = cash_register.name
+    CashRegister.objects.bulk_update(cash_registers, ["display_name"])
+
+    employees = list(Employee.objects.all())
+    for employee in employees:
+        parts = [employee.last_name, employee.first_name]
+        if employee.middle_name:
+            parts.append(employee.middle_name)
+        employee.display_name = " ".join(parts)
+    Employee.objects.bulk_update(employees, ["display_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0010_add_document_date_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cashregister",
+            name="display_name",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Название с кодом, заполняется автоматически при сохранении",
+                max_length=255,
+                verbose_name="Отображаемое название",
+            ),
+        ),
+        migrations.AddField(
+            model_name="employee",
+            name="display_name",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Полное имя, заполняется автоматически при сохранении",
+                max_length=255,
+                verbose_name="Отображаемое имя",
+            ),
+        ),
+        migrations.RunPython(fill_display_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0011_add_reference_display_name"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["advance_payment", "transaction_type"],
+                name="accounting__advance_31f33a_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:45
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def fill_transaction_is_active(apps, schema_editor):
+    """Снять признак is_active с операций удаленных документов"""
+    Transaction = apps.get_model("accounting", "Transaction")
+    deleted = Q()
+    for field_name in (
+        "income_document",
+        "expense_document",
+        "advance_payment",
+        "advance_report",
+        "advance_return",
+        "additional_advance_payment",
+        "cash_transfer",
+        "currency_conversion",
+    ):
+        deleted |= Q(**{f"{field_name}__is_deleted": True})
+    Transaction.objects.filter(deleted).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0012_add_transaction_advance_payment_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="is_active",
+            field=models.BooleanField(
+                default=True,
+                editable=False,
+                help_text="Ни один из связанных документов не удален. Обновляется при сохранении документов",
+                verbose_name="Действует",
+            ),
+        ),
+        migrations.RunPython(fill_transaction_is_active, migrations.RunPython.noop),
+    ]
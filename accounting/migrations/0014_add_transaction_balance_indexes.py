@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0013_add_transaction_is_active"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["cash_register", "currency", "is_active", "amount"],
+                name="tx_balance_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["employee", "currency", "transaction_type", "amount"],
+                name="tx_advance_balance_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0014_add_transaction_balance_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="currencyrate",
+            name="accounting__from_cu_8d56a4_idx",
+        ),
+        migrations.AddIndex(
+            model_name="currency",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["code"],
+                name="cur_active_code_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="currencyrate",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["from_currency", "to_currency", "-date"],
+                name="rate_lookup_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,197 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0015_add_partial_active_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="transaction",
+            name="additional_advance_payment",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.additionaladvancepayment",
+                verbose_name="Дополнительная выдача подотчетных средств",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="advance_payment",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.advancepayment",
+                verbose_name="Выдача подотчетных средств",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="advance_report",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.advancereport",
+                verbose_name="Авансовый отчет",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="advance_report_item",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.advancereportitem",
+                verbose_name="Строка авансового отчета",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="advance_return",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.advancereturn",
+                verbose_name="Возврат денег сотрудником",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="cash_transfer",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.cashtransfer",
+                verbose_name="Перемещение между кассами",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="currency_conversion",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.currencyconversion",
+                verbose_name="Конвертация валют",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="expense_document",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.expensedocument",
+                verbose_name="Документ расхода",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="income_document",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="accounting.incomedocument",
+                verbose_name="Документ оприходования",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("income_document__isnull", False)),
+                fields=["income_document"],
+                name="tx_income_doc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("expense_document__isnull", False)),
+                fields=["expense_document"],
+                name="tx_expense_doc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("advance_report__isnull", False)),
+                fields=["advance_report"],
+                name="tx_adv_report_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("advance_report_item__isnull", False)),
+                fields=["advance_report_item"],
+                name="tx_adv_report_item_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("advance_return__isnull", False)),
+                fields=["advance_return"],
+                name="tx_adv_return_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("additional_advance_payment__isnull", False)),
+                fields=["additional_advance_payment"],
+                name="tx_add_adv_payment_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("cash_transfer__isnull", False)),
+                fields=["cash_transfer"],
+                name="tx_cash_transfer_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("currency_conversion__isnull", False)),
+                fields=["currency_conversion"],
+                name="tx_conversion_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.8 on 2026-10-16 01:54
+
+import functools
+import operator
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Поле документа-источника для каждого типа операции (на момент миграции)
+TRANSACTION_SOURCE_FIELDS = {
+    "income": "income_document",
+    "expense": "expense_document",
+    "advance_payment": "advance_payment",
+    "advance_report": "advance_report",
+    "advance_return": "advance_return",
+    "advance_return_report": "advance_report",
+    "additional_advance_payment": "additional_advance_payment",
+    "advance_additional": "advance_report",
+    "transfer": "cash_transfer",
+    "conversion": "currency_conversion",
+}
+
+# Сколько id операций без документа выводить в сообщении об ошибке
+REPORTED_IDS_LIMIT = 20
+
+
+def check_source_documents(apps, schema_editor):
+    """
+    Проверить, что у всех операций заполнен документ-источник их типа, до добавления ограничения.
+    Операции без документа (например, добавленные вручную через админку) автоматически
+    не исправляются: удаление изменило бы остатки. Миграция останавливается со списком id.
+    """
+    Transaction = apps.get_model("accounting", "Transaction")
+    has_source = functools.reduce(
+        operator.or_,
+        [
+            models.Q(transaction_type=transaction_type, **{f"{field_name}__isnull": False})
+            for transaction_type, field_name in TRANSACTION_SOURCE_FIELDS.items()
+        ],
+    )
+    orphans = Transaction.objects.using(schema_editor.connection.alias).exclude(has_source)
+    ids = list(orphans.order_by("pk").values_list("pk", flat=True)[:REPORTED_IDS_LIMIT])
+    if ids:
+        raise RuntimeError(
+            f"Операций без документа-источника: {orphans.count()} (id: {', '.join(map(str, ids))}). "
+            f"Привяжите их к документам или удалите (проверив остатки касс) и повторите миграцию."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0016_transaction_partial_document_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_source_documents, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="transaction",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    models.Q(
+                        ("income_document__isnull", False),
+                        ("transaction_type", "income"),
+                    ),
+                    models.Q(
+                        ("expense_document__isnull", False),
+                        ("transaction_type", "expense"),
+                    ),
+                    models.Q(
+                        ("advance_payment__isnull", False),
+                        ("transaction_type", "advance_payment"),
+                    ),
+                    models.Q(
+                        ("advance_report__isnull", False),
+                        ("transaction_type", "advance_report"),
+                    ),
+                    models.Q(
+                        ("advance_return__isnull", False),
+                        ("transaction_type", "advance_return"),
+                    ),
+                    models.Q(
+                        ("advance_report__isnull", False),
+                        ("transaction_type", "advance_return_report"),
+                    ),
+                    models.Q(
+                        ("additional_advance_payment__isnull", False),
+                        ("transaction_type", "additional_advance_payment"),
+                    ),
+                    models.Q(
+                        ("advance_report__isnull", False),
+                        ("transaction_type", "advance_additional"),
+                    ),
+                    models.Q(
+                        ("cash_transfer__isnull", False),
+                        ("transaction_type", "transfer"),
+                    ),
+                    models.Q(
+                        ("currency_conversion__isnull", False),
+                        ("transaction_type", "conversion"),
+                    ),
+                    _connector="OR",
+                ),
+                name="tx_has_source_document",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-16 02:10
+
+from django.db import migrations
+
+# Свободное место на страницах таблицы операций: обновления операций при пересохранении
+# документов и пересчете is_active остаются на той же странице (HOT-обновления PostgreSQL)
+TRANSACTION_FILLFACTOR = 90
+
+
+def set_fillfactor(apps, schema_editor, fillfactor=TRANSACTION_FILLFACTOR):
+    """Задать fillfactor таблицы операций (только PostgreSQL)"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Transaction = apps.get_model("accounting", "Transaction")
+    table = schema_editor.quote_name(Transaction._meta.db_table)
+    schema_editor.execute(f"ALTER TABLE {table} SET (fillfactor = {int(fillfactor)})")
+
+
+def reset_fillfactor(apps, schema_editor):
+    """Вернуть fillfactor таблицы операций по умолчанию (только PostgreSQL)"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Transaction = apps.get_model("accounting", "Transaction")
+    table = schema_editor.quote_name(Transaction._meta.db_table)
+    schema_editor.execute(f"ALTER TABLE {table} RESET (fillfactor)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0017_add_transaction_source_constraint"),
+    ]
+
+    operations = [
+        migrations.RunPython(set_fillfactor, reset_fillfactor),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-16 02:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0018_set_transaction_fillfactor"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(
+                    ("advance_report__isnull", False),
+                    ("transaction_type", "advance_return_report"),
+                ),
+                fields=["advance_payment", "currency", "amount"],
+                name="tx_adv_return_report_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-16 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0019_add_advance_return_report_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="additionaladvancepayment",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["original_advance_payment", "currency", "amount"],
+                name="add_adv_payment_sum_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advancereturn",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["advance_payment", "currency", "amount"],
+                name="adv_return_sum_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-16 02:23
+
+import django.db.models.expressions
+from decimal import Decimal
+from django.db import migrations, models
+
+# Допуск расхождения to_amount с from_amount * exchange_rate (как CONVERSION_TOLERANCE в модели)
+CONVERSION_TOLERANCE = Decimal("0.015")
+
+# Сколько id конвертаций с расхождением выводить в сообщении об ошибке
+REPORTED_IDS_LIMIT = 20
+
+
+def check_conversion_rates(apps, schema_editor):
+    """
+    Проверить, что у всех конвертаций сумма зачисления соответствует курсу, до добавления ограничения.
+    Такие документы не исправляются автоматически: пересчёт суммы изменил бы остатки касс.
+    Миграция останавливается со списком id.
+    """
+    CurrencyConversion = apps.get_model("accounting", "CurrencyConversion")
+    expected = models.F("from_amount") * models.F("exchange_rate")
+    violating = CurrencyConversion.objects.using(schema_editor.connection.alias).filter(
+        models.Q(to_amount__lt=expected - CONVERSION_TOLERANCE)
+        | models.Q(to_amount__gt=expected + CONVERSION_TOLERANCE)
+    )
+    ids = list(
+        violating.order_by("pk").values_list("pk", flat=True)[:REPORTED_IDS_LIMIT]
+    )
+    if ids:
+        raise RuntimeError(
+            f"Конвертаций с суммой зачисления не по курсу: {violating.count()} (id: {', '.join(map(str, ids))}). "
+            f"Исправьте курс или суммы этих документов и повторите миграцию."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0020_add_advance_sum_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_conversion_rates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="currencyconversion",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    (
+                        "to_amount__gte",
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.expressions.CombinedExpression(
+                                models.F("from_amount"), "*", models.F("exchange_rate")
+                            ),
+                            "-",
+                            models.Value(Decimal("0.015")),
+                        ),
+                    ),
+                    (
+                        "to_amount__lte",
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.expressions.CombinedExpression(
+                                models.F("from_amount"), "*", models.F("exchange_rate")
+                            ),
+                            "+",
+                            models.Value(Decimal("0.015")),
+                        ),
+                    ),
+                ),
+                name="cc_rate_consistency",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-16 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0021_add_conversion_rate_check"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["cash_register", "currency", "date", "is_active", "amount"],
+                name="tx_balance_date_idx",
+            ),
+        ),
+    ]
@@ -2,16 +2,55 @@
 Модели данных для системы финансового учета.
 Все модели соответствуют техническому заданию версии 2.0.
 """
+import functools
+import json
+import operator
 from decimal import Decimal
-from django.db import models
+from django.db import connections, models, router, transaction as db_transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.db.models import Sum, Q
+from django.db.models.functions import Abs, Coalesce
 from .abstract_models import (
     BaseDocument, BaseReference, BaseOperationRegister, BaseAccumulationRegister
 )
 
 
+# Точность денежных сумм и округления курса в наименовании
+TWO_PLACES = Decimal('0.01')
+
+# Разделитель разрядов сумм в наименованиях документов: пробел вместо запятой
+# (format(x, ',.2f').translate(...) - одна замена без промежуточной строки replace)
+AMOUNT_GROUPING = str.maketrans(',', ' ')
+
+# Допустимое отклонение суммы конвертации от точного произведения суммы на курс:
+# clean() допускает копейку от округленного произведения, округление дает еще половину копейки
+CONVERSION_TOLERANCE = Decimal('0.015')
+
+
+def _document_not_deleted(field_name):
+    """Условие: операция не связана с документом field_name или документ не удален"""
+    return Q(**{f'{field_name}__isnull': True}) | Q(**{f'{field_name}__is_deleted': False})
+
+
+# Условия собираются один раз при импорте и переиспользуются во всех расчетах остатков
+ADVANCE_REPORT_NOT_DELETED = _document_not_deleted('advance_report')
+ADVANCE_RETURN_NOT_DELETED = _document_not_deleted('advance_return')
+
+# Операции из удаленных документов не учитываются в остатках (согласно ТЗ раздел 3.1.1).
+# Результат проверки хранится в Transaction.is_active (см. Transaction.refresh_is_active)
+TRANSACTION_NOT_DELETED = functools.reduce(operator.and_, [
+    _document_not_deleted('income_document'),
+    _document_not_deleted('expense_document'),
+    _document_not_deleted('advance_payment'),
+    ADVANCE_REPORT_NOT_DELETED,
+    ADVANCE_RETURN_NOT_DELETED,
+    _document_not_deleted('additional_advance_payment'),
+    _document_not_deleted('cash_transfer'),
+    _document_not_deleted('currency_conversion'),
+])
+
+
 # ============================================================================
 # СПРАВОЧНИКИ
 # ============================================================================
@@ -33,6 +72,10 @@ class Currency(BaseReference):
         verbose_name = 'Валюта'
         verbose_name_plural = 'Валюты'
         ordering = ['code']
+        indexes = [
+            # Списки активных валют в формах и фильтрах, упорядоченные по коду
+            models.Index(fields=['code'], condition=models.Q(is_active=True), name='cur_active_code_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['code'],
@@ -47,32 +90,42 @@ class Currency(BaseReference):
 
 class CashRegister(BaseReference):
     """Справочник касс"""
+    display_name = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Отображаемое название',
+        help_text='Название с кодом, заполняется автоматически при сохранении'
+    )
+    
+    def build_display_name(self):
+        """Название кассы с кодом"""
+        if self.code:
+            return f"{self.name} ({self.code})"
+        return self.name
+    
+    # Запомненная строка остатков (см. get_balances_string)
+    _balances_string = None
+    
+    def save(self, *args, **kwargs):
+        # Код генерируется в BaseReference.save(), поэтому заполняем его здесь заранее
+        if not self.code:
+            self.code = self.generate_reference_code()
+        self.display_name = self.build_display_name()
+        self._balances_string = None
+        super().save(*args, **kwargs)
     
     def get_balance(self, currency, date=None):
         """
         Получить остаток по кассе в указанной валюте на определенную дату.
         Использует регистр операций (Transaction).
         """
-        # Ленивый импорт для избежания циклического импорта
-        from django.apps import apps
-        Transaction = apps.get_model('accounting', 'Transaction')
-        
-        # Фильтруем операции по кассе и валюте
+        # Фильтруем операции по кассе и валюте, исключая операции из удаленных документов
         queryset = Transaction.objects.filter(
             cash_register=self,
-            currency=currency
-        )
-        
-        # Исключаем операции из удаленных документов (согласно ТЗ раздел 3.1.1)
-        queryset = queryset.filter(
-            Q(income_document__isnull=True) | Q(income_document__is_deleted=False),
-            Q(expense_document__isnull=True) | Q(expense_document__is_deleted=False),
-            Q(advance_payment__isnull=True) | Q(advance_payment__is_deleted=False),
-            Q(advance_report__isnull=True) | Q(advance_report__is_deleted=False),
-            Q(advance_return__isnull=True) | Q(advance_return__is_deleted=False),
-            Q(additional_advance_payment__isnull=True) | Q(additional_advance_payment__is_deleted=False),
-            Q(cash_transfer__isnull=True) | Q(cash_transfer__is_deleted=False),
-            Q(currency_conversion__isnull=True) | Q(currency_conversion__is_deleted=False),
+            currency=currency,
+            is_active=True
         )
         
         # Если указана дата, фильтруем по дате
@@ -86,48 +139,71 @@ class CashRegister(BaseReference):
     
     def get_balances_string(self):
         """
-        Получить строку с остатками по всем активным валютам для отображения в autocomplete.
+        Получить строку с остатками по всем активным валютам (см. display_with_balances).
+        Результат запоминается в экземпляре: остатки нужны на момент загрузки объекта.
         """
         if not self.pk:
             return ''
         
-        # Ленивый импорт для избежания циклического импорта
-        from django.apps import apps
-        Currency = apps.get_model('accounting', 'Currency')
-        
-        # Получаем все активные валюты
-        currencies = Currency.objects.filter(is_active=True).order_by('code')
-        
-        if not currencies.exists():
-            return ''
-        
-        # Получаем остатки по каждой валюте
-        balances = []
-        for currency in currencies:
-            balance = self.get_balance(currency)
-            if balance != Decimal('0.00'):
-                balances.append(f"{currency.code}: {balance:,.2f}")
+        if self._balances_string is None:
+            self._balances_string = self._build_balances_string()
+        return self._balances_string
+    
+    def _build_balances_string(self):
+        balances = [
+            f"{code}: {balance:,.2f}"
+            for code, balance in CashRegister.get_current_balances([self]).get(self.pk, [])
+        ]
         
         if not balances:
             return ''
         
         return f" ({', '.join(balances)})"
 
-    def __str__(self):
+    @staticmethod
+    def get_current_balances(cash_registers):
         """
-        Переопределяем __str__ для отображения кассы с остатками по валютам.
-        Используется в autocomplete и других местах.
+        Текущие ненулевые остатки нескольких касс по активным валютам одним запросом.
+        Возвращает словарь {id кассы: [(код валюты, остаток), ...]} с валютами по порядку кодов.
         """
-        name = self.name
-        if self.code:
-            name = f"{self.name} ({self.code})"
-        
-        # Добавляем остатки по валютам
-        balances_str = self.get_balances_string()
-        if balances_str:
-            name += balances_str
+        # Остатки по всем активным валютам с группировкой по кассе и валюте
+        totals = Transaction.objects.filter(
+            cash_register__in=[cash_register.pk for cash_register in cash_registers],
+            currency__is_active=True,
+            is_active=True
+        ).values('cash_register', 'currency__code').annotate(total=Sum('amount')).order_by('currency__code')
         
-        return name
+        balances = {}
+        for row in totals:
+            if row['total'] != Decimal('0.00'):
+                balances.setdefault(row['cash_register'], []).append((row['currency__code'], row['total']))
+        return balances
+
+    @staticmethod
+    def get_balances_map(cash_registers, currencies, before=None):
+        """
+        Остатки нескольких касс в нескольких валютах одним запросом с группировкой:
+        {(id кассы, id валюты): остаток}. before - момент времени, операции с этого момента
+        не учитываются (например, начало дня, следующего за датой отчета). Пары без операций
+        в словарь не попадают.
+        """
+        queryset = Transaction.objects.filter(
+            cash_register__in=[cash_register.pk for cash_register in cash_registers],
+            currency__in=[currency.pk for currency in currencies],
+            is_active=True
+        )
+        if before is not None:
+            queryset = queryset.filter(date__lt=before)
+        rows = queryset.values('cash_register', 'currency').annotate(total=Sum('amount')).order_by()
+        return {(row['cash_register'], row['currency']): row['total'] for row in rows}
+
+    def display_with_balances(self):
+        """Название кассы с остатками по валютам"""
+        return f"{self}{self.get_balances_string()}"
+
+    def __str__(self):
+        # Без остатков: __str__ вызывается в списках, фильтрах и виджетах и не должен обращаться к БД
+        return self.display_name or self.build_display_name()
 
     class Meta:
         verbose_name = 'Касса'
@@ -195,6 +271,14 @@ class Employee(BaseReference):
         blank=True,
         verbose_name='Должность'
     )
+    display_name = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Отображаемое имя',
+        help_text='Полное имя, заполняется автоматически при сохранении'
+    )
 
     @property
     def full_name(self):
@@ -204,70 +288,143 @@ class Employee(BaseReference):
             parts.append(self.middle_name)
         return ' '.join(parts)
 
+    # Запомненные остатки подотчетных средств (см. get_advance_balances)
+    _advance_balances = None
+
+    def save(self, *args, **kwargs):
+        self.display_name = self.full_name
+        self._advance_balances = None
+        super().save(*args, **kwargs)
+
     def get_advance_balance(self, currency):
         """
         Получить остаток подотчетных средств в указанной валюте.
         Использует регистр накоплений.
         
-        Остатки рассчитываются динамически на основе операций из регистра операций.
+        Остатки рассчитываются динамически на основе документов и операций из регистра операций.
+        """
+        return self.get_advance_balances().get(currency.pk, Decimal('0.00'))
+    
+    def get_advance_balances(self):
+        """
+        Остатки подотчетных средств по всем валютам одним запросом: {id валюты: остаток}.
+        Результат запоминается в экземпляре, чтобы обход валют не повторял запрос.
+        """
+        if self._advance_balances is None:
+            rows = self.annotate_advance_balance(Currency.objects.all()).values_list('pk', 'advance_balance')
+            # SQLite возвращает суммы без фиксированного числа знаков
+            self._advance_balances = {
+                currency_id: balance.quantize(TWO_PLACES)
+                for currency_id, balance in rows
+            }
+        return self._advance_balances
+    
+    @staticmethod
+    def get_advance_balances_map(employees):
+        """
+        Остатки подотчетных средств нескольких сотрудников по всем валютам:
+        {(id сотрудника, id валюты): остаток}. Каждая составляющая остатка (см. annotate_advance_balance)
+        считается одним запросом с группировкой по сотруднику и валюте, а не запросом на сотрудника.
         """
-        # Ленивый импорт для избежания циклического импорта
-        from django.apps import apps
+        employee_ids = [employee.pk for employee in employees]
+        components = {}
+        
+        def total(queryset, employee_field, currency_field, field='amount'):
+            """Суммы поля field по queryset: {(id сотрудника, id валюты): сумма}"""
+            rows = queryset.filter(**{f'{employee_field}__in': employee_ids}).order_by().values(
+                employee_field, currency_field
+            ).annotate(total=Sum(field)).values_list(employee_field, currency_field, 'total')
+            totals = {(employee_id, currency_id): amount for employee_id, currency_id, amount in rows}
+            components.update(dict.fromkeys(totals))
+            return totals
+        
+        issued = total(AdvancePayment.objects.filter(is_deleted=False), 'employee', 'currency')
+        additional = total(
+            AdditionalAdvancePayment.objects.filter(is_deleted=False),
+            'original_advance_payment__employee', 'original_advance_payment__currency'
+        )
+        confirmed_reports = total(
+            AdvanceReport.objects.filter(status='confirmed', is_deleted=False),
+            'advance_payment__employee', 'advance_payment__currency', 'total_amount'
+        )
+        returns = total(
+            Transaction.objects.filter(
+                transaction_type__in=['advance_return', 'advance_return_report']
+            ).filter(ADVANCE_RETURN_NOT_DELETED, ADVANCE_REPORT_NOT_DELETED),
+            'employee', 'currency'
+        )
+        additional_payments = total(
+            Transaction.objects.filter(transaction_type='advance_additional').filter(ADVANCE_REPORT_NOT_DELETED),
+            'employee', 'currency'
+        )
         
-        # Пытаемся получить модели документов (могут быть не реализованы)
-        try:
-            AdvancePayment = apps.get_model('accounting', 'AdvancePayment')
-            AdditionalAdvancePayment = apps.get_model('accounting', 'AdditionalAdvancePayment')
-            AdvanceReport = apps.get_model('accounting', 'AdvanceReport')
-            Transaction = apps.get_model('accounting', 'Transaction')
-            
-            # Выданные суммы (первоначальные выдачи + дополнительные выдачи)
-            issued = AdvancePayment.objects.filter(
-                employee=self,
-                currency=currency,
-                is_deleted=False
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            additional = AdditionalAdvancePayment.objects.filter(
-                original_advance_payment__employee=self,
-                original_advance_payment__currency=currency,
-                is_deleted=False
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            total_issued = issued + additional
-            
-            # Подтвержденные отчеты (только подтвержденные)
-            confirmed_reports = AdvanceReport.objects.filter(
-                advance_payment__employee=self,
-                advance_payment__currency=currency,
-                status='confirmed',
-                is_deleted=False
-            ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-            
-            # Возвраты (отдельные документы + возвраты по отчетам)
-            returns = Transaction.objects.filter(
+        # Остаток = Выданные - Отчитанные - Возвраты + Доплаты
+        zero = Decimal('0.00')
+        return {
+            key: (
+                issued.get(key, zero) + additional.get(key, zero) - confirmed_reports.get(key, zero)
+                - abs(returns.get(key, zero)) + additional_payments.get(key, zero)
+            ).quantize(TWO_PLACES)
+            for key in components
+        }
+    
+    def annotate_advance_balance(self, currencies):
+        """
+        Добавить к queryset валют остаток подотчетных средств сотрудника (advance_balance).
+        Каждая составляющая - подзапрос с суммой по документам или операциям в валюте строки.
+        """
+        amount_field = models.DecimalField(max_digits=15, decimal_places=2)
+        zero = models.Value(Decimal('0.00'), output_field=amount_field)
+        
+        def total(queryset, currency_field, field='amount'):
+            """Сумма поля field по queryset в валюте текущей строки"""
+            subquery = queryset.filter(
+                **{currency_field: models.OuterRef('pk')}
+            ).order_by().values(currency_field).annotate(total=Sum(field)).values('total')
+            return Coalesce(models.Subquery(subquery), zero)
+        
+        # Выданные суммы (первоначальные выдачи + дополнительные выдачи)
+        issued = total(
+            AdvancePayment.objects.filter(employee=self, is_deleted=False),
+            'currency'
+        )
+        additional = total(
+            AdditionalAdvancePayment.objects.filter(original_advance_payment__employee=self, is_deleted=False),
+            'original_advance_payment__currency'
+        )
+        
+        # Подтвержденные отчеты (только подтвержденные)
+        confirmed_reports = total(
+            AdvanceReport.objects.filter(advance_payment__employee=self, status='confirmed', is_deleted=False),
+            'advance_payment__currency',
+            'total_amount'
+        )
+        
+        # Возвраты (отдельные документы + возвраты по отчетам)
+        returns = total(
+            Transaction.objects.filter(
                 employee=self,
-                currency=currency,
                 transaction_type__in=['advance_return', 'advance_return_report']
-            ).exclude(
-                Q(advance_return__isnull=False, advance_return__is_deleted=True) |
-                Q(advance_report__isnull=False, advance_report__is_deleted=True)
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            # Доплаты
-            additional_payments = Transaction.objects.filter(
+            ).filter(ADVANCE_RETURN_NOT_DELETED, ADVANCE_REPORT_NOT_DELETED),
+            'currency'
+        )
+        
+        # Доплаты
+        additional_payments = total(
+            Transaction.objects.filter(
                 employee=self,
-                currency=currency,
                 transaction_type='advance_additional'
-            ).exclude(advance_report__isnull=False, advance_report__is_deleted=True).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            # Остаток = Выданные - Отчитанные - Возвраты + Доплаты
-            balance = total_issued - confirmed_reports - abs(returns) + additional_payments
-            
-            return balance
-        except LookupError:
-            # Модели документов еще не реализованы
-            return Decimal('0.00')
+            ).filter(ADVANCE_REPORT_NOT_DELETED),
+            'currency'
+        )
+        
+        # Остаток = Выданные - Отчитанные - Возвраты + Доплаты
+        return currencies.annotate(
+            advance_balance=models.ExpressionWrapper(
+                issued + additional - confirmed_reports - Abs(returns) + additional_payments,
+                output_field=amount_field
+            )
+        )
 
     class Meta:
         verbose_name = 'Сотрудник'
@@ -282,7 +439,7 @@ class Employee(BaseReference):
         ]
 
     def __str__(self):
-        return self.full_name
+        return self.display_name or self.full_name
 
 
 class CurrencyRate(BaseReference):
@@ -317,21 +474,19 @@ class CurrencyRate(BaseReference):
         """
         Получить курс обмена для пары валют на указанную дату.
         Используется курс на указанную дату или ближайшую предыдущую дату.
+        Результат кэшируется в процессе (см. _get_rate_cached).
         """
-        rate = cls.objects.filter(
-            from_currency=from_currency,
-            to_currency=to_currency,
-            date__lte=date,
-            is_active=True
-        ).order_by('-date').first()
-        
-        return rate.rate if rate else None
+        return _get_rate_cached(
+            getattr(from_currency, 'pk', from_currency),
+            getattr(to_currency, 'pk', to_currency),
+            date
+        )
 
     def _auto_fill_name(self):
         """Автоматическое заполнение наименования, если не заполнено"""
         if not self.name and self.from_currency and self.to_currency and self.rate:
             # Округляем курс до сотых (2 знака после запятой)
-            rate_rounded = self.rate.quantize(Decimal('0.01'))
+            rate_rounded = self.rate.quantize(TWO_PLACES)
             self.name = f"{self.from_currency.code} - {rate_rounded} - {self.to_currency.code}"
     
     def clean(self):
@@ -351,8 +506,8 @@ class CurrencyRate(BaseReference):
         # Заполняем наименование ПЕРЕД валидацией
         self._auto_fill_name()
         
-        # Вызываем full_clean() для валидации (теперь наименование уже заполнено)
-        self.full_clean()
+        # full_clean() вызывается в BaseReference.save() после генерации кода,
+        # при загрузке курсов его можно пропустить: save(skip_validation=True)
         super().save(*args, **kwargs)
 
     class Meta:
@@ -360,7 +515,13 @@ class CurrencyRate(BaseReference):
         verbose_name_plural = 'Курсы валют'
         unique_together = [['from_currency', 'to_currency', 'date']]
         indexes = [
-            models.Index(fields=['from_currency', 'to_currency', 'date']),
+            # Поиск действующего курса в _get_rate_cached: только активные курсы, последние даты первыми.
+            # Неусловный индекс по (from_currency, to_currency, date) уже создан unique_together
+            models.Index(
+                fields=['from_currency', 'to_currency', '-date'],
+                condition=models.Q(is_active=True),
+                name='rate_lookup_idx'
+            ),
         ]
         ordering = ['-date', 'from_currency', 'to_currency']
         constraints = [
@@ -375,24 +536,78 @@ class CurrencyRate(BaseReference):
         return f"{self.from_currency.code}/{self.to_currency.code} = {self.rate} на {self.date}"
 
 
+@functools.lru_cache(maxsize=4096)
+def _get_rate_cached(from_currency_id, to_currency_id, date):
+    """
+    Курс обмена по id валют на дату.
+    Кэш сбрасывается при изменении курсов и по окончании каждого запроса (см. signals),
+    поэтому курсы, измененные другими процессами, не остаются в кэше надолго.
+    """
+    return CurrencyRate.objects.filter(
+        from_currency_id=from_currency_id,
+        to_currency_id=to_currency_id,
+        date__lte=date,
+        is_active=True
+    ).order_by('-date').values_list('rate', flat=True).first()
+
+
 # ============================================================================
 # ЖУРНАЛ ОПЕРАЦИЙ
 # ============================================================================
 
+# Поле со ссылкой на документ-источник для каждого типа операции (Transaction.DOCUMENT_FIELDS)
+TRANSACTION_SOURCE_FIELDS = {
+    'income': 'income_document',
+    'expense': 'expense_document',
+    'advance_payment': 'advance_payment',
+    'advance_report': 'advance_report',
+    'advance_return': 'advance_return',
+    'advance_return_report': 'advance_report',
+    'additional_advance_payment': 'additional_advance_payment',
+    'advance_additional': 'advance_report',
+    'transfer': 'cash_transfer',
+    'conversion': 'currency_conversion',
+}
+
+
+class TransactionQuerySet(models.QuerySet):
+    """QuerySet журнала операций"""
+    
+    def with_references(self):
+        """Загрузить справочники, выводимые в списках и отчетах (и в __str__), тем же запросом"""
+        return self.select_related('cash_register', 'currency', 'item', 'employee')
+
+
 class Transaction(BaseOperationRegister):
-    """Журнал операций (Операция)"""
-    TRANSACTION_TYPE_CHOICES = [
-        ('income', 'Оприходование денег'),
-        ('expense', 'Расход денег'),
-        ('advance_payment', 'Выдача подотчетных'),
-        ('advance_report', 'Авансовый отчет (строка отчета)'),
-        ('advance_return', 'Возврат денег сотрудником (отдельный документ возврата)'),
-        ('advance_return_report', 'Возврат денег по авансовому отчету (в рамках авансового отчета)'),
-        ('additional_advance_payment', 'Дополнительная выдача подотчетных средств'),
-        ('advance_additional', 'Доплата по авансовому отчету'),
-        ('transfer', 'Перемещение между кассами'),
-        ('conversion', 'Конвертация валют'),
-    ]
+    """
+    Журнал операций (Операция).
+    Операции записываются синхронно в save() документа, в той же транзакции БД:
+    проведение документа, остатки и отчеты должны видеть операцию сразу после сохранения.
+    Для загрузки большого числа документов предназначен bulk_post документов.
+    """
+    class TransactionType(models.TextChoices):
+        """Типы операций"""
+        INCOME = 'income', 'Оприходование денег'
+        EXPENSE = 'expense', 'Расход денег'
+        ADVANCE_PAYMENT = 'advance_payment', 'Выдача подотчетных'
+        ADVANCE_REPORT = 'advance_report', 'Авансовый отчет (строка отчета)'
+        ADVANCE_RETURN = 'advance_return', 'Возврат денег сотрудником (отдельный документ возврата)'
+        ADVANCE_RETURN_REPORT = (
+            'advance_return_report', 'Возврат денег по авансовому отчету (в рамках авансового отчета)'
+        )
+        ADDITIONAL_ADVANCE_PAYMENT = 'additional_advance_payment', 'Дополнительная выдача подотчетных средств'
+        ADVANCE_ADDITIONAL = 'advance_additional', 'Доплата по авансовому отчету'
+        TRANSFER = 'transfer', 'Перемещение между кассами'
+        CONVERSION = 'conversion', 'Конвертация валют'
+    
+    TRANSACTION_TYPE_CHOICES = TransactionType.choices
+    # Названия типов операций для get_transaction_type_display (строится один раз)
+    TRANSACTION_TYPE_DISPLAY = dict(TRANSACTION_TYPE_CHOICES)
+    
+    # Поле со ссылкой на документ-источник для каждого типа операции
+    DOCUMENT_FIELDS = TRANSACTION_SOURCE_FIELDS
+    
+    objects = TransactionQuerySet.as_manager()
     
     transaction_type = models.CharField(
         max_length=30,
@@ -424,13 +639,15 @@ class Transaction(BaseOperationRegister):
         verbose_name='Сотрудник'
     )
     
-    # Связи с документами (согласно ТЗ раздел 3.5.1)
+    # Связи с документами (согласно ТЗ раздел 3.5.1).
+    # Почти все значения NULL, поэтому вместо обычных индексов - частичные (см. Meta.indexes)
     income_document = models.ForeignKey(
         'IncomeDocument',
         on_delete=models.CASCADE,
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Документ оприходования'
     )
     expense_document = models.ForeignKey(
@@ -439,6 +656,7 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Документ расхода'
     )
     advance_payment = models.ForeignKey(
@@ -447,6 +665,7 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Выдача подотчетных средств'
     )
     advance_report = models.ForeignKey(
@@ -455,6 +674,7 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Авансовый отчет'
     )
     advance_report_item = models.ForeignKey(
@@ -463,6 +683,7 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Строка авансового отчета'
     )
     advance_return = models.ForeignKey(
@@ -471,6 +692,7 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Возврат денег сотрудником'
     )
     additional_advance_payment = models.ForeignKey(
@@ -479,6 +701,7 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Дополнительная выдача подотчетных средств'
     )
     cash_transfer = models.ForeignKey(
@@ -487,6 +710,7 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Перемещение между кассами'
     )
     currency_conversion = models.ForeignKey(
@@ -495,8 +719,81 @@ class Transaction(BaseOperationRegister):
         null=True,
         blank=True,
         related_name='transactions',
+        db_index=False,
         verbose_name='Конвертация валют'
     )
+    is_active = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name='Действует',
+        help_text='Ни один из связанных документов не удален. Обновляется при сохранении документов'
+    )
+
+    def save(self, *args, **kwargs):
+        # Новая операция действует, если ни один из связанных документов не удален.
+        # Документы обычно уже загружены (операции создаются из save() документа), запросов нет
+        if self._state.adding:
+            self.is_active = not any(
+                getattr(self, field_name).is_deleted
+                for field_name in set(self.DOCUMENT_FIELDS.values())
+                if getattr(self, f'{field_name}_id') is not None
+            )
+        super().save(*args, **kwargs)
+
+    def get_transaction_type_display(self):
+        """
+        Название типа операции. Заменяет метод, который Django строит для поля с choices
+        и который собирает словарь вариантов при каждом вызове (списки, __str__, отчеты)
+        """
+        return self.TRANSACTION_TYPE_DISPLAY.get(self.transaction_type, self.transaction_type)
+
+    @property
+    def source_document(self):
+        """Документ-источник операции по ее типу (None, если ссылка не заполнена)"""
+        field_name = self.DOCUMENT_FIELDS.get(self.transaction_type)
+        # Проверяем *_id, чтобы не обращаться к связанному объекту пустого поля
+        if not field_name or not getattr(self, f'{field_name}_id'):
+            return None
+        return getattr(self, field_name)
+
+    @classmethod
+    def raw_bulk_insert(cls, transactions, batch_size=1000):
+        """
+        Массовая вставка операций. На PostgreSQL каждый пакет вставляется одним
+        INSERT ... SELECT FROM json_populate_recordset: строки передаются одним JSON-параметром,
+        а не отдельным параметром на каждое поле. На других СУБД используется bulk_create.
+        Первичный ключ (автоинкремент) назначает база данных; на PostgreSQL он не возвращается
+        в объекты операций (RETURNING не используется).
+        """
+        connection = connections[router.db_for_write(cls)]
+        if connection.vendor != 'postgresql':
+            return cls.objects.bulk_create(transactions, batch_size=batch_size)
+        
+        fields = [field for field in cls._meta.concrete_fields if not field.primary_key]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        sql = (
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT {columns} FROM json_populate_recordset(NULL::{table}, %s)'
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(transactions), batch_size):
+                rows = [
+                    {field.column: field.pre_save(transaction, add=True) for field in fields}
+                    for transaction in transactions[start:start + batch_size]
+                ]
+                cursor.execute(sql, [json.dumps(rows, default=str)])
+        return transactions
+
+    @classmethod
+    def refresh_is_active(cls, **filters):
+        """
+        Пересчитать признак is_active для операций, отобранных по filters
+        (обычно - по ссылке на сохраненный документ).
+        """
+        queryset = cls.objects.filter(**filters)
+        queryset.filter(TRANSACTION_NOT_DELETED, is_active=False).update(is_active=True)
+        queryset.exclude(TRANSACTION_NOT_DELETED).filter(is_active=True).update(is_active=False)
 
     class Meta:
         verbose_name = 'Операция'
@@ -505,6 +802,56 @@ class Transaction(BaseOperationRegister):
             models.Index(fields=['date', 'cash_register', 'currency']),
             models.Index(fields=['transaction_type', 'date']),
             models.Index(fields=['employee', 'date']),
+            # Возвраты и доплаты по отчетам в AdvancePayment.annotate_balances
+            models.Index(fields=['advance_payment', 'transaction_type']),
+            # Возвраты по отчетам в AdvanceReturn.clean: сумма входит в ключ индекса
+            models.Index(
+                fields=['advance_payment', 'currency', 'amount'],
+                condition=Q(transaction_type='advance_return_report', advance_report__isnull=False),
+                name='tx_adv_return_report_idx'
+            ),
+            # Остатки касс (CashRegister.get_balance) и подотчетных средств (Employee.annotate_advance_balance):
+            # сумма входит в ключ индекса, поэтому агрегат читается только из индекса
+            models.Index(fields=['cash_register', 'currency', 'is_active', 'amount'], name='tx_balance_idx'),
+            models.Index(fields=['employee', 'currency', 'transaction_type', 'amount'], name='tx_advance_balance_idx'),
+            # Остатки касс на дату (отчет «Остатки по кассам») и операции кассы в валюте за период:
+            # после диапазона по дате в ключ входят признак и сумма - агрегат читается только из индекса
+            models.Index(
+                fields=['cash_register', 'currency', 'date', 'is_active', 'amount'],
+                name='tx_balance_date_idx'
+            ),
+            # Поиск и удаление операций документа: в индекс попадают только строки со ссылкой.
+            # advance_payment покрыт индексом (advance_payment, transaction_type) выше
+            models.Index(fields=['income_document'], condition=Q(income_document__isnull=False), name='tx_income_doc_idx'),
+            models.Index(fields=['expense_document'], condition=Q(expense_document__isnull=False), name='tx_expense_doc_idx'),
+            models.Index(fields=['advance_report'], condition=Q(advance_report__isnull=False), name='tx_adv_report_idx'),
+            models.Index(
+                fields=['advance_report_item'],
+                condition=Q(advance_report_item__isnull=False),
+                name='tx_adv_report_item_idx'
+            ),
+            models.Index(fields=['advance_return'], condition=Q(advance_return__isnull=False), name='tx_adv_return_idx'),
+            models.Index(
+                fields=['additional_advance_payment'],
+                condition=Q(additional_advance_payment__isnull=False),
+                name='tx_add_adv_payment_idx'
+            ),
+            models.Index(fields=['cash_transfer'], condition=Q(cash_transfer__isnull=False), name='tx_cash_transfer_idx'),
+            models.Index(
+                fields=['currency_conversion'],
+                condition=Q(currency_conversion__isnull=False),
+                name='tx_conversion_idx'
+            ),
+        ]
+        constraints = [
+            # Каждая операция ссылается на документ-источник своего типа
+            models.CheckConstraint(
+                condition=functools.reduce(operator.or_, [
+                    Q(transaction_type=transaction_type, **{f'{field_name}__isnull': False})
+                    for transaction_type, field_name in TRANSACTION_SOURCE_FIELDS.items()
+                ]),
+                name='tx_has_source_document'
+            ),
         ]
 
     def __str__(self):
@@ -515,6 +862,36 @@ class Transaction(BaseOperationRegister):
 # ДОКУМЕНТЫ
 # ============================================================================
 
+# Описание операции документа без собственного описания: префикс + номер документа
+INCOME_DESCRIPTION_PREFIX = 'Оприходование денег №'
+EXPENSE_DESCRIPTION_PREFIX = 'Расход денег №'
+
+
+# Поля операций перемещения и конвертации, которые переписываются при пересохранении документа
+LEG_UPDATE_FIELDS = ('date', 'amount', 'description', 'cash_register', 'currency')
+
+
+def _write_document_legs(document, document_field, legs, is_new):
+    """
+    Записать операции документа с двумя операциями журнала (перемещение, конвертация).
+    legs - несохраненные операции в порядке создания: списание, затем поступление.
+    Для нового документа обе операции вставляются одним INSERT; при пересохранении
+    существующие операции обновляются на месте (в порядке pk) одним UPDATE
+    вместо удаления и повторной вставки.
+    """
+    if not is_new:
+        operations = Transaction.objects.filter(**{document_field: document})
+        pks = list(operations.order_by('pk').values_list('pk', flat=True))
+        if len(pks) == len(legs):
+            for leg, pk in zip(legs, pks):
+                leg.pk = pk
+            Transaction.objects.bulk_update(legs, LEG_UPDATE_FIELDS)
+            return
+        # На операции перемещений и конвертаций не ссылаются строки авансовых отчетов
+        operations._raw_delete(operations.db)
+    Transaction.objects.bulk_create(legs)
+
+
 class IncomeDocument(BaseDocument):
     """Оприходование денег"""
     cash_register = models.ForeignKey(
@@ -553,6 +930,12 @@ class IncomeDocument(BaseDocument):
     class Meta:
         verbose_name = 'Оприходование денег'
         verbose_name_plural = 'Оприходования денег'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['cash_register', 'date']),
+            models.Index(fields=['employee', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
@@ -560,47 +943,65 @@ class IncomeDocument(BaseDocument):
             )
         ]
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операции"""
+        """
+        Сохранение с автоматическим созданием операции.
+        Документ и его операция записываются в одной транзакции БД.
+        """
+        # Признак проведения записывается тем же INSERT/UPDATE, что и документ
+        # (для удаленного документа BaseDocument.save сбрасывает его сам)
+        if not self.is_deleted:
+            self.is_posted = True
+        # Пересохранение без изменений отражаемых полей не трогает журнал операций
+        mirror_changed = self.has_changed(self.TRANSACTION_MIRROR_FIELDS)
         super().save(*args, **kwargs)
         
+        if not mirror_changed:
+            return
         if not self.is_deleted:
-            # Создаем или обновляем операцию
-            transaction, created = Transaction.objects.get_or_create(
-                income_document=self,
-                defaults={
-                    'date': self.date,
-                    'transaction_type': 'income',
-                    'amount': self.amount,
-                    'description': self.description or f'Оприходование денег №{self.number}',
-                    'cash_register': self.cash_register,
-                    'currency': self.currency,
-                    'item': self.item,
-                    'employee': self.employee,
-                    'created_by': getattr(self, '_current_user', None),
-                }
-            )
-            
-            if not created:
-                # Обновляем существующую операцию
-                transaction.date = self.date
-                transaction.amount = self.amount
-                transaction.description = self.description or f'Оприходование денег №{self.number}'
-                transaction.cash_register = self.cash_register
-                transaction.currency = self.currency
-                transaction.item = self.item
-                transaction.employee = self.employee
-                transaction.save()
-            
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                IncomeDocument.objects.filter(pk=self.pk).update(is_posted=True)
+            # Обновляем операцию одним UPDATE без предварительного чтения;
+            # если операции еще нет (новый документ) - создаем
+            defaults = self._transaction_defaults()
+            if not Transaction.objects.filter(income_document=self).update(**defaults):
+                Transaction.objects.create(
+                    income_document=self,
+                    transaction_type='income',
+                    created_by=getattr(self, '_current_user', None),
+                    **defaults
+                )
         else:
-            # Удаляем операции при пометке на удаление
-            Transaction.objects.filter(income_document=self).delete()
-            if self.is_posted:
-                IncomeDocument.objects.filter(pk=self.pk).update(is_posted=False)
+            # Удаляем операции при пометке на удаление одним DELETE: на операции этого документа
+            # не ссылаются строки авансовых отчетов, сигналов удаления операций нет,
+            # поэтому сбор удаляемых объектов (SELECT + UPDATE report_item) не нужен
+            Transaction.objects.filter(income_document=self)._raw_delete(self._state.db)
+
+    # Поля документа, от которых зависит его операция в журнале (is_posted - операция уже создана)
+    TRANSACTION_MIRROR_FIELDS = (
+        'number', 'date', 'amount', 'description', 'cash_register_id', 'currency_id', 'item_id',
+        'employee_id', 'is_deleted', 'is_posted',
+    )
+
+    def _transaction_defaults(self):
+        """Поля операции журнала, отражающей документ"""
+        return {
+            'date': self.date,
+            'amount': self.amount,
+            'description': self.description or INCOME_DESCRIPTION_PREFIX + self.number,
+            'cash_register_id': self.cash_register_id,
+            'currency_id': self.currency_id,
+            'item_id': self.item_id,
+            'employee_id': self.employee_id,
+        }
+
+    def _transaction_legs(self, user=None):
+        """Несохраненные операции журнала документа (для bulk_post)"""
+        return [Transaction(
+            income_document=self,
+            transaction_type='income',
+            created_by=user,
+            **self._transaction_defaults()
+        )]
 
     def __str__(self):
         return f"Оприходование №{self.number} от {self.date.strftime('%d.%m.%Y')} - {self.amount} {self.currency.code}"
@@ -644,6 +1045,12 @@ class ExpenseDocument(BaseDocument):
     class Meta:
         verbose_name = 'Расход денег'
         verbose_name_plural = 'Расходы денег'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['cash_register', 'date']),
+            models.Index(fields=['employee', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
@@ -657,47 +1064,65 @@ class ExpenseDocument(BaseDocument):
         if self.amount <= 0:
             raise ValidationError({'amount': 'Сумма расхода должна быть положительной'})
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операции"""
+        """
+        Сохранение с автоматическим созданием операции.
+        Документ и его операция записываются в одной транзакции БД.
+        """
+        # Признак проведения записывается тем же INSERT/UPDATE, что и документ
+        # (для удаленного документа BaseDocument.save сбрасывает его сам)
+        if not self.is_deleted:
+            self.is_posted = True
+        # Пересохранение без изменений отражаемых полей не трогает журнал операций
+        mirror_changed = self.has_changed(self.TRANSACTION_MIRROR_FIELDS)
         super().save(*args, **kwargs)
         
+        if not mirror_changed:
+            return
         if not self.is_deleted:
-            # Создаем или обновляем операцию (отрицательная сумма)
-            transaction, created = Transaction.objects.get_or_create(
-                expense_document=self,
-                defaults={
-                    'date': self.date,
-                    'transaction_type': 'expense',
-                    'amount': -self.amount,  # Отрицательная сумма для расхода
-                    'description': self.description or f'Расход денег №{self.number}',
-                    'cash_register': self.cash_register,
-                    'currency': self.currency,
-                    'item': self.item,
-                    'employee': self.employee,
-                    'created_by': getattr(self, '_current_user', None),
-                }
-            )
-            
-            if not created:
-                # Обновляем существующую операцию
-                transaction.date = self.date
-                transaction.amount = -self.amount
-                transaction.description = self.description or f'Расход денег №{self.number}'
-                transaction.cash_register = self.cash_register
-                transaction.currency = self.currency
-                transaction.item = self.item
-                transaction.employee = self.employee
-                transaction.save()
-            
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                ExpenseDocument.objects.filter(pk=self.pk).update(is_posted=True)
+            # Обновляем операцию (отрицательная сумма) одним UPDATE без предварительного чтения;
+            # если операции еще нет (новый документ) - создаем
+            defaults = self._transaction_defaults()
+            if not Transaction.objects.filter(expense_document=self).update(**defaults):
+                Transaction.objects.create(
+                    expense_document=self,
+                    transaction_type='expense',
+                    created_by=getattr(self, '_current_user', None),
+                    **defaults
+                )
         else:
-            # Удаляем операции при пометке на удаление
-            Transaction.objects.filter(expense_document=self).delete()
-            if self.is_posted:
-                ExpenseDocument.objects.filter(pk=self.pk).update(is_posted=False)
+            # Удаляем операции при пометке на удаление одним DELETE: на операции этого документа
+            # не ссылаются строки авансовых отчетов, сигналов удаления операций нет,
+            # поэтому сбор удаляемых объектов (SELECT + UPDATE report_item) не нужен
+            Transaction.objects.filter(expense_document=self)._raw_delete(self._state.db)
+
+    # Поля документа, от которых зависит его операция в журнале (is_posted - операция уже создана)
+    TRANSACTION_MIRROR_FIELDS = (
+        'number', 'date', 'amount', 'description', 'cash_register_id', 'currency_id', 'item_id',
+        'employee_id', 'is_deleted', 'is_posted',
+    )
+
+    def _transaction_defaults(self):
+        """Поля операции журнала, отражающей документ (отрицательная сумма)"""
+        return {
+            'date': self.date,
+            'amount': -self.amount,  # Отрицательная сумма для расхода
+            'description': self.description or EXPENSE_DESCRIPTION_PREFIX + self.number,
+            'cash_register_id': self.cash_register_id,
+            'currency_id': self.currency_id,
+            'item_id': self.item_id,
+            'employee_id': self.employee_id,
+        }
+
+    def _transaction_legs(self, user=None):
+        """Несохраненные операции журнала документа (для bulk_post)"""
+        return [Transaction(
+            expense_document=self,
+            transaction_type='expense',
+            created_by=user,
+            **self._transaction_defaults()
+        )]
 
     def __str__(self):
         return f"Расход №{self.number} от {self.date.strftime('%d.%m.%Y')} - {self.amount} {self.currency.code}"
@@ -707,6 +1132,14 @@ class ExpenseDocument(BaseDocument):
 # ДОКУМЕНТЫ ПОДОТЧЕТНЫХ СРЕДСТВ
 # ============================================================================
 
+class AdvancePaymentQuerySet(models.QuerySet):
+    """QuerySet выдач подотчетных средств"""
+    
+    def with_balance(self):
+        """Посчитать доп. выдачи и не закрытый остаток тем же запросом (см. AdvancePayment.annotate_balances)"""
+        return self.model.annotate_balances(self)
+
+
 class AdvancePayment(BaseDocument):
     """Выдача денег подотчетному лицу"""
     employee = models.ForeignKey(
@@ -748,9 +1181,17 @@ class AdvancePayment(BaseDocument):
         verbose_name='Дата закрытия'
     )
 
+    objects = AdvancePaymentQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Выдача денег подотчетному лицу'
         verbose_name_plural = 'Выдачи денег подотчетным лицам'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['cash_register', 'date']),
+            models.Index(fields=['employee', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
@@ -764,58 +1205,65 @@ class AdvancePayment(BaseDocument):
         if self.amount <= 0:
             raise ValidationError({'amount': 'Сумма выдачи должна быть положительной'})
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операции"""
+        """
+        Сохранение с автоматическим созданием операции.
+        Документ и его операция записываются в одной транзакции БД.
+        """
+        self._unreported_balance_cache = None
+        # Признак проведения записывается тем же INSERT/UPDATE, что и документ
+        # (для удаленного документа BaseDocument.save сбрасывает его сам)
+        if not self.is_deleted:
+            self.is_posted = True
+        # Пересохранение без изменений отражаемых полей (например, закрытие выдачи)
+        # не трогает журнал операций
+        mirror_changed = self.has_changed(self.TRANSACTION_MIRROR_FIELDS)
         super().save(*args, **kwargs)
         
+        if not mirror_changed:
+            return
         if not self.is_deleted:
-            # Ленивый импорт для избежания циклического импорта
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            
-            # Создаем или обновляем операцию (отрицательная сумма)
-            transaction, created = Transaction.objects.get_or_create(
-                advance_payment=self,
-                defaults={
-                    'date': self.date,
-                    'transaction_type': 'advance_payment',
-                    'amount': -self.amount,  # Отрицательная сумма для расхода
-                    'description': f'Выдача подотчетных средств №{self.number}',
-                    'cash_register': self.cash_register,
-                    'currency': self.currency,
-                    'item': self.expense_item,
-                    'employee': self.employee,
-                    'created_by': getattr(self, '_current_user', None),
-                }
-            )
-            
-            if not created:
-                # Обновляем существующую операцию
-                transaction.date = self.date
-                transaction.amount = -self.amount
-                transaction.description = f'Выдача подотчетных средств №{self.number}'
-                transaction.cash_register = self.cash_register
-                transaction.currency = self.currency
-                transaction.item = self.expense_item
-                transaction.employee = self.employee
-                transaction.save()
-            
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                AdvancePayment.objects.filter(pk=self.pk).update(is_posted=True)
+            # Обновляем операцию выдачи одним UPDATE без предварительного чтения;
+            # если операции еще нет (новый документ) - создаем.
+            # Тип операции обязателен в условии: возвраты и доплаты по авансовым отчетам
+            # тоже ссылаются на выдачу
+            defaults = self._transaction_defaults()
+            if not Transaction.objects.filter(advance_payment=self, transaction_type='advance_payment').update(**defaults):
+                Transaction.objects.create(
+                    advance_payment=self,
+                    transaction_type='advance_payment',
+                    created_by=getattr(self, '_current_user', None),
+                    **defaults
+                )
         else:
             # Удаляем операции при пометке на удаление
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
             Transaction.objects.filter(advance_payment=self).delete()
-            if self.is_posted:
-                AdvancePayment.objects.filter(pk=self.pk).update(is_posted=False)
+
+    # Поля документа, от которых зависит его операция в журнале (is_posted - операция уже создана)
+    TRANSACTION_MIRROR_FIELDS = (
+        'number', 'date', 'amount', 'cash_register_id', 'currency_id', 'expense_item_id',
+        'employee_id', 'is_deleted', 'is_posted',
+    )
+
+    def _transaction_defaults(self):
+        """Поля операции журнала, отражающей выдачу (отрицательная сумма - расход из кассы)"""
+        return {
+            'date': self.date,
+            'amount': -self.amount,
+            'description': f'Выдача подотчетных средств №{self.number}',
+            'cash_register_id': self.cash_register_id,
+            'currency_id': self.currency_id,
+            'item_id': self.expense_item_id,
+            'employee_id': self.employee_id,
+        }
 
     def get_unreported_balance(self):
         """
         Получить остаток неотчитанных средств по конкретной выдаче.
         Учитывает дополнительные выдачи, подтвержденные отчеты, возвраты и доплаты.
+        Все составляющие считаются одним запросом (см. _balance_change_expressions).
+        Результат кешируется на экземпляре до сохранения или refresh_from_db().
         """
         if not self.pk or self.is_deleted:
             return Decimal('0.00')
@@ -824,93 +1272,108 @@ class AdvancePayment(BaseDocument):
         if not self.amount:
             return Decimal('0.00')
         
-        # Ленивый импорт для избежания циклического импорта
-        from django.apps import apps
-        AdditionalAdvancePayment = apps.get_model('accounting', 'AdditionalAdvancePayment')
-        AdvanceReport = apps.get_model('accounting', 'AdvanceReport')
-        AdvanceReturn = apps.get_model('accounting', 'AdvanceReturn')
-        Transaction = apps.get_model('accounting', 'Transaction')
-        
-        try:
-            # Сумма первоначальной выдачи
-            issued = self.amount or Decimal('0.00')
-            
-            # Дополнительные выдачи по этой выдаче
-            additional = AdditionalAdvancePayment.objects.filter(
-                original_advance_payment=self,
-                is_deleted=False
-            ).aggregate(total=Sum('amount'))['total']
-            if additional is None:
-                additional = Decimal('0.00')
-            
-            total_issued = issued + additional
-            
-            # Подтвержденные отчеты по этой выдаче
-            confirmed_reports = AdvanceReport.objects.filter(
-                advance_payment=self,
-                status='confirmed',
-                is_deleted=False
-            ).aggregate(total=Sum('total_amount'))['total']
-            if confirmed_reports is None:
-                confirmed_reports = Decimal('0.00')
-            
-            # Возвраты (отдельные документы + возвраты по отчетам)
-            # Отдельные документы возврата
-            returns_docs = AdvanceReturn.objects.filter(
-                advance_payment=self,
-                is_deleted=False
-            ).aggregate(total=Sum('amount'))['total']
-            if returns_docs is None:
-                returns_docs = Decimal('0.00')
-            
-            # Возвраты по авансовым отчетам (через Transaction)
-            returns_reports = Transaction.objects.filter(
-                advance_payment=self,
-                transaction_type='advance_return_report'
-            ).exclude(
-                Q(advance_report__isnull=False, advance_report__is_deleted=True)
-            ).aggregate(total=Sum('amount'))['total']
-            if returns_reports is None:
-                returns_reports = Decimal('0.00')
-            
-            total_returns = returns_docs + abs(returns_reports)
-            
-            # Доплаты по авансовым отчетам (через Transaction)
-            additional_payments = Transaction.objects.filter(
-                advance_payment=self,
-                transaction_type='advance_additional'
-            ).exclude(
-                Q(advance_report__isnull=False, advance_report__is_deleted=True)
-            ).aggregate(total=Sum('amount'))['total']
-            if additional_payments is None:
-                additional_payments = Decimal('0.00')
-            
-            # Остаток = Выданные - Отчитанные - Возвраты + Доплаты
-            balance = total_issued - confirmed_reports - total_returns + additional_payments
-            
-            return balance
-        except LookupError:
-            # Модели документов еще не реализованы
-            return Decimal('0.00')
+        cached = getattr(self, '_unreported_balance_cache', None)
+        if cached is not None:
+            return cached
+        
+        _, balance_change = self._balance_change_expressions()
+        change = AdvancePayment.objects.filter(pk=self.pk).annotate(
+            balance_change=balance_change
+        ).values_list('balance_change', flat=True).first()
+        if change is None:
+            change = Decimal('0.00')
+        
+        # Остаток = Выданные - Отчитанные - Возвраты + Доплаты
+        # SQLite возвращает суммы без фиксированного числа знаков
+        self._unreported_balance_cache = (self.amount + change).quantize(TWO_PLACES)
+        return self._unreported_balance_cache
     
-    def __str__(self):
+    def refresh_from_db(self, *args, **kwargs):
+        """Перечитать выдачу, сбросив закешированный остаток"""
+        self._unreported_balance_cache = None
+        super().refresh_from_db(*args, **kwargs)
+    
+    @classmethod
+    def _balance_change_expressions(cls):
         """
-        Отображение выдачи с информацией о сотруднике, сумме и незакрытом остатке.
-        Используется в autocomplete и других местах.
+        Выражения для подзапросов по выдаче (OuterRef('pk')):
+        сумма дополнительных выдач и изменение остатка относительно суммы выдачи
+        (дополнительные выдачи - подтвержденные отчеты - возвраты + доплаты).
+        """
+        amount_field = models.DecimalField(max_digits=15, decimal_places=2)
+        zero = models.Value(Decimal('0.00'), output_field=amount_field)
+        
+        def total(model, fk, field, condition):
+            """Сумма поля field по документам, ссылающимся на выдачу через fk"""
+            subquery = model.objects.filter(
+                condition, **{fk: models.OuterRef('pk')}
+            ).order_by().values(fk).annotate(total=Sum(field)).values('total')
+            return Coalesce(models.Subquery(subquery), zero)
+        
+        additional = total(AdditionalAdvancePayment, 'original_advance_payment', 'amount', Q(is_deleted=False))
+        confirmed_reports = total(AdvanceReport, 'advance_payment', 'total_amount', Q(status='confirmed', is_deleted=False))
+        returns_docs = total(AdvanceReturn, 'advance_payment', 'amount', Q(is_deleted=False))
+        returns_reports = total(Transaction, 'advance_payment', 'amount', Q(transaction_type='advance_return_report') & ADVANCE_REPORT_NOT_DELETED)
+        additional_payments = total(Transaction, 'advance_payment', 'amount', Q(transaction_type='advance_additional') & ADVANCE_REPORT_NOT_DELETED)
+        
+        balance_change = models.ExpressionWrapper(
+            additional - confirmed_reports - returns_docs - Abs(returns_reports) + additional_payments,
+            output_field=amount_field,
+        )
+        return additional, balance_change
+    
+    @classmethod
+    def annotate_balances(cls, queryset):
         """
+        Добавить к queryset выдач суммы, считаемые в базе данных:
+        additional_payments_total - дополнительные выдачи,
+        unreported_balance_total - не закрытый остаток (как в get_unreported_balance).
+        Позволяет выводить и сортировать эти значения в списках одним запросом.
+        """
+        amount_field = models.DecimalField(max_digits=15, decimal_places=2)
+        zero = models.Value(Decimal('0.00'), output_field=amount_field)
+        additional, balance_change = cls._balance_change_expressions()
+        
+        return queryset.annotate(
+            additional_payments_total=additional,
+            unreported_balance_total=models.Case(
+                models.When(Q(is_deleted=True) | Q(amount=0), then=zero),
+                default=models.F('amount') + balance_change,
+                output_field=amount_field,
+            ),
+        )
+    
+    def short_label(self):
+        """Наименование выдачи без остатка (номер, дата, сотрудник, сумма) - без запросов к документам"""
         employee_name = self.employee.full_name if hasattr(self.employee, 'full_name') and self.employee else 'Не указан'
-        amount_str = f"{self.amount:,.2f}".replace(',', ' ') if self.amount else "0.00"
+        amount_str = format(self.amount, ',.2f').translate(AMOUNT_GROUPING) if self.amount else "0.00"
         currency_code = self.currency.code if self.currency else ""
-        
-        # Получаем незакрытую сумму по выдаче
+        return f"Выдача №{self.number} от {self.date.strftime('%d.%m.%Y')} - {employee_name}: {amount_str} {currency_code}"
+    
+    def label_with_balance(self):
+        """
+        Наименование выдачи с незакрытым остатком.
+        Остаток берется из аннотации annotate_balances/with_balance, если queryset ее содержит,
+        иначе считается отдельным запросом (get_unreported_balance).
+        """
+        label = self.short_label()
         try:
-            unreported_balance = self.get_unreported_balance()
-            balance_str = f"{unreported_balance:,.2f}".replace(',', ' ') if unreported_balance else "0.00"
-            balance_info = f", остаток: {balance_str} {currency_code}"
+            unreported_balance = getattr(self, 'unreported_balance_total', None)
+            if unreported_balance is None:
+                unreported_balance = self.get_unreported_balance()
+            balance_str = format(unreported_balance, ',.2f').translate(AMOUNT_GROUPING) if unreported_balance else "0.00"
+            currency_code = self.currency.code if self.currency else ""
+            return f"{label}, остаток: {balance_str} {currency_code}"
         except (AttributeError, TypeError):
-            balance_info = ""
-        
-        return f"Выдача №{self.number} от {self.date.strftime('%d.%m.%Y')} - {employee_name}: {amount_str} {currency_code}{balance_info}"
+            return label
+    
+    def __str__(self):
+        """
+        Отображение выдачи с информацией о сотруднике, сумме и незакрытом остатке.
+        Используется в autocomplete и других местах, где остаток нужен для выбора выдачи;
+        где он не нужен - short_label().
+        """
+        return self.label_with_balance()
 
 
 class AdvanceReport(BaseDocument):
@@ -987,6 +1450,12 @@ class AdvanceReport(BaseDocument):
     class Meta:
         verbose_name = 'Авансовый отчет'
         verbose_name_plural = 'Авансовые отчеты'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['advance_payment', 'date']),
+            models.Index(fields=['status', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
@@ -1000,8 +1469,6 @@ class AdvanceReport(BaseDocument):
         issued = self.advance_payment.amount
         
         # Дополнительные выдачи
-        from django.apps import apps
-        AdditionalAdvancePayment = apps.get_model('accounting', 'AdditionalAdvancePayment')
         additional = AdditionalAdvancePayment.objects.filter(
             original_advance_payment=self.advance_payment,
             currency=self.currency,
@@ -1047,23 +1514,29 @@ class AdvanceReport(BaseDocument):
         
         errors = {}
         
+        # Выдача загружается вместе со статьей расходов, если еще не загружена
+        if self.advance_payment_id and not AdvanceReport.advance_payment.is_cached(self):
+            self.advance_payment = AdvancePayment.objects.select_related('expense_item').get(pk=self.advance_payment_id)
+        
         # Проверка наличия строк отчета (только для сохраненных объектов)
         # Это бизнес-правило, а не проверка обязательного поля
-        if self.pk and not self.items.exists():
+        has_items = bool(self.pk) and self.items.exists()
+        if self.pk and not has_items:
             errors['__all__'] = 'Добавьте хотя бы одну строку в авансовый отчет (во вкладке "Строки авансового отчета" внизу формы).'
         
         # Валидация статей расходов - строгое соответствие статье выдачи
-        # Проверка выполняется только для сохраненных объектов
-        if self.pk and self.advance_payment and self.advance_payment.expense_item:
+        # Проверка выполняется только для сохраненных объектов; первая строка с другой статьей
+        # ищется в базе данных, строки отчета целиком не загружаются
+        if has_items and self.advance_payment and self.advance_payment.expense_item:
             expense_item = self.advance_payment.expense_item
-            for item in self.items.all():
-                if item.item != expense_item:
-                    errors['__all__'] = (
-                        f'Статья расходов в строке "{item.description or "без описания"}" '
-                        f'({item.item.name}) не соответствует статье расходов при выдаче ({expense_item.name}). '
-                        f'Все строки отчета должны использовать ту же статью расходов, что указана в выданных подотчетных средствах.'
-                    )
-                    break  # Показываем только первую ошибку
+            mismatched = self.items.exclude(item_id=expense_item.pk).select_related('item').first()
+            if mismatched is not None:
+                # Показываем только первую ошибку
+                errors['__all__'] = (
+                    f'Статья расходов в строке "{mismatched.description or "без описания"}" '
+                    f'({mismatched.item.name}) не соответствует статье расходов при выдаче ({expense_item.name}). '
+                    f'Все строки отчета должны использовать ту же статью расходов, что указана в выданных подотчетных средствах.'
+                )
         
         # Валидация сумм (бизнес-правила)
         if self.total_amount is not None and self.total_amount < 0:
@@ -1078,8 +1551,12 @@ class AdvanceReport(BaseDocument):
         if errors:
             raise ValidationError(errors)
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операций при подтверждении"""
+        """
+        Сохранение с автоматическим созданием операций при подтверждении.
+        Документ, его операции и связанные выдачи записываются в одной транзакции БД.
+        """
         is_new = self.pk is None
         old_status = None
         
@@ -1090,21 +1567,19 @@ class AdvanceReport(BaseDocument):
             except AdvanceReport.DoesNotExist:
                 pass
         
-        # Автоматический расчет общей суммы из строк, если не заполнена
-        if not self.total_amount:
-            total_from_items = self.items.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            self.total_amount = total_from_items
-        
-        # Рассчитываем суммы возврата и доплаты
+        # Рассчитываем общую сумму (из строк, если не заполнена), суммы возврата и доплаты
         self.calculate_return_and_additional()
         
-        super().save(*args, **kwargs)
+        # Признаки проведения и дата подтверждения записываются тем же INSERT/UPDATE,
+        # что и документ (для удаленного документа is_posted сбрасывает BaseDocument.save)
+        if self.status == 'confirmed' and not self.is_deleted:
+            self.is_posted = True
+            if not self.approved_at:
+                self.approved_at = timezone.now()
+        elif old_status == 'confirmed':
+            self.is_posted = False
         
-        # Ленивый импорт для избежания циклического импорта
-        from django.apps import apps
-        Transaction = apps.get_model('accounting', 'Transaction')
-        AdditionalAdvancePayment = apps.get_model('accounting', 'AdditionalAdvancePayment')
-        AdvanceReportItem = apps.get_model('accounting', 'AdvanceReportItem')
+        super().save(*args, **kwargs)
         
         # Если статус изменился с 'confirmed' на другой, удаляем все операции
         if old_status == 'confirmed' and self.status != 'confirmed':
@@ -1115,180 +1590,116 @@ class AdvanceReport(BaseDocument):
                 (Q(transaction_type='advance_return_report') & Q(advance_report=self)) |
                 (Q(transaction_type='advance_additional') & Q(advance_report=self))
             ).delete()
-            
-            # Устанавливаем is_posted в False
-            if self.is_posted:
-                self.is_posted = False
-                AdvanceReport.objects.filter(pk=self.pk).update(is_posted=False)
         
         # Если статус 'confirmed', создаем операции
         if self.status == 'confirmed' and not self.is_deleted:
+            # Выдача и строки отчета нужны ниже многократно - получаем их один раз
+            advance_payment = self.advance_payment
+            items = list(self.items.all())
+            
+            # Описания операций отчета не зависят от строки - формируем их один раз
+            report_description = f'Авансовый отчет №{self.number}'
+            return_description = f'Возврат по авансовому отчету №{self.number}'
+            additional_description = f'Доплата по авансовому отчету №{self.number}'
+            
             # КРИТИЧЕСКИ ВАЖНО: Удаляем ВСЕ старые операции для этого отчета ПЕРЕД созданием новых
             # Это нужно делать в правильном порядке, чтобы избежать конфликтов с OneToOneField
             
-            # Шаг 1: Получаем все ID транзакций, связанных с этим отчетом
-            transaction_ids_to_delete = list(
-                Transaction.objects.filter(
-                    Q(advance_report=self) |
-                    Q(advance_report_item__report=self)
-                ).values_list('pk', flat=True)
-            )
-            
-            # Шаг 2: Очищаем связи OneToOneField в AdvanceReportItem ПЕРЕД удалением транзакций
+            # Шаг 1: Очищаем связи OneToOneField в AdvanceReportItem ПЕРЕД удалением транзакций
             # Это критически важно, чтобы Django не пытался найти транзакцию через обратную связь
-            for report_item in self.items.all():
-                if report_item.transaction_id:
-                    # Используем update() напрямую, чтобы обойти проверку через get()
-                    AdvanceReportItem.objects.filter(pk=report_item.pk).update(transaction_id=None)
-            
-            # Шаг 3: Удаляем все транзакции по ID (более надежный способ)
-            if transaction_ids_to_delete:
-                Transaction.objects.filter(pk__in=transaction_ids_to_delete).delete()
+            # Одним UPDATE напрямую, чтобы обойти проверку через get()
+            AdvanceReportItem.objects.filter(report=self, transaction_id__isnull=False).update(transaction=None)
             
-            # Шаг 4: Дополнительная очистка на случай, если что-то пропустили
-            # Удаляем все транзакции, связанные с этим отчетом через строки отчета
-            # Важно: сначала очищаем связи OneToOneField, чтобы избежать ошибок при удалении
-            for report_item in self.items.all():
-                if report_item.transaction_id:
-                    AdvanceReportItem.objects.filter(pk=report_item.pk).update(transaction_id=None)
-            # Теперь безопасно удаляем все транзакции
-            Transaction.objects.filter(advance_report_item__report=self).delete()
-            Transaction.objects.filter(advance_report=self).delete()
+            # Шаг 2: Удаляем все операции отчета и его строк одним запросом
+            Transaction.objects.filter(
+                Q(advance_report=self) |
+                Q(advance_report_item__report=self)
+            ).delete()
             
-            # Шаг 5: Создаем операции по каждой строке отчета
-            for report_item in self.items.all():
-                # Валидация статьи расходов
-                if report_item.item != self.advance_payment.expense_item:
-                    continue  # Пропускаем строки с неправильной статьей
-                
-                # Проверяем, нет ли уже транзакции для этой строки отчета
-                # Удаляем все существующие транзакции для этой строки (на случай дублей)
-                existing_transactions = Transaction.objects.filter(advance_report_item=report_item)
-                if existing_transactions.exists():
-                    # Очищаем связь в AdvanceReportItem перед удалением
-                    AdvanceReportItem.objects.filter(pk=report_item.pk).update(transaction_id=None)
-                    # Удаляем все транзакции для этой строки
-                    existing_transactions.delete()
-                
-                # Создаем новую транзакцию БЕЗ установки advance_report_item сразу
-                # Это критически важно, чтобы избежать проверки уникальности OneToOneField при создании
-                transaction = Transaction.objects.create(
+            # Шаг 3: Создаем операции по строкам отчета (строки с неправильной статьей
+            # пропускаются), по возврату и доплате одним запросом. Старые операции отчета
+            # удалены на шаге 2, поэтому искать операции возврата и доплаты для обновления не нужно
+            report_items = [
+                report_item for report_item in items
+                if report_item.item_id == advance_payment.expense_item_id
+            ]
+            user = getattr(self, '_current_user', None)
+            # bulk_create минует Transaction.save: признак is_active операций возврата и доплаты
+            # (они ссылаются и на выдачу) задается здесь, отчет в этой ветке не удален
+            payment_active = not advance_payment.is_deleted
+            new_transactions = [
+                Transaction(
                     date=report_item.date,
                     transaction_type='advance_report',
                     amount=-report_item.amount,  # Отрицательная сумма для расхода
-                    description=report_item.description or f'Авансовый отчет №{self.number}',
-                    cash_register=self.advance_payment.cash_register,
-                    currency=self.currency,
-                    item=report_item.item,
-                    employee=self.advance_payment.employee,
+                    description=report_item.description or report_description,
+                    cash_register_id=advance_payment.cash_register_id,
+                    currency_id=self.currency_id,
+                    item_id=report_item.item_id,
+                    employee_id=advance_payment.employee_id,
                     advance_report=self,
-                    # НЕ устанавливаем advance_report_item здесь - установим через update()
-                    created_by=getattr(self, '_current_user', None),
+                    advance_report_item_id=report_item.pk,
+                    created_by=user,
                 )
-                
-                # Шаг 6: Устанавливаем advance_report_item через update() транзакции
-                # Это обходит проверку уникальности OneToOneField через обратную связь
-                Transaction.objects.filter(pk=transaction.pk).update(advance_report_item_id=report_item.pk)
-                
-                # Шаг 7: Связываем транзакцию со строкой отчета через OneToOneField
-                # Используем update() напрямую с transaction_id, чтобы обойти проверку через get()
-                AdvanceReportItem.objects.filter(pk=report_item.pk).update(transaction_id=transaction.pk)
-                
-                # Обновляем объект в памяти, чтобы избежать проблем с кешем
-                report_item.refresh_from_db()
-            
-            # Создаем операцию возврата, если есть
+                for report_item in report_items
+            ]
             if self.return_amount > 0:
-                # Проверяем, нет ли уже транзакции возврата для этого отчета
-                return_transaction = Transaction.objects.filter(
+                new_transactions.append(Transaction(
+                    date=self.date,
+                    transaction_type='advance_return_report',
+                    amount=self.return_amount,  # Положительная сумма для поступления
+                    description=return_description,
+                    cash_register_id=advance_payment.cash_register_id,
+                    currency_id=self.currency_id,
+                    employee_id=advance_payment.employee_id,
                     advance_report=self,
-                    transaction_type='advance_return_report'
-                ).first()
-                
-                if return_transaction:
-                    # Обновляем существующую транзакцию
-                    return_transaction.date = self.date
-                    return_transaction.amount = self.return_amount
-                    return_transaction.description = f'Возврат по авансовому отчету №{self.number}'
-                    return_transaction.cash_register = self.advance_payment.cash_register
-                    return_transaction.currency = self.currency
-                    return_transaction.employee = self.advance_payment.employee
-                    return_transaction.advance_payment = self.advance_payment
-                    return_transaction.save()
-                else:
-                    # Создаем новую транзакцию
-                    Transaction.objects.create(
-                        date=self.date,
-                        transaction_type='advance_return_report',
-                        amount=self.return_amount,  # Положительная сумма для поступления
-                        description=f'Возврат по авансовому отчету №{self.number}',
-                        cash_register=self.advance_payment.cash_register,
-                        currency=self.currency,
-                        employee=self.advance_payment.employee,
-                        advance_report=self,
-                        advance_payment=self.advance_payment,
-                        created_by=getattr(self, '_current_user', None),
-                    )
-            
-            # Создаем операцию доплаты, если есть
+                    advance_payment=advance_payment,
+                    created_by=user,
+                    is_active=payment_active,
+                ))
             if self.additional_payment > 0:
-                # Проверяем, нет ли уже транзакции доплаты для этого отчета
-                additional_transaction = Transaction.objects.filter(
+                new_transactions.append(Transaction(
+                    date=self.date,
+                    transaction_type='advance_additional',
+                    amount=self.additional_payment,  # Положительная сумма для доплаты
+                    description=additional_description,
+                    cash_register_id=advance_payment.cash_register_id,
+                    currency_id=self.currency_id,
+                    employee_id=advance_payment.employee_id,
                     advance_report=self,
-                    transaction_type='advance_additional'
-                ).first()
-                
-                if additional_transaction:
-                    # Обновляем существующую транзакцию
-                    additional_transaction.date = self.date
-                    additional_transaction.amount = self.additional_payment
-                    additional_transaction.description = f'Доплата по авансовому отчету №{self.number}'
-                    additional_transaction.cash_register = self.advance_payment.cash_register
-                    additional_transaction.currency = self.currency
-                    additional_transaction.employee = self.advance_payment.employee
-                    additional_transaction.advance_payment = self.advance_payment
-                    additional_transaction.save()
-                else:
-                    # Создаем новую транзакцию
-                    Transaction.objects.create(
-                        date=self.date,
-                        transaction_type='advance_additional',
-                        amount=self.additional_payment,  # Положительная сумма для доплаты
-                        description=f'Доплата по авансовому отчету №{self.number}',
-                        cash_register=self.advance_payment.cash_register,
-                        currency=self.currency,
-                        employee=self.advance_payment.employee,
-                        advance_report=self,
-                        advance_payment=self.advance_payment,
-                        created_by=getattr(self, '_current_user', None),
-                    )
-                
-                # Если close_advance_payment=False и есть доплата, создаем новую выдачу
-                if not self.close_advance_payment:
-                    AdditionalAdvancePayment.objects.create(
-                        original_advance_payment=self.advance_payment,
-                        cash_register=self.advance_payment.cash_register,
-                        currency=self.currency,
-                        amount=self.additional_payment,
-                        purpose=f'Доплата по авансовому отчету №{self.number}',
-                        date=self.date,
-                    )
+                    advance_payment=advance_payment,
+                    created_by=user,
+                    is_active=payment_active,
+                ))
+            transactions = Transaction.objects.bulk_create(new_transactions)
             
-            # Если close_advance_payment=True, закрываем подотчетные средства
-            if self.close_advance_payment:
-                self.advance_payment.is_closed = True
-                self.advance_payment.closed_at = timezone.now()
-                self.advance_payment.save()
+            # Шаг 4: Связываем строки отчета с их операциями (идут первыми) одним запросом
+            for report_item, transaction in zip(report_items, transactions):
+                report_item.transaction_id = transaction.pk
+            AdvanceReportItem.objects.bulk_update(report_items, ['transaction'])
             
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                AdvanceReport.objects.filter(pk=self.pk).update(is_posted=True)
+            # Если close_advance_payment=False и есть доплата, создаем новую выдачу
+            if self.additional_payment > 0 and not self.close_advance_payment:
+                AdditionalAdvancePayment.objects.create(
+                    original_advance_payment=advance_payment,
+                    cash_register_id=advance_payment.cash_register_id,
+                    currency_id=self.currency_id,
+                    amount=self.additional_payment,
+                    purpose=additional_description,
+                    date=self.date,
+                )
             
-            # Устанавливаем approved_at и approved_by
-            if not self.approved_at:
-                self.approved_at = timezone.now()
-                AdvanceReport.objects.filter(pk=self.pk).update(approved_at=self.approved_at)
+            # Если close_advance_payment=True, закрываем подотчетные средства
+            # Меняются только признаки закрытия, поэтому вместо save() выдачи
+            # (пересохранение документа и его операции) - один UPDATE
+            if self.close_advance_payment:
+                advance_payment.is_closed = True
+                advance_payment.closed_at = advance_payment.updated_at = timezone.now()
+                AdvancePayment.objects.filter(pk=advance_payment.pk).update(
+                    is_closed=True,
+                    closed_at=advance_payment.closed_at,
+                    updated_at=advance_payment.updated_at,
+                )
         
         # Если документ помечен на удаление, удаляем операции
         if self.is_deleted:
@@ -1298,8 +1709,6 @@ class AdvanceReport(BaseDocument):
                 (Q(transaction_type='advance_return_report') & Q(advance_report=self)) |
                 (Q(transaction_type='advance_additional') & Q(advance_report=self))
             ).delete()
-            if self.is_posted:
-                AdvanceReport.objects.filter(pk=self.pk).update(is_posted=False)
 
     def __str__(self):
         return f"Авансовый отчет №{self.number} от {self.date.strftime('%d.%m.%Y')}"
@@ -1342,6 +1751,9 @@ class AdvanceReportItem(models.Model):
     class Meta:
         verbose_name = 'Строка авансового отчета'
         verbose_name_plural = 'Строки авансовых отчетов'
+        indexes = [
+            models.Index(fields=['-date']),
+        ]
 
     def __str__(self):
         return f"Строка отчета №{self.report.number} - {self.amount} {self.report.currency.code}"
@@ -1382,6 +1794,18 @@ class AdvanceReturn(BaseDocument):
     class Meta:
         verbose_name = 'Возврат денег сотрудником'
         verbose_name_plural = 'Возвраты денег сотрудниками'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['cash_register', 'date']),
+            models.Index(fields=['employee', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+            # Суммы возвратов по выдаче (AdvanceReturn.clean, AdvancePayment.annotate_balances)
+            models.Index(
+                fields=['advance_payment', 'currency', 'amount'],
+                condition=Q(is_deleted=False),
+                name='adv_return_sum_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
@@ -1396,38 +1820,42 @@ class AdvanceReturn(BaseDocument):
             raise ValidationError({'amount': 'Сумма возврата должна быть положительной'})
         
         # Валидация суммы возврата согласно ТЗ
-        # Проверяем, что сумма возврата не превышает сумму выданных средств
-        from django.apps import apps
-        AdditionalAdvancePayment = apps.get_model('accounting', 'AdditionalAdvancePayment')
-        Transaction = apps.get_model('accounting', 'Transaction')
+        # Проверяем, что сумма возврата не превышает сумму выданных средств.
+        # Сумма выдачи и все суммы ниже получаются одним запросом (подзапросы к выдаче)
+        amount_field = models.DecimalField(max_digits=15, decimal_places=2)
+        zero = models.Value(Decimal('0.00'), output_field=amount_field)
+        
+        def total(queryset, amount='amount'):
+            """Сумма amount по документам queryset как подзапрос"""
+            queryset = queryset.filter(currency=self.currency_id).order_by().values('currency')
+            return Coalesce(models.Subquery(queryset.annotate(total=Sum(amount)).values('total')), zero)
+        
+        issued, additional, existing_returns, returns_from_reports = AdvancePayment.objects.filter(
+            pk=self.advance_payment_id
+        ).annotate(
+            # Дополнительные выдачи
+            additional=total(AdditionalAdvancePayment.objects.filter(
+                original_advance_payment=self.advance_payment_id,
+                is_deleted=False
+            )),
+            # Уже возвращенные суммы (исключая текущий документ)
+            existing_returns=total(AdvanceReturn.objects.filter(
+                advance_payment=self.advance_payment_id,
+                is_deleted=False
+            ).exclude(pk=self.pk)),
+            # Возвраты по авансовым отчетам (по модулю - считается в базе данных)
+            returns_from_reports=total(Transaction.objects.filter(
+                advance_payment=self.advance_payment_id,
+                transaction_type='advance_return_report'
+            ).exclude(
+                Q(advance_report__isnull=True) | Q(advance_report__is_deleted=True)
+            ), Abs('amount')),
+        ).values_list('amount', 'additional', 'existing_returns', 'returns_from_reports').get()
         
         # Выданные суммы
-        issued = self.advance_payment.amount
-        additional = AdditionalAdvancePayment.objects.filter(
-            original_advance_payment=self.advance_payment,
-            currency=self.currency,
-            is_deleted=False
-        ).exclude(pk=self.pk if self.pk else None).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
         total_issued = issued + additional
         
-        # Уже возвращенные суммы (исключая текущий документ)
-        existing_returns = AdvanceReturn.objects.filter(
-            advance_payment=self.advance_payment,
-            currency=self.currency,
-            is_deleted=False
-        ).exclude(pk=self.pk if self.pk else None).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        # Возвраты по авансовым отчетам
-        returns_from_reports = Transaction.objects.filter(
-            advance_payment=self.advance_payment,
-            currency=self.currency,
-            transaction_type='advance_return_report'
-        ).exclude(
-            Q(advance_report__isnull=True) | Q(advance_report__is_deleted=True)
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        total_returned = existing_returns + abs(returns_from_reports)
+        total_returned = existing_returns + returns_from_reports
         available_for_return = total_issued - total_returned
         
         if self.amount > available_for_return:
@@ -1435,51 +1863,55 @@ class AdvanceReturn(BaseDocument):
                 'amount': f'Сумма возврата ({self.amount}) не может превышать доступную сумму ({available_for_return})'
             })
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операции"""
+        """
+        Сохранение с автоматическим созданием операции.
+        Документ и его операция записываются в одной транзакции БД.
+        """
+        # Проверка доступной к возврату суммы - под блокировкой выдачи
+        self.lock_for_posting(AdvancePayment, self.advance_payment_id)
+        # Признак проведения записывается тем же INSERT/UPDATE, что и документ
+        # (для удаленного документа BaseDocument.save сбрасывает его сам)
+        if not self.is_deleted:
+            self.is_posted = True
+        # Пересохранение без изменений отражаемых полей не трогает журнал операций
+        mirror_changed = self.has_changed(self.TRANSACTION_MIRROR_FIELDS)
         super().save(*args, **kwargs)
         
+        if not mirror_changed:
+            return
         if not self.is_deleted:
-            # Ленивый импорт для избежания циклического импорта
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            
-            # Создаем или обновляем операцию (положительная сумма)
-            transaction, created = Transaction.objects.get_or_create(
-                advance_return=self,
-                defaults={
-                    'date': self.date,
-                    'transaction_type': 'advance_return',
-                    'amount': self.amount,  # Положительная сумма для поступления
-                    'description': f'Возврат денег сотрудником №{self.number}',
-                    'cash_register': self.cash_register,
-                    'currency': self.currency,
-                    'employee': self.employee,
-                    'created_by': getattr(self, '_current_user', None),
-                }
-            )
-            
-            if not created:
-                # Обновляем существующую операцию
-                transaction.date = self.date
-                transaction.amount = self.amount
-                transaction.description = f'Возврат денег сотрудником №{self.number}'
-                transaction.cash_register = self.cash_register
-                transaction.currency = self.currency
-                transaction.employee = self.employee
-                transaction.save()
-            
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                AdvanceReturn.objects.filter(pk=self.pk).update(is_posted=True)
+            # Обновляем операцию одним UPDATE без предварительного чтения;
+            # если операции еще нет (новый документ) - создаем
+            defaults = self._transaction_defaults()
+            if not Transaction.objects.filter(advance_return=self).update(**defaults):
+                Transaction.objects.create(
+                    advance_return=self,
+                    transaction_type='advance_return',
+                    created_by=getattr(self, '_current_user', None),
+                    **defaults
+                )
         else:
-            # Удаляем операции при пометке на удаление
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            Transaction.objects.filter(advance_return=self).delete()
-            if self.is_posted:
-                AdvanceReturn.objects.filter(pk=self.pk).update(is_posted=False)
+            # Удаляем операции при пометке на удаление одним DELETE без сбора объектов
+            # (на эти операции не ссылаются строки авансовых отчетов, см. IncomeDocument.save)
+            Transaction.objects.filter(advance_return=self)._raw_delete(self._state.db)
+
+    # Поля документа, от которых зависит его операция в журнале (is_posted - операция уже создана)
+    TRANSACTION_MIRROR_FIELDS = (
+        'number', 'date', 'amount', 'cash_register_id', 'currency_id', 'employee_id', 'is_deleted', 'is_posted',
+    )
+
+    def _transaction_defaults(self):
+        """Поля операции журнала, отражающей документ"""
+        return {
+            'date': self.date,
+            'amount': self.amount,  # Положительная сумма для поступления
+            'description': f'Возврат денег сотрудником №{self.number}',
+            'cash_register_id': self.cash_register_id,
+            'currency_id': self.currency_id,
+            'employee_id': self.employee_id,
+        }
 
     def __str__(self):
         return f"Возврат №{self.number} от {self.date.strftime('%d.%m.%Y')} - {self.amount} {self.currency.code}"
@@ -1515,6 +1947,18 @@ class AdditionalAdvancePayment(BaseDocument):
     class Meta:
         verbose_name = 'Дополнительная выдача подотчетных средств'
         verbose_name_plural = 'Дополнительные выдачи подотчетных средств'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['cash_register', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+            # Суммы доп. выдач по выдаче (AdvanceReturn.clean, AdvancePayment.annotate_balances):
+            # сумма входит в ключ индекса, удаленные документы в индекс не попадают
+            models.Index(
+                fields=['original_advance_payment', 'currency', 'amount'],
+                condition=Q(is_deleted=False),
+                name='add_adv_payment_sum_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
@@ -1528,51 +1972,54 @@ class AdditionalAdvancePayment(BaseDocument):
         if self.amount <= 0:
             raise ValidationError({'amount': 'Сумма дополнительной выдачи должна быть положительной'})
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операции"""
+        """
+        Сохранение с автоматическим созданием операции.
+        Документ и его операция записываются в одной транзакции БД.
+        """
+        # Признак проведения записывается тем же INSERT/UPDATE, что и документ
+        # (для удаленного документа BaseDocument.save сбрасывает его сам)
+        if not self.is_deleted:
+            self.is_posted = True
+        # Пересохранение без изменений отражаемых полей не трогает журнал операций
+        mirror_changed = self.has_changed(self.TRANSACTION_MIRROR_FIELDS)
         super().save(*args, **kwargs)
         
+        if not mirror_changed:
+            return
         if not self.is_deleted:
-            # Ленивый импорт для избежания циклического импорта
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            
-            # Создаем или обновляем операцию (отрицательная сумма)
-            transaction, created = Transaction.objects.get_or_create(
-                additional_advance_payment=self,
-                defaults={
-                    'date': self.date,
-                    'transaction_type': 'additional_advance_payment',
-                    'amount': -self.amount,  # Отрицательная сумма для расхода
-                    'description': f'Дополнительная выдача подотчетных средств №{self.number}',
-                    'cash_register': self.cash_register,
-                    'currency': self.currency,
-                    'employee': self.original_advance_payment.employee,
-                    'created_by': getattr(self, '_current_user', None),
-                }
-            )
-            
-            if not created:
-                # Обновляем существующую операцию
-                transaction.date = self.date
-                transaction.amount = -self.amount
-                transaction.description = f'Дополнительная выдача подотчетных средств №{self.number}'
-                transaction.cash_register = self.cash_register
-                transaction.currency = self.currency
-                transaction.employee = self.original_advance_payment.employee
-                transaction.save()
-            
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                AdditionalAdvancePayment.objects.filter(pk=self.pk).update(is_posted=True)
+            # Обновляем операцию одним UPDATE без предварительного чтения;
+            # если операции еще нет (новый документ) - создаем
+            defaults = self._transaction_defaults()
+            if not Transaction.objects.filter(additional_advance_payment=self).update(**defaults):
+                Transaction.objects.create(
+                    additional_advance_payment=self,
+                    transaction_type='additional_advance_payment',
+                    created_by=getattr(self, '_current_user', None),
+                    **defaults
+                )
         else:
-            # Удаляем операции при пометке на удаление
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            Transaction.objects.filter(additional_advance_payment=self).delete()
-            if self.is_posted:
-                AdditionalAdvancePayment.objects.filter(pk=self.pk).update(is_posted=False)
+            # Удаляем операции при пометке на удаление одним DELETE без сбора объектов
+            # (на эти операции не ссылаются строки авансовых отчетов, см. IncomeDocument.save)
+            Transaction.objects.filter(additional_advance_payment=self)._raw_delete(self._state.db)
+
+    # Поля документа, от которых зависит его операция в журнале (is_posted - операция уже создана)
+    TRANSACTION_MIRROR_FIELDS = (
+        'number', 'date', 'amount', 'cash_register_id', 'currency_id', 'original_advance_payment_id',
+        'is_deleted', 'is_posted',
+    )
+
+    def _transaction_defaults(self):
+        """Поля операции журнала, отражающей документ"""
+        return {
+            'date': self.date,
+            'amount': -self.amount,  # Отрицательная сумма для расхода
+            'description': f'Дополнительная выдача подотчетных средств №{self.number}',
+            'cash_register_id': self.cash_register_id,
+            'currency_id': self.currency_id,
+            'employee_id': self.original_advance_payment.employee_id,
+        }
 
     def __str__(self):
         return f"Доп. выдача №{self.number} от {self.date.strftime('%d.%m.%Y')} - {self.amount} {self.currency.code}"
@@ -1606,6 +2053,12 @@ class CashTransfer(BaseDocument):
     class Meta:
         verbose_name = 'Перемещение между кассами'
         verbose_name_plural = 'Перемещения между кассами'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['from_cash_register', 'date']),
+            models.Index(fields=['to_cash_register', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
@@ -1622,60 +2075,77 @@ class CashTransfer(BaseDocument):
             raise ValidationError({'amount': 'Сумма перемещения должна быть положительной'})
         
         # Проверка наличия достаточного остатка
-        balance = self.from_cash_register.get_balance(self.currency, self.date)
+        balance = self.get_cash_balance('from_cash_register', 'currency')
         if balance < self.amount:
             raise ValidationError({
                 'amount': f'Недостаточный остаток в исходной кассе. Доступно: {balance}, требуется: {self.amount}'
             })
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операций"""
+        """
+        Сохранение с автоматическим созданием операций.
+        Документ и его операции записываются в одной транзакции БД.
+        """
+        # Проверка остатка исходной кассы - под ее блокировкой
+        self.lock_for_posting(CashRegister, self.from_cash_register_id)
+        # Признак проведения записывается тем же INSERT/UPDATE, что и документ
+        # (для удаленного документа BaseDocument.save сбрасывает его сам)
+        if not self.is_deleted:
+            self.is_posted = True
+        is_new = self._state.adding
+        # Пересохранение без изменений отражаемых полей не трогает журнал операций
+        mirror_changed = self.has_changed(self.TRANSACTION_MIRROR_FIELDS)
         super().save(*args, **kwargs)
         
+        if not mirror_changed:
+            return
         if not self.is_deleted:
-            # Ленивый импорт для избежания циклического импорта
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            
-            # Создаем две операции: списание из исходной кассы и поступление в целевую
-            # Удаляем старые операции для этого документа
-            Transaction.objects.filter(cash_transfer=self).delete()
-            
-            # Операция списания (отрицательная сумма)
-            Transaction.objects.create(
+            _write_document_legs(
+                self, 'cash_transfer', self._transaction_legs(getattr(self, '_current_user', None)), is_new
+            )
+        else:
+            # Удаляем операции при пометке на удаление одним DELETE без сбора объектов
+            # (на эти операции не ссылаются строки авансовых отчетов, см. IncomeDocument.save)
+            Transaction.objects.filter(cash_transfer=self)._raw_delete(self._state.db)
+
+    # Поля документа, от которых зависят его операции в журнале (is_posted - операции уже созданы)
+    TRANSACTION_MIRROR_FIELDS = (
+        'number', 'date', 'amount', 'from_cash_register_id', 'to_cash_register_id', 'currency_id',
+        'is_deleted', 'is_posted',
+    )
+
+    # bulk_post: наименования касс в описаниях операций, проверка остатка исходной кассы
+    bulk_post_related_fields = ('from_cash_register', 'to_cash_register')
+    bulk_post_checks_balance = True
+
+    def _transaction_legs(self, user=None):
+        """
+        Несохраненные операции журнала документа: списание из исходной кассы
+        (отрицательная сумма) и поступление в целевую (положительная сумма)
+        """
+        return [
+            Transaction(
                 cash_transfer=self,
                 date=self.date,
                 transaction_type='transfer',
                 amount=-self.amount,
                 description=f'Перемещение между кассами №{self.number} (из {self.from_cash_register.name})',
-                cash_register=self.from_cash_register,
-                currency=self.currency,
-                created_by=getattr(self, '_current_user', None),
-            )
-            
-            # Операция поступления (положительная сумма)
-            Transaction.objects.create(
+                cash_register_id=self.from_cash_register_id,
+                currency_id=self.currency_id,
+                created_by=user,
+            ),
+            Transaction(
                 cash_transfer=self,
                 date=self.date,
                 transaction_type='transfer',
                 amount=self.amount,
                 description=f'Перемещение между кассами №{self.number} (в {self.to_cash_register.name})',
-                cash_register=self.to_cash_register,
-                currency=self.currency,
-                created_by=getattr(self, '_current_user', None),
-            )
-            
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                CashTransfer.objects.filter(pk=self.pk).update(is_posted=True)
-        else:
-            # Удаляем операции при пометке на удаление
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            Transaction.objects.filter(cash_transfer=self).delete()
-            if self.is_posted:
-                CashTransfer.objects.filter(pk=self.pk).update(is_posted=False)
+                cash_register_id=self.to_cash_register_id,
+                currency_id=self.currency_id,
+                created_by=user,
+            ),
+        ]
 
     def __str__(self):
         return f"Перемещение №{self.number} от {self.date.strftime('%d.%m.%Y')} - {self.amount} {self.currency.code}"
@@ -1719,13 +2189,31 @@ class CurrencyConversion(BaseDocument):
     class Meta:
         verbose_name = 'Конвертация валют'
         verbose_name_plural = 'Конвертации валют'
+        indexes = [
+            models.Index(fields=['-date', '-created_at']),
+            models.Index(fields=['cash_register', 'date']),
+            models.Index(fields=['is_posted', 'is_deleted', 'date']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['number', 'date'],
                 name='unique_currency_conversion_number_per_year'
-            )
+            ),
+            # Сумма в целевой валюте соответствует курсу и для строк, записанных в обход clean()
+            models.CheckConstraint(
+                condition=Q(
+                    to_amount__gte=models.F('from_amount') * models.F('exchange_rate') - CONVERSION_TOLERANCE,
+                    to_amount__lte=models.F('from_amount') * models.F('exchange_rate') + CONVERSION_TOLERANCE,
+                ),
+                name='cc_rate_consistency'
+            ),
         ]
 
+    def validate_constraints(self, exclude=None):
+        # Соответствие курса и сумм проверяет clean() с понятным сообщением,
+        # повторная проверка ограничения cc_rate_consistency запросом к БД не нужна
+        super().validate_constraints(exclude={*(exclude or ()), 'to_amount'})
+
     def clean(self):
         """Валидация документа"""
         super().clean()
@@ -1737,21 +2225,27 @@ class CurrencyConversion(BaseDocument):
             raise ValidationError({'exchange_rate': 'Курс обмена должен быть положительным'})
         
         # Проверка соответствия курса и сумм
-        calculated_to_amount = (self.from_amount * self.exchange_rate).quantize(Decimal('0.01'))
-        if abs(self.to_amount - calculated_to_amount) > Decimal('0.01'):
+        calculated_to_amount = (self.from_amount * self.exchange_rate).quantize(TWO_PLACES)
+        if abs(self.to_amount - calculated_to_amount) > TWO_PLACES:
             raise ValidationError({
                 'to_amount': f'Сумма в целевой валюте не соответствует расчету. Ожидается: {calculated_to_amount}, указано: {self.to_amount}'
             })
         
         # Проверка наличия достаточного остатка
-        balance = self.cash_register.get_balance(self.from_currency, self.date)
+        balance = self.get_cash_balance('cash_register', 'from_currency')
         if balance < self.from_amount:
             raise ValidationError({
                 'from_amount': f'Недостаточный остаток в кассе. Доступно: {balance}, требуется: {self.from_amount}'
             })
 
+    @db_transaction.atomic
     def save(self, *args, **kwargs):
-        """Сохранение с автоматическим созданием операций и заполнением курса"""
+        """
+        Сохранение с автоматическим созданием операций и заполнением курса.
+        Документ и его операции записываются в одной транзакции БД.
+        """
+        # Проверка остатка кассы - под ее блокировкой
+        self.lock_for_posting(CashRegister, self.cash_register_id)
         # Автоматическое заполнение курса обмена из справочника, если не указан
         if not self.exchange_rate or self.exchange_rate == 0:
             rate = CurrencyRate.get_rate(self.from_currency, self.to_currency, self.date.date() if hasattr(self.date, 'date') else self.date)
@@ -1760,54 +2254,65 @@ class CurrencyConversion(BaseDocument):
         
         # Автоматический расчет суммы в целевой валюте, если не указана
         if self.exchange_rate and (not self.to_amount or self.to_amount == 0):
-            self.to_amount = (self.from_amount * self.exchange_rate).quantize(Decimal('0.01'))
+            self.to_amount = (self.from_amount * self.exchange_rate).quantize(TWO_PLACES)
         
+        # Признак проведения записывается тем же INSERT/UPDATE, что и документ
+        # (для удаленного документа BaseDocument.save сбрасывает его сам)
+        if not self.is_deleted:
+            self.is_posted = True
+        is_new = self._state.adding
+        # Пересохранение без изменений отражаемых полей не трогает журнал операций
+        mirror_changed = self.has_changed(self.TRANSACTION_MIRROR_FIELDS)
         super().save(*args, **kwargs)
         
+        if not mirror_changed:
+            return
         if not self.is_deleted:
-            # Ленивый импорт для избежания циклического импорта
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            
-            # Создаем две операции: списание исходной валюты и поступление целевой валюты
-            # Удаляем старые операции для этого документа
-            Transaction.objects.filter(currency_conversion=self).delete()
-            
-            # Операция списания исходной валюты (отрицательная сумма)
-            Transaction.objects.create(
+            _write_document_legs(
+                self, 'currency_conversion', self._transaction_legs(getattr(self, '_current_user', None)), is_new
+            )
+        else:
+            # Удаляем операции при пометке на удаление одним DELETE без сбора объектов
+            # (на эти операции не ссылаются строки авансовых отчетов, см. IncomeDocument.save)
+            Transaction.objects.filter(currency_conversion=self)._raw_delete(self._state.db)
+
+    # Поля документа, от которых зависят его операции в журнале (is_posted - операции уже созданы)
+    TRANSACTION_MIRROR_FIELDS = (
+        'number', 'date', 'from_amount', 'to_amount', 'cash_register_id', 'from_currency_id', 'to_currency_id',
+        'is_deleted', 'is_posted',
+    )
+
+    # bulk_post: коды валют в описаниях операций, проверка остатка кассы в исходной валюте
+    bulk_post_related_fields = ('from_currency', 'to_currency')
+    bulk_post_checks_balance = True
+
+    def _transaction_legs(self, user=None):
+        """
+        Несохраненные операции журнала документа: списание исходной валюты
+        (отрицательная сумма) и поступление целевой валюты (положительная сумма)
+        """
+        return [
+            Transaction(
                 currency_conversion=self,
                 date=self.date,
                 transaction_type='conversion',
                 amount=-self.from_amount,
                 description=f'Конвертация валют №{self.number} (списание {self.from_currency.code})',
-                cash_register=self.cash_register,
-                currency=self.from_currency,
-                created_by=getattr(self, '_current_user', None),
-            )
-            
-            # Операция поступления целевой валюты (положительная сумма)
-            Transaction.objects.create(
+                cash_register_id=self.cash_register_id,
+                currency_id=self.from_currency_id,
+                created_by=user,
+            ),
+            Transaction(
                 currency_conversion=self,
                 date=self.date,
                 transaction_type='conversion',
                 amount=self.to_amount,
                 description=f'Конвертация валют №{self.number} (поступление {self.to_currency.code})',
-                cash_register=self.cash_register,
-                currency=self.to_currency,
-                created_by=getattr(self, '_current_user', None),
-            )
-            
-            # Устанавливаем is_posted в True
-            if not self.is_posted:
-                self.is_posted = True
-                CurrencyConversion.objects.filter(pk=self.pk).update(is_posted=True)
-        else:
-            # Удаляем операции при пометке на удаление
-            from django.apps import apps
-            Transaction = apps.get_model('accounting', 'Transaction')
-            Transaction.objects.filter(currency_conversion=self).delete()
-            if self.is_posted:
-                CurrencyConversion.objects.filter(pk=self.pk).update(is_posted=False)
+                cash_register_id=self.cash_register_id,
+                currency_id=self.to_currency_id,
+                created_by=user,
+            ),
+        ]
 
     def __str__(self):
         return f"Конвертация №{self.number} от {self.date.strftime('%d.%m.%Y')} - {self.from_amount} {self.from_currency.code} → {self.to_amount} {self.to_currency.code}"
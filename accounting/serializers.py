@@ -4,7 +4,7 @@ Serializers для Django REST Framework API.
 from rest_framework import serializers
 from .models import (
     Currency, CashRegister, IncomeExpenseItem, Employee, CurrencyRate,
-    AdvancePayment, IncomeDocument
+    AdvancePayment, IncomeDocument, TWO_PLACES
 )
 
 
@@ -15,6 +15,15 @@ class CurrencySerializer(serializers.ModelSerializer):
         fields = ['id', 'code', 'name', 'symbol', 'is_active', 'created_at']
 
 
+class CashRegisterListSerializer(serializers.ListSerializer):
+    """Список касс: остатки всех касс страницы считаются одним запросом"""
+    
+    def to_representation(self, data):
+        cash_registers = list(data.all() if hasattr(data, 'all') else data)
+        self.child.balances_map = CashRegister.get_current_balances(cash_registers)
+        return super().to_representation(cash_registers)
+
+
 class CashRegisterSerializer(serializers.ModelSerializer):
     """Serializer для касс"""
     balances = serializers.SerializerMethodField()
@@ -22,18 +31,14 @@ class CashRegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = CashRegister
         fields = ['id', 'name', 'code', 'description', 'is_active', 'balances', 'created_at']
+        list_serializer_class = CashRegisterListSerializer
     
     def get_balances(self, obj):
-        """Получить остатки по валютам"""
-        from django.apps import apps
-        Currency = apps.get_model('accounting', 'Currency')
-        currencies = Currency.objects.filter(is_active=True).order_by('code')
-        balances = {}
-        for currency in currencies:
-            balance = obj.get_balance(currency)
-            if balance != 0:
-                balances[currency.code] = str(balance)
-        return balances
+        """Получить ненулевые остатки по активным валютам (для списка - из общего запроса)"""
+        balances_map = getattr(self, 'balances_map', None)
+        if balances_map is None:
+            balances_map = CashRegister.get_current_balances([obj])
+        return {code: str(balance) for code, balance in balances_map.get(obj.pk, [])}
 
 
 class IncomeExpenseItemSerializer(serializers.ModelSerializer):
@@ -80,15 +85,20 @@ class AdvancePaymentSerializer(serializers.ModelSerializer):
                   'additional_payments_sum', 'created_at', 'updated_at']
     
     def get_unreported_balance(self, obj):
-        """Получить не закрытый остаток"""
-        return str(obj.get_unreported_balance())
+        """Получить не закрытый остаток (из аннотации with_balance, если она есть)"""
+        balance = getattr(obj, 'unreported_balance_total', None)
+        if balance is None:
+            balance = obj.get_unreported_balance()
+        return str(balance.quantize(TWO_PLACES))
     
     def get_additional_payments_sum(self, obj):
-        """Получить сумму дополнительных выдач"""
-        from decimal import Decimal
-        from django.db.models import Sum
-        total = obj.additional_payments.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        return str(total)
+        """Получить сумму дополнительных выдач (из аннотации with_balance, если она есть)"""
+        total = getattr(obj, 'additional_payments_total', None)
+        if total is None:
+            from decimal import Decimal
+            from django.db.models import Sum
+            total = obj.additional_payments.filter(is_deleted=False).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        return str(total.quantize(TWO_PLACES))
 
 
 class IncomeDocumentSerializer(serializers.ModelSerializer):
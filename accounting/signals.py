@@ -0,0 +1,142 @@
+"""
+Обработчики сигналов приложения accounting.
+"""
+import functools
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_finished
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, post_delete
+
+from .models import (
+    Currency, CashRegister, IncomeExpenseItem, Employee, CurrencyRate, _get_rate_cached,
+    Transaction, IncomeDocument, ExpenseDocument, AdvancePayment, AdvanceReport, AdvanceReportItem,
+    AdvanceReturn, AdditionalAdvancePayment, CashTransfer, CurrencyConversion
+)
+
+
+# Справочники, данные которых кэшируются: ответы API (CachedListMixin в api_views)
+# и списки активных записей для фильтров отчетов (get_active_references в views)
+CACHED_REFERENCE_MODELS = (Currency, CashRegister, IncomeExpenseItem, Employee)
+
+
+def is_shared_cache():
+    """
+    Кэш общий для всех процессов приложения (Redis, Memcached - см. CACHE_URL в settings).
+    Версии кэша в локальной памяти процесса увеличиваются только в процессе, обработавшем
+    изменение, поэтому без общего кэша данные справочников и отчетов не кэшируются.
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _reference_cache_version_key(model):
+    return f'api:{model._meta.label_lower}:version'
+
+
+def get_reference_cache_version(model):
+    """Текущая версия кэша справочника"""
+    return cache.get_or_set(_reference_cache_version_key(model), 1, None)
+
+
+def _bump_cache_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def schedule_cache_version_bump(key, using=None):
+    """
+    Увеличить версию кэша после фиксации транзакции: иначе параллельный запрос мог бы
+    закэшировать под новой версией еще не зафиксированные (старые) данные.
+    В одной транзакции версия увеличивается один раз, сколько бы записей ни сохранялось.
+    Уже запланированное увеличение может быть отменено только откатом savepoint,
+    который отменяет и текущее изменение, поэтому второе не нужно.
+    """
+    connection = db_transaction.get_connection(using)
+    for sids, func, robust in connection.run_on_commit:
+        if isinstance(func, functools.partial) and func.func is _bump_cache_version and func.args == (key,):
+            return
+    db_transaction.on_commit(functools.partial(_bump_cache_version, key), using=using)
+
+
+def invalidate_reference_cache(sender, using=None, **kwargs):
+    """Сбросить кэш справочника: новая версия делает старые ключи недостижимыми"""
+    schedule_cache_version_bump(_reference_cache_version_key(sender), using)
+
+
+for _model in CACHED_REFERENCE_MODELS:
+    post_save.connect(invalidate_reference_cache, sender=_model, dispatch_uid=f'invalidate_{_model._meta.model_name}_cache')
+    post_delete.connect(invalidate_reference_cache, sender=_model, dispatch_uid=f'invalidate_{_model._meta.model_name}_cache')
+
+
+def clear_currency_rate_cache(**kwargs):
+    """Сбросить кэш курсов валют (CurrencyRate.get_rate)"""
+    _get_rate_cached.cache_clear()
+
+
+post_save.connect(clear_currency_rate_cache, sender=CurrencyRate, dispatch_uid='clear_currency_rate_cache')
+post_delete.connect(clear_currency_rate_cache, sender=CurrencyRate, dispatch_uid='clear_currency_rate_cache')
+request_finished.connect(clear_currency_rate_cache, dispatch_uid='clear_currency_rate_cache')
+
+
+# Документы и поля операций, которые на них ссылаются
+DOCUMENT_TRANSACTION_FIELDS = {
+    IncomeDocument: 'income_document',
+    ExpenseDocument: 'expense_document',
+    AdvancePayment: 'advance_payment',
+    AdvanceReport: 'advance_report',
+    AdvanceReturn: 'advance_return',
+    AdditionalAdvancePayment: 'additional_advance_payment',
+    CashTransfer: 'cash_transfer',
+    CurrencyConversion: 'currency_conversion',
+}
+
+
+def refresh_document_transactions(sender, instance, created, **kwargs):
+    """
+    Обновить признак is_active операций документа после пометки на удаление или ее снятия.
+    Новые операции получают is_active при записи (Transaction.save, операции авансового отчета),
+    поэтому при создании документа и пересохранении без изменения is_deleted пересчет не нужен.
+    В post_save has_changed сравнивает с состоянием до сохранения: BaseDocument.save
+    запоминает новые значения полей после записи.
+    """
+    if created or not instance.has_changed(('is_deleted',)):
+        return
+    Transaction.refresh_is_active(**{DOCUMENT_TRANSACTION_FIELDS[sender]: instance})
+
+
+for _model in DOCUMENT_TRANSACTION_FIELDS:
+    post_save.connect(refresh_document_transactions, sender=_model, dispatch_uid=f'refresh_{_model._meta.model_name}_transactions')
+
+
+# Ключ версии кэша рассчитанных данных отчетов (get_cached_report_data в views)
+REPORT_CACHE_VERSION_KEY = 'reports:version'
+
+
+def get_report_cache_version():
+    """Текущая версия кэша данных отчетов"""
+    return cache.get_or_set(REPORT_CACHE_VERSION_KEY, 1, None)
+
+
+def invalidate_report_cache(using=None, **kwargs):
+    """
+    Сбросить кэш данных отчетов: новая версия делает старые ключи недостижимыми.
+    Проведение документа сохраняет несколько записей, но версия увеличивается
+    один раз после фиксации транзакции (см. schedule_cache_version_bump).
+    """
+    schedule_cache_version_bump(REPORT_CACHE_VERSION_KEY, using)
+
+
+# Данные, из которых строятся отчеты: операции журнала, документы (их сохранение
+# переписывает операции через update/_raw_delete без сигналов Transaction),
+# строки авансовых отчетов и справочники, показываемые в отчетах
+REPORT_SOURCE_MODELS = (
+    Transaction, AdvanceReportItem, *DOCUMENT_TRANSACTION_FIELDS, *CACHED_REFERENCE_MODELS
+)
+
+for _model in REPORT_SOURCE_MODELS:
+    post_save.connect(invalidate_report_cache, sender=_model, dispatch_uid=f'invalidate_reports_on_{_model._meta.model_name}')
+    post_delete.connect(invalidate_report_cache, sender=_model, dispatch_uid=f'invalidate_reports_on_{_model._meta.model_name}')
@@ -1,3 +1,755 @@
-from django.test import TestCase
+"""
+Тесты проведения документов: операции журнала (Transaction), остатки касс,
+пересохранение без изменений, массовая загрузка (bulk_post) и ограничения БД;
+список и выгрузка операций в админке, фильтры и кэширование API, страницы и выгрузка отчетов,
+кэш их данных; ограничение попыток входа.
+"""
+import csv
+import io
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction as db_transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    Currency, CashRegister, IncomeExpenseItem, Employee, CurrencyRate, Transaction,
+    IncomeDocument, ExpenseDocument, AdvancePayment, AdvanceReport, AdvanceReportItem,
+    AdvanceReturn, AdditionalAdvancePayment, CashTransfer, CurrencyConversion
+)
+from .admin import EstimatedCountPaginator
+from .auth_views import LOGIN_FAILURE_LIMIT, LOGIN_FAILURE_TIMEOUT
+from .signals import get_report_cache_version
+
+
+# Поля операции, которые сравниваются между проведением через save() и bulk_post
+# (ссылка на документ и описание с номером документа сравниваются отдельно)
+JOURNAL_ROW_FIELDS = (
+    'transaction_type', 'date', 'amount', 'cash_register_id', 'currency_id',
+    'item_id', 'employee_id', 'is_active', 'created_by_id',
+)
+
+
+def journal_writes(queries):
+    """Запросы INSERT/UPDATE/DELETE к таблице операций среди выполненных запросов"""
+    table = Transaction._meta.db_table
+    return [
+        query['sql'] for query in queries
+        if table in query['sql'] and query['sql'].lstrip().split(' ', 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')
+    ]
+
+
+class JournalTestCase(TestCase):
+    """Общие справочники для тестов проведения"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('accountant', password='secret')
+        cls.usd = Currency.objects.create(code='USD', name='Доллар', symbol='$')
+        cls.rub = Currency.objects.create(code='RUB', name='Рубль', symbol='₽')
+        cls.main = CashRegister.objects.create(name='Основная')
+        cls.second = CashRegister.objects.create(name='Вторая')
+        cls.sales = IncomeExpenseItem.objects.create(name='Продажи', type='income')
+        cls.travel = IncomeExpenseItem.objects.create(name='Командировки', type='expense')
+        cls.employee = Employee.objects.create(name='Петров Иван', first_name='Иван', last_name='Петров')
+        cls.date = timezone.now() - timedelta(hours=1)
+        CurrencyRate.objects.create(from_currency=cls.usd, to_currency=cls.rub, rate=Decimal('90.1234'), date=cls.date.date())
+
+    def income(self, amount='1000', **kwargs):
+        """Проведенное оприходование в основную кассу"""
+        fields = {'cash_register': self.main, 'currency': self.usd, 'amount': Decimal(amount), 'item': self.sales, 'date': self.date}
+        fields.update(kwargs)
+        return IncomeDocument.objects.create(**fields)
+
+    def assertBalance(self, cash_register, currency, expected):
+        self.assertEqual(cash_register.get_balance(currency), Decimal(expected))
+
+    def assertNoJournalWrites(self, document):
+        """Пересохранение документа без изменений не пишет в журнал операций"""
+        document = type(document).objects.get(pk=document.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            document.save()
+        self.assertEqual(journal_writes(ctx.captured_queries), [])
+
+
+class IncomeExpenseJournalTests(JournalTestCase):
+    """Операции оприходования и расхода при создании, изменении и пометке на удаление"""
+
+    def test_create_posts_single_transaction(self):
+        document = self.income('1000')
+        operation = Transaction.objects.get(income_document=document)
+        self.assertTrue(document.is_posted)
+        self.assertEqual(operation.transaction_type, 'income')
+        self.assertEqual(operation.amount, Decimal('1000'))
+        self.assertTrue(operation.is_active)
+        self.assertBalance(self.main, self.usd, '1000')
+
+    def test_edit_updates_transaction_in_place(self):
+        document = self.income('1000')
+        operation_pk = Transaction.objects.get(income_document=document).pk
+        document.amount = Decimal('1200')
+        document.save()
+        operation = Transaction.objects.get(income_document=document)
+        self.assertEqual(operation.pk, operation_pk)
+        self.assertEqual(operation.amount, Decimal('1200'))
+        self.assertBalance(self.main, self.usd, '1200')
+
+    def test_expense_reduces_balance(self):
+        self.income('1000')
+        document = ExpenseDocument.objects.create(
+            cash_register=self.main, currency=self.usd, amount=Decimal('300'), item=self.travel, date=self.date
+        )
+        self.assertEqual(Transaction.objects.get(expense_document=document).amount, Decimal('-300'))
+        self.assertBalance(self.main, self.usd, '700')
+
+    def test_soft_delete_and_undelete(self):
+        document = self.income('1000')
+        document.is_deleted = True
+        document.save()
+        self.assertFalse(IncomeDocument.objects.get(pk=document.pk).is_posted)
+        self.assertFalse(Transaction.objects.filter(income_document=document).exists())
+        self.assertBalance(self.main, self.usd, '0')
+
+        document.is_deleted = False
+        document.save()
+        self.assertTrue(IncomeDocument.objects.get(pk=document.pk).is_posted)
+        self.assertTrue(Transaction.objects.get(income_document=document).is_active)
+        self.assertBalance(self.main, self.usd, '1000')
+
+    def test_unchanged_resave_skips_journal(self):
+        self.assertNoJournalWrites(self.income('1000'))
+        expense = ExpenseDocument.objects.create(
+            cash_register=self.main, currency=self.usd, amount=Decimal('100'), item=self.travel, date=self.date
+        )
+        self.assertNoJournalWrites(expense)
+
+
+class TransferConversionJournalTests(JournalTestCase):
+    """Операции перемещения и конвертации (две операции на документ)"""
+
+    def setUp(self):
+        self.income('1000')
+
+    def test_transfer_moves_balance(self):
+        transfer = CashTransfer.objects.create(
+            from_cash_register=self.main, to_cash_register=self.second, currency=self.usd,
+            amount=Decimal('100'), date=self.date
+        )
+        self.assertEqual(Transaction.objects.filter(cash_transfer=transfer).count(), 2)
+        self.assertBalance(self.main, self.usd, '900')
+        self.assertBalance(self.second, self.usd, '100')
+
+    def test_transfer_edit_updates_legs_in_place(self):
+        transfer = CashTransfer.objects.create(
+            from_cash_register=self.main, to_cash_register=self.second, currency=self.usd,
+            amount=Decimal('100'), date=self.date
+        )
+        leg_pks = set(Transaction.objects.filter(cash_transfer=transfer).values_list('pk', flat=True))
+        transfer.amount = Decimal('250')
+        transfer.save()
+        legs = Transaction.objects.filter(cash_transfer=transfer)
+        self.assertEqual(set(legs.values_list('pk', flat=True)), leg_pks)
+        self.assertEqual(sorted(legs.values_list('amount', flat=True)), [Decimal('-250'), Decimal('250')])
+        self.assertBalance(self.main, self.usd, '750')
+
+    def test_transfer_soft_delete_and_undelete(self):
+        transfer = CashTransfer.objects.create(
+            from_cash_register=self.main, to_cash_register=self.second, currency=self.usd,
+            amount=Decimal('100'), date=self.date
+        )
+        transfer.is_deleted = True
+        transfer.save()
+        self.assertBalance(self.main, self.usd, '1000')
+        self.assertBalance(self.second, self.usd, '0')
+        transfer.is_deleted = False
+        transfer.save()
+        self.assertBalance(self.second, self.usd, '100')
+
+    def test_conversion_uses_rate(self):
+        conversion = CurrencyConversion.objects.create(
+            cash_register=self.main, from_currency=self.usd, to_currency=self.rub,
+            from_amount=Decimal('10'), to_amount=Decimal('0'), exchange_rate=Decimal('0'), date=self.date
+        )
+        self.assertEqual(conversion.to_amount, Decimal('901.23'))
+        self.assertBalance(self.main, self.usd, '990')
+        self.assertBalance(self.main, self.rub, '901.23')
+
+    def test_unchanged_resave_skips_journal(self):
+        transfer = CashTransfer.objects.create(
+            from_cash_register=self.main, to_cash_register=self.second, currency=self.usd,
+            amount=Decimal('100'), date=self.date
+        )
+        self.assertNoJournalWrites(transfer)
+        conversion = CurrencyConversion.objects.create(
+            cash_register=self.main, from_currency=self.usd, to_currency=self.rub,
+            from_amount=Decimal('10'), to_amount=Decimal('0'), exchange_rate=Decimal('0'), date=self.date
+        )
+        self.assertNoJournalWrites(conversion)
+
+
+class AdvanceJournalTests(JournalTestCase):
+    """Операции подотчетных средств: выдача, возврат, дополнительная выдача, авансовый отчет"""
+
+    def setUp(self):
+        self.income('1000')
+        self.payment = AdvancePayment.objects.create(
+            employee=self.employee, cash_register=self.main, currency=self.usd,
+            amount=Decimal('300'), expense_item=self.travel, purpose='Командировка', date=self.date
+        )
+
+    def report(self, amounts):
+        """
+        Подтвержденный авансовый отчет по выдаче со строками на суммы amounts.
+        Отчет без строк не проходит clean(), поэтому сначала записывается в обход save(),
+        как форма админки до сохранения строк
+        """
+        report = AdvanceReport(
+            advance_payment=self.payment, currency=self.usd, total_amount=Decimal('0'),
+            close_advance_payment=True, date=self.date
+        )
+        AdvanceReport.fill_document_numbers([report])
+        AdvanceReport.objects.bulk_create([report])
+        for amount in amounts:
+            AdvanceReportItem.objects.create(
+                report=report, item=self.travel, amount=Decimal(amount), description='Расход', date=self.date
+            )
+        report.total_amount = Decimal('0')
+        report.status = 'confirmed'
+        report.save()
+        return report
+
+    def test_payment_return_and_additional(self):
+        AdditionalAdvancePayment.objects.create(
+            original_advance_payment=self.payment, cash_register=self.main, currency=self.usd,
+            amount=Decimal('50'), purpose='Доплата', date=self.date
+        )
+        AdvanceReturn.objects.create(
+            advance_payment=self.payment, employee=self.employee, cash_register=self.main,
+            currency=self.usd, amount=Decimal('20'), date=self.date
+        )
+        self.assertBalance(self.main, self.usd, '670')
+        self.assertEqual(self.employee.get_advance_balance(self.usd), Decimal('330'))
+
+    def test_report_links_items_to_transactions(self):
+        report = self.report(['200', '60'])
+        for item in AdvanceReportItem.objects.filter(report=report):
+            self.assertIsNotNone(item.transaction_id)
+            operation = Transaction.objects.get(pk=item.transaction_id)
+            self.assertEqual(operation.advance_report_item_id, item.pk)
+            self.assertEqual(operation.amount, -item.amount)
+        returned = Transaction.objects.get(advance_report=report, transaction_type='advance_return_report')
+        self.assertEqual(returned.amount, Decimal('40'))
+
+    def test_report_unconfirm_removes_transactions(self):
+        report = self.report(['200'])
+        report.status = 'draft'
+        report.save()
+        self.assertFalse(Transaction.objects.filter(advance_report=report).exists())
+        self.assertFalse(AdvanceReport.objects.get(pk=report.pk).is_posted)
+
+    def test_report_resaved_on_deleted_payment(self):
+        report = self.report(['200'])
+        self.payment.is_deleted = True
+        self.payment.save()
+        # Операции возврата по отчету ссылаются и на выдачу: при ее удалении
+        # пересохраненный отчет записывает их недействующими
+        report = AdvanceReport.objects.get(pk=report.pk)
+        report.save()
+        returned = Transaction.objects.get(advance_report=report, transaction_type='advance_return_report')
+        self.assertFalse(returned.is_active)
+
+        self.payment.is_deleted = False
+        self.payment.save()
+        returned.refresh_from_db()
+        self.assertTrue(returned.is_active)
+
+    def report_journal(self, report):
+        """Операции отчета (сравниваемые поля и строка отчета) и ссылки строк отчета на операции"""
+        rows = sorted(
+            (tuple(getattr(operation, field) for field in JOURNAL_ROW_FIELDS), operation.advance_report_item_id, operation.description)
+            for operation in Transaction.objects.filter(advance_report=report)
+        )
+        links = {
+            item.pk: Transaction.objects.get(pk=item.transaction_id).advance_report_item_id
+            for item in AdvanceReportItem.objects.filter(report=report)
+        }
+        return rows, links
+
+    def test_draft_report_resave_skips_journal(self):
+        report = self.report(['200'])
+        report.status = 'draft'
+        report.save()
+        self.assertNoJournalWrites(report)
+        self.assertFalse(Transaction.objects.filter(advance_report=report).exists())
+
+    def test_confirmed_report_resave_reproduces_journal(self):
+        # Подтвержденный отчет при пересохранении переписывает свои операции заново:
+        # набор операций и ссылки строк отчета на них должны совпасть с исходными
+        report = self.report(['200', '60'])
+        rows, links = self.report_journal(report)
+        balance = self.main.get_balance(self.usd)
+        self.assertEqual(links, {item_pk: item_pk for item_pk in links})
+        AdvanceReport.objects.get(pk=report.pk).save()
+        self.assertEqual(self.report_journal(report), (rows, links))
+        self.assertEqual(self.main.get_balance(self.usd), balance)
+
+    def test_unchanged_resave_skips_journal(self):
+        self.assertNoJournalWrites(self.payment)
+        self.assertNoJournalWrites(AdvanceReturn.objects.create(
+            advance_payment=self.payment, employee=self.employee, cash_register=self.main,
+            currency=self.usd, amount=Decimal('20'), date=self.date
+        ))
+        self.assertNoJournalWrites(AdditionalAdvancePayment.objects.create(
+            original_advance_payment=self.payment, cash_register=self.main, currency=self.usd,
+            amount=Decimal('50'), purpose='Доплата', date=self.date
+        ))
+
+
+class BulkPostTests(JournalTestCase):
+    """bulk_post создает те же операции, что и проведение каждого документа через save()"""
+
+    def journal_rows(self, document, field_name):
+        """Операции документа: сравниваемые поля и описание с номером документа, замененным на N"""
+        return sorted(
+            (
+                tuple(getattr(operation, field) for field in JOURNAL_ROW_FIELDS),
+                operation.description.replace(document.number, 'N'),
+            )
+            for operation in Transaction.objects.filter(**{field_name: document})
+        )
+
+    def assertSameJournal(self, model, field_name, fields):
+        saved = model(**fields)
+        saved._current_user = self.user
+        saved.save()
+        posted, = model.bulk_post([model(**fields)], user=self.user)
+        self.assertTrue(model.objects.get(pk=posted.pk).is_posted)
+        self.assertEqual(self.journal_rows(posted, field_name), self.journal_rows(saved, field_name))
+
+    def test_income(self):
+        self.assertSameJournal(IncomeDocument, 'income_document', {
+            'cash_register': self.main, 'currency': self.usd, 'amount': Decimal('1000'),
+            'item': self.sales, 'date': self.date,
+        })
+
+    def test_expense(self):
+        self.income('1000')
+        self.assertSameJournal(ExpenseDocument, 'expense_document', {
+            'cash_register': self.main, 'currency': self.usd, 'amount': Decimal('100'),
+            'item': self.travel, 'date': self.date,
+        })
+
+    def test_transfer(self):
+        self.income('1000')
+        self.assertSameJournal(CashTransfer, 'cash_transfer', {
+            'from_cash_register': self.main, 'to_cash_register': self.second, 'currency': self.usd,
+            'amount': Decimal('100'), 'date': self.date,
+        })
+
+    def test_conversion(self):
+        self.income('1000')
+        self.assertSameJournal(CurrencyConversion, 'currency_conversion', {
+            'cash_register': self.main, 'from_currency': self.usd, 'to_currency': self.rub,
+            'from_amount': Decimal('10'), 'to_amount': Decimal('901.23'), 'exchange_rate': Decimal('90.1234'),
+            'date': self.date,
+        })
+
+    def transfers(self, *rows):
+        """Несохраненные перемещения (касса-источник, касса-получатель, сумма) с кассами, заданными по id"""
+        return [
+            CashTransfer(
+                from_cash_register_id=source.pk, to_cash_register_id=target.pk, currency=self.usd,
+                amount=Decimal(amount), date=self.date + timedelta(minutes=minutes)
+            )
+            for minutes, (source, target, amount) in enumerate(rows)
+        ]
+
+    def test_overdraft_rejected_before_insert(self):
+        self.income('100')
+        with self.assertRaises(ValidationError):
+            CashTransfer.bulk_post(self.transfers((self.main, self.second, '60'), (self.main, self.second, '60')))
+        self.assertFalse(CashTransfer.objects.exists())
+        self.assertBalance(self.main, self.usd, '100')
+        with self.assertRaises(ValidationError):
+            CurrencyConversion.bulk_post([CurrencyConversion(
+                cash_register=self.main, from_currency=self.usd, to_currency=self.rub, from_amount=Decimal('200'),
+                to_amount=Decimal('18024.68'), exchange_rate=Decimal('90.1234'), date=self.date,
+            )])
+        self.assertFalse(CurrencyConversion.objects.exists())
+
+    def test_batch_transfers_update_balances(self):
+        self.income('100')
+        # Вторая касса пуста: возврат покрывается перемещением, идущим раньше в пакете
+        CashTransfer.bulk_post(self.transfers((self.main, self.second, '100'), (self.second, self.main, '40')))
+        self.assertBalance(self.main, self.usd, '40')
+        self.assertBalance(self.second, self.usd, '60')
+
+    def test_cash_registers_loaded_once(self):
+        self.income('1000')
+        transfers = self.transfers(*[(self.main, self.second, '10')] * 5)
+        with CaptureQueriesContext(connection) as ctx:
+            CashTransfer.bulk_post(transfers)
+        table = CashRegister._meta.db_table
+        register_selects = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+        ]
+        # in_bulk для наименований в описаниях и кассы списаний для проверки остатков
+        self.assertEqual(len(register_selects), 2)
+        self.assertEqual(
+            Transaction.objects.filter(cash_transfer=transfers[0], amount__gt=0).get().description,
+            f'Перемещение между кассами №{transfers[0].number} (в {self.second.name})'
+        )
+
+    def test_deleted_documents_are_not_posted(self):
+        document, = IncomeDocument.bulk_post([IncomeDocument(
+            cash_register=self.main, currency=self.usd, amount=Decimal('1000'),
+            item=self.sales, date=self.date, is_deleted=True,
+        )])
+        self.assertFalse(IncomeDocument.objects.get(pk=document.pk).is_posted)
+        self.assertFalse(Transaction.objects.filter(income_document=document).exists())
+
+    def test_unsupported_document(self):
+        with self.assertRaises(NotImplementedError):
+            AdvanceReturn.bulk_post([AdvanceReturn(
+                employee=self.employee, cash_register=self.main, currency=self.usd, amount=Decimal('10'), date=self.date
+            )])
+        self.assertFalse(AdvanceReturn.objects.exists())
+
+
+class RawBulkInsertTests(JournalTestCase):
+    """Вставка операций Transaction.raw_bulk_insert"""
+
+    @skipUnless(connection.vendor == 'postgresql', 'INSERT через json_populate_recordset используется только на PostgreSQL')
+    def test_json_encoding(self):
+        document = self.income('1000')
+        date = timezone.now().replace(microsecond=123456)
+        Transaction.raw_bulk_insert([Transaction(
+            income_document=document, transaction_type='income', date=date, amount=Decimal('1234.56'),
+            description='Импорт "в кавычках" \\ и с обратной косой чертой', cash_register=self.main,
+            currency=self.usd, item=self.sales, employee=self.employee, created_by=self.user,
+        )])
+        row = Transaction.objects.filter(income_document=document, amount=Decimal('1234.56')).get()
+        self.assertEqual(row.date, date)
+        self.assertEqual(row.description, 'Импорт "в кавычках" \\ и с обратной косой чертой')
+        # UUID документов и справочников, ссылка на пользователя (целый ключ)
+        self.assertEqual(
+            (row.income_document_id, row.employee_id, row.item_id, row.created_by_id),
+            (document.pk, self.employee.pk, self.sales.pk, self.user.pk)
+        )
+        self.assertTrue(row.is_active)
+        self.assertIsNotNone(row.created_at)
+        self.assertBalance(self.main, self.usd, '2234.56')
+
+
+class ConstraintTests(JournalTestCase):
+    """Ограничения БД для строк, записанных в обход save() и clean()"""
+
+    def test_transaction_requires_source_document(self):
+        with self.assertRaises(IntegrityError), db_transaction.atomic():
+            Transaction.objects.create(
+                transaction_type='income', amount=Decimal('10'), date=self.date,
+                cash_register=self.main, currency=self.usd
+            )
+
+    def test_conversion_amount_matches_rate(self):
+        self.income('1000')
+        conversion = CurrencyConversion.objects.create(
+            cash_register=self.main, from_currency=self.usd, to_currency=self.rub,
+            from_amount=Decimal('10'), to_amount=Decimal('0'), exchange_rate=Decimal('0'), date=self.date
+        )
+        with self.assertRaises(IntegrityError), db_transaction.atomic():
+            CurrencyConversion.objects.filter(pk=conversion.pk).update(to_amount=F('to_amount') + 1)
+
+
+class TransactionAdminTests(JournalTestCase):
+    """Список операций в админке"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+
+    def test_export_csv_action(self):
+        selected = Transaction.objects.get(income_document=self.income('100'))
+        self.income('200')
+        response = self.client.post('/admin/accounting/transaction/', {
+            'action': 'export_csv', '_selected_action': [selected.pk],
+        })
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8').lstrip('\ufeff')
+        header, *rows = csv.reader(io.StringIO(content))
+        self.assertEqual(len(header), len(rows[0]))
+        self.assertEqual([row[4] for row in rows], ['100.00'])
+
+
+    def test_paginator_counts_exactly(self):
+        self.income('100')
+        self.income('200')
+        self.assertEqual(EstimatedCountPaginator(Transaction.objects.all(), 100).count, 2)
+        self.assertEqual(self.client.get('/admin/accounting/transaction/').context['cl'].result_count, 2)
+
+    def test_paginator_estimate_on_postgresql(self):
+        self.income('100')
+        self.income('200')
+        with mock.patch('accounting.admin.connections') as connections:
+            postgresql = connections.__getitem__.return_value
+            postgresql.vendor = 'postgresql'
+            cursor = postgresql.cursor.return_value.__enter__.return_value
+            cursor.fetchone.return_value = (250000,)
+            self.assertEqual(EstimatedCountPaginator(Transaction.objects.all(), 100).count, 250000)
+            # отфильтрованный список и небольшая таблица - точный подсчет
+            self.assertEqual(EstimatedCountPaginator(Transaction.objects.filter(amount__gt=150), 100).count, 1)
+            cursor.fetchone.return_value = (50,)
+            self.assertEqual(EstimatedCountPaginator(Transaction.objects.all(), 100).count, 2)
+
+
+class ApiFilterTests(JournalTestCase):
+    """Фильтрация списков API по параметрам запроса (QueryParamsFilterMixin)"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def numbers(self, url):
+        return sorted(row['number'] for row in self.client.get(url).json()['results'])
+
+    def test_document_filters(self):
+        old = self.income('100', date=self.date - timedelta(days=10))
+        main = self.income('200')
+        second = self.income('300', cash_register=self.second)
+        url = '/api/v1/income-documents/'
+        self.assertEqual(self.numbers(f'{url}?cash_register={self.main.pk}'), sorted([old.number, main.number]))
+        self.assertEqual(self.numbers(f'{url}?date_from={(self.date - timedelta(days=1)).date()}'), sorted([main.number, second.number]))
+        self.assertEqual(
+            self.numbers(f'{url}?cash_register={self.main.pk}&date_to={(self.date - timedelta(days=1)).date()}'), [old.number]
+        )
+
+    def test_empty_params_ignored(self):
+        self.income('100')
+        self.income('200', cash_register=self.second)
+        self.assertEqual(self.client.get('/api/v1/income-documents/?cash_register=&currency=').json()['count'], 2)
+
+    def test_reference_filters(self):
+        eur = Currency.objects.create(code='EUR', name='Евро', symbol='€')
+        CurrencyRate.objects.create(from_currency=eur, to_currency=self.rub, rate=Decimal('98.5'), date=self.date.date())
+        rates = self.client.get(f'/api/v1/currency-rates/?from_currency={eur.pk}').json()['results']
+        self.assertEqual([Decimal(rate['rate']) for rate in rates], [Decimal('98.5')])
+        items = self.client.get('/api/v1/income-expense-items/?type=expense').json()['results']
+        self.assertEqual([item['name'] for item in items], ['Командировки'])
+
+
+    def test_boolean_params(self):
+        Currency.objects.create(code='EUR', name='Евро', symbol='€', is_active=False)
+        for value, expected in (('true', ['RUB', 'USD']), ('1', ['RUB', 'USD']), ('Yes', ['RUB', 'USD']),
+                                ('FALSE', ['EUR']), ('0', ['EUR']), ('no', ['EUR']), ('maybe', ['EUR', 'RUB', 'USD'])):
+            with self.subTest(is_active=value):
+                rows = self.client.get(f'/api/v1/currencies/?is_active={value}').json()['results']
+                self.assertEqual([row['code'] for row in rows], expected)
+
+
+class ReportTests(JournalTestCase):
+    """Отчеты по операциям за период: страницы и выгрузка"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('manager', is_staff=True))
+
+    @mock.patch('accounting.views.REPORT_PAGE_SIZE', 2)
+    def test_transactions_paginated(self):
+        documents = [self.income(amount, date=self.date - timedelta(minutes=minutes)) for minutes, amount in enumerate('321')]
+        self.income('5', cash_register=self.second)
+        url = f'/reports/transactions-period/?cash_register={self.main.pk}'
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+        # по возрастанию даты
+        self.assertEqual([row.income_document_id for row in response.context['transactions']], [documents[2].pk, documents[1].pk])
+        self.assertEqual(response.context['page_query'], f'cash_register={self.main.pk}')
+        response = self.client.get(f'{url}&page=2')
+        self.assertEqual([row.income_document_id for row in response.context['transactions']], [documents[0].pk])
+        # номер страницы вне диапазона - последняя страница
+        self.assertEqual(self.client.get(f'{url}&page=99').context['page_obj'].number, 2)
+
+    @mock.patch('accounting.views.REPORT_PAGE_SIZE', 1)
+    def test_advance_operations_paginated(self):
+        self.income('1000')
+        payment = AdvancePayment.objects.create(
+            employee=self.employee, cash_register=self.main, currency=self.usd, amount=Decimal('300'),
+            expense_item=self.travel, purpose='Командировка', date=self.date
+        )
+        AdvanceReturn.objects.create(
+            advance_payment=payment, employee=self.employee, cash_register=self.main, currency=self.usd,
+            amount=Decimal('100'), date=self.date + timedelta(minutes=1)
+        )
+        response = self.client.get(f'/reports/advance-operations/?employee={self.employee.pk}&page=2')
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertEqual([row.abs_amount for row in response.context['transactions']], [Decimal('100')])
+
+
+    def test_transactions_csv(self):
+        self.income('100', description='Выручка; "касса"')
+        self.income('200', cash_register=self.second)
+        response = self.client.get(f'/reports/transactions-period/?cash_register={self.main.pk}&page=2&format=csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions_period.csv"')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        header, *rows = csv.reader(io.StringIO(content.lstrip('\ufeff')))
+        self.assertEqual(header[:5], ['Дата', 'Тип операции', 'Касса', 'Валюта', 'Сумма'])
+        # все операции отчета без разбиения на страницы; тип - название, а не код
+        self.assertEqual(
+            [row[1:5] + row[-1:] for row in rows],
+            [['Оприходование денег', 'Основная', 'USD', '100.00', 'Выручка; "касса"']]
+        )
+
+
+class SharedCacheTestCase(JournalTestCase):
+    """Тесты с общим для процессов кэшем (файловый кэш вместо локального в памяти)"""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.enterContext(self.settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+        }))
+        self.client.force_login(self.user)
+        # Транзакция TestCase не фиксируется: сбросы версий кэша, отложенные при создании
+        # setUpTestData, не выполнятся и не должны заменять собой сбросы из теста
+        connection.run_on_commit.clear()
+
+    @contextmanager
+    def committed(self):
+        """Выполнить on_commit-обработчики блока и убрать их из очереди, как при фиксации транзакции"""
+        start = len(connection.run_on_commit)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            yield callbacks
+        del connection.run_on_commit[start:]
+
+    def currency_names(self):
+        return [row['name'] for row in self.client.get('/api/v1/currencies/').json()['results']]
+
+
+class ReferenceCacheTests(SharedCacheTestCase):
+    """Кэш списков справочников API (CachedListMixin) и его сброс"""
+
+    def test_list_served_from_cache(self):
+        self.assertEqual(self.currency_names(), ['Рубль', 'Доллар'])
+        # update() не отправляет сигналов: ответ остается закэшированным
+        Currency.objects.filter(pk=self.usd.pk).update(name='Доллар США')
+        self.assertEqual(self.currency_names(), ['Рубль', 'Доллар'])
+
+    def test_save_invalidates_after_commit(self):
+        self.assertEqual(self.currency_names(), ['Рубль', 'Доллар'])
+        with self.committed():
+            self.usd.name = 'Доллар США'
+            self.usd.save()
+            # до фиксации транзакции версия кэша не меняется
+            self.assertEqual(self.currency_names(), ['Рубль', 'Доллар'])
+        self.assertEqual(self.currency_names(), ['Рубль', 'Доллар США'])
+
+    def test_delete_invalidates_after_commit(self):
+        with self.committed():
+            currency = Currency.objects.create(code='EUR', name='Евро', symbol='€')
+        self.assertEqual(self.currency_names(), ['Евро', 'Рубль', 'Доллар'])
+        with self.committed():
+            currency.delete()
+        self.assertEqual(self.currency_names(), ['Рубль', 'Доллар'])
+
+    def test_local_cache_not_used(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(self.currency_names(), ['Рубль', 'Доллар'])
+            Currency.objects.filter(pk=self.usd.pk).update(name='Доллар США')
+            self.assertEqual(self.currency_names(), ['Рубль', 'Доллар США'])
+
+
+class ReportCacheTests(SharedCacheTestCase):
+    """Кэш рассчитанных данных отчетов (get_cached_report_data) и его сброс"""
+
+    def main_usd_balance(self):
+        response = self.client.get('/reports/cash-balance/')
+        return next(
+            row['balance'] for row in response.context['balances']
+            if row['cash_register'] == self.main and row['currency'] == self.usd
+        )
+
+    def test_data_cached_until_commit(self):
+        self.client.force_login(User.objects.create_user('manager', is_staff=True))
+        with self.committed():
+            self.income('1000')
+        self.assertEqual(self.main_usd_balance(), Decimal('1000'))
+        with self.committed():
+            self.income('500')
+            self.assertEqual(self.main_usd_balance(), Decimal('1000'))
+        self.assertEqual(self.main_usd_balance(), Decimal('1500'))
+
+    def test_version_bumped_once_per_transaction(self):
+        version = get_report_cache_version()
+        with self.committed() as callbacks:
+            self.income('1000')
+            ExpenseDocument.objects.create(
+                cash_register=self.main, currency=self.usd, amount=Decimal('100'), item=self.travel, date=self.date
+            )
+            IncomeDocument.bulk_post([IncomeDocument(
+                cash_register=self.second, currency=self.usd, amount=Decimal('300'), item=self.sales, date=self.date
+            )])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_report_cache_version(), version + 1)
+
+    def test_rolled_back_savepoint_keeps_outer_bump(self):
+        version = get_report_cache_version()
+        with self.committed():
+            with self.assertRaises(IntegrityError), db_transaction.atomic():
+                self.income('1000')
+                Transaction.objects.create(
+                    transaction_type='income', amount=Decimal('10'), date=self.date,
+                    cash_register=self.main, currency=self.usd
+                )
+            self.income('500')
+        self.assertEqual(get_report_cache_version(), version + 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(TestCase):
+    """Ограничение неудачных попыток входа в API (login_view)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('accountant', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def login(self, password, username='accountant'):
+        return self.client.post(
+            '/api/v1/auth/login/', {'username': username, 'password': password}, content_type='application/json'
+        )
+
+    def fail_logins(self, attempts):
+        for attempt in range(attempts):
+            self.assertEqual(self.login(f'wrong{attempt}').status_code, 401)
+
+    def test_throttled_after_limit(self):
+        self.fail_logins(LOGIN_FAILURE_LIMIT)
+        with mock.patch('accounting.auth_views.authenticate') as authenticate:
+            response = self.login('secret')
+        authenticate.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(LOGIN_FAILURE_TIMEOUT))
+
+    def test_success_resets_counter(self):
+        self.fail_logins(LOGIN_FAILURE_LIMIT - 1)
+        self.assertEqual(self.login('secret').status_code, 200)
+        self.fail_logins(LOGIN_FAILURE_LIMIT - 1)
+        self.assertEqual(self.login('secret').status_code, 200)
+
+    def test_other_usernames_not_throttled(self):
+        self.fail_logins(LOGIN_FAILURE_LIMIT)
+        User.objects.create_user('cashier', password='secret')
+        self.assertEqual(self.login('secret', username='cashier').status_code, 200)
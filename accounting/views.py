@@ -2,16 +2,215 @@
 Views для системы финансового учета.
 Включает views для отчетов и навигации.
 """
+import uuid
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.shortcuts import render
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from decimal import Decimal
+from itertools import groupby
+from operator import attrgetter
+from django.db.models.functions import Abs
 from .models import (
     CashRegister, Currency, Employee, Transaction,
     IncomeDocument, ExpenseDocument, AdvancePayment, AdvanceReport,
     AdvanceReturn, AdditionalAdvancePayment, AdvanceReportItem
 )
+from .exports import transactions_csv_response
+from .signals import get_reference_cache_version, get_report_cache_version, is_shared_cache
+
+
+def day_start(day):
+    """
+    Начало дня day в текущем часовом поясе. Периоды отчетов задаются полуоткрытым интервалом
+    date >= day_start(from_date), date < day_start(to_date + 1 день): сравнение с самим полем
+    использует индекс по дате, в отличие от приведения date__date для каждой строки.
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_report_date(value, default):
+    """Дата из параметра запроса в формате ГГГГ-ММ-ДД; default - если параметр пуст или некорректен"""
+    if value:
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    return default
+
+
+def parse_report_id(value):
+    """
+    Идентификатор справочника (UUID) из параметра фильтра отчета; None - если параметр пуст
+    или некорректен. Одно и то же значение используется в фильтре и для выбранного пункта формы.
+    """
+    if value:
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            pass
+    return None
+
+
+# Период отчетов по умолчанию: последние дни до текущей даты
+REPORT_DEFAULT_PERIOD_DAYS = 30
+
+
+def parse_report_period(request, days=REPORT_DEFAULT_PERIOD_DAYS):
+    """Период отчета (from_date, to_date) из параметров запроса; по умолчанию - последние days дней"""
+    today = timezone.localdate()
+    from_date = parse_report_date(request.GET.get('from_date'), today - timedelta(days=days))
+    to_date = parse_report_date(request.GET.get('to_date'), today)
+    return from_date, to_date
+
+
+def period_lookups(from_date, to_date, field='date'):
+    """Условия фильтра по полю даты field за период отчета с from_date по to_date включительно"""
+    return {
+        f'{field}__gte': day_start(from_date),
+        f'{field}__lt': day_start(to_date + timedelta(days=1)),
+    }
+
+
+def period_transactions(from_date, to_date, cash_register_id=None, currency_id=None,
+                        employee_id=None, transaction_types=None):
+    """Операции журнала за период отчета; незаданные фильтры не применяются"""
+    filters = period_lookups(from_date, to_date)
+    if cash_register_id:
+        filters['cash_register_id'] = cash_register_id
+    if currency_id:
+        filters['currency_id'] = currency_id
+    if employee_id:
+        filters['employee_id'] = employee_id
+    if transaction_types:
+        filters['transaction_type__in'] = transaction_types
+    return Transaction.objects.filter(**filters)
+
+
+# Время хранения списков активных записей справочников для фильтров отчетов, секунд
+REFERENCE_CACHE_TIMEOUT = 60 * 5
+
+
+def get_active_references(model):
+    """
+    Активные записи справочника (кассы, валюты, сотрудники) для таблиц и фильтров отчетов.
+    При общем кэше (см. is_shared_cache) список кэшируется; ключ включает версию справочника,
+    которая увеличивается при сохранении/удалении записи (см. signals), поэтому изменения видны сразу.
+    """
+    if not is_shared_cache():
+        return list(model.objects.filter(is_active=True))
+    key = f'reports:{model._meta.label_lower}:{get_reference_cache_version(model)}:active'
+    return cache.get_or_set(key, lambda: list(model.objects.filter(is_active=True)), REFERENCE_CACHE_TIMEOUT)
+
+
+# Число операций на странице отчетов со списком операций
+REPORT_PAGE_SIZE = 100
+
+
+def paginate_report(request, queryset):
+    """
+    Страница операций отчета (параметр page) и строка запроса с фильтрами отчета без номера страницы
+    для ссылок на другие страницы. Загружаются только строки текущей страницы.
+    """
+    page_obj = Paginator(queryset, REPORT_PAGE_SIZE).get_page(request.GET.get('page'))
+    params = request.GET.copy()
+    params.pop('page', None)
+    params.pop('format', None)
+    return page_obj, params.urlencode()
+
+
+# Время хранения рассчитанных данных отчетов, секунд
+REPORT_CACHE_TIMEOUT = 120
+
+
+def get_cached_report_data(name, params, build):
+    """
+    Рассчитанные данные отчета name (остатки, итоги, группировки) для параметров params.
+    При общем кэше (см. is_shared_cache) результат build() кэшируется; ключ включает версию кэша
+    отчетов, которая увеличивается при изменении операций, документов и справочников (см. signals).
+    Кэшируются только данные: страница отчета с шапкой админки и CSRF-токеном строится
+    для каждого запроса.
+    """
+    if not is_shared_cache():
+        return build()
+    key = f"reports:{name}:{get_report_cache_version()}:{':'.join(str(param) for param in params)}"
+    return cache.get_or_set(key, build, REPORT_CACHE_TIMEOUT)
+
+
+def build_cash_balances(cash_registers, currencies, date):
+    """Таблица остатков касс по валютам на конец дня date и итоги по валютам"""
+    # Остатки всех касс во всех валютах на конец дня отчета - одним запросом с группировкой
+    balances_map = CashRegister.get_balances_map(cash_registers, currencies, before=day_start(date + timedelta(days=1)))
+    
+    # Итоги по валютам - по сгруппированным строкам запроса, а не по всем ячейкам таблицы
+    currency_codes = {currency.pk: currency.code for currency in currencies}
+    totals_by_currency = dict.fromkeys(currency_codes.values(), Decimal('0.00'))
+    for (_, currency_id), total in balances_map.items():
+        totals_by_currency[currency_codes[currency_id]] += total
+    
+    # Формируем таблицу остатков
+    balances = [
+        {
+            'cash_register': cash_register,
+            'currency': currency,
+            'balance': balances_map.get((cash_register.pk, currency.pk), Decimal('0.00'))
+        }
+        for cash_register in cash_registers
+        for currency in currencies
+    ]
+    return balances, totals_by_currency
+
+
+def build_advance_balances(employees, currencies, nonzero_only):
+    """Остатки подотчетных средств сотрудников по валютам; nonzero_only - без нулевых остатков"""
+    # Остатки всех сотрудников по всем валютам - запросами с группировкой, без запроса на сотрудника
+    balances_map = Employee.get_advance_balances_map(employees)
+    
+    balances_data = []
+    for employee in employees:
+        for currency in currencies:
+            balance = balances_map.get((employee.pk, currency.pk), Decimal('0.00'))
+            if balance != 0 or not nonzero_only:
+                balances_data.append({
+                    'employee': employee,
+                    'currency': currency,
+                    'balance': balance
+                })
+    return balances_data
+
+
+def build_expenses_by_items(from_date, to_date, cash_register_id, currency_id):
+    """Строки подтвержденных авансовых отчетов за период, сгруппированные по статьям расходов, с итогами"""
+    # Получаем строки авансовых отчетов за период
+    report_items = AdvanceReportItem.objects.filter(
+        report__status='confirmed',
+        report__is_deleted=False,
+        **period_lookups(from_date, to_date, 'report__date')
+    )
+    
+    if cash_register_id:
+        report_items = report_items.filter(report__advance_payment__cash_register_id=cash_register_id)
+    if currency_id:
+        report_items = report_items.filter(report__currency_id=currency_id)
+    
+    # В таблице выводятся статья, номер и валюта отчета - загружаются тем же запросом,
+    # из присоединенных таблиц берутся только выводимые поля.
+    # Строки упорядочены по статьям, поэтому группируются за один проход
+    report_items = report_items.select_related('item', 'report__currency').only(
+        'date', 'amount', 'description', 'item__name', 'report__number', 'report__currency__code',
+    ).order_by('item__name', 'item_id', 'date')
+    
+    # Группируем по статьям расходов
+    items_data = {}
+    for _, group in groupby(report_items, key=attrgetter('item_id')):
+        group = list(group)
+        items_data[group[0].item] = {
+            'items': group,
+            'total': sum((item.amount for item in group), Decimal('0.00')),
+        }
+    return items_data
 
 
 @staff_member_required
@@ -53,35 +252,15 @@ def reports_index(request):
 @staff_member_required
 def report_cash_balance(request):
     """Отчет о текущем состоянии остатков по кассам"""
-    date = request.GET.get('date')
-    if not date:
-        date = timezone.now().date()
-    else:
-        try:
-            date = datetime.strptime(date, '%Y-%m-%d').date()
-        except ValueError:
-            date = timezone.now().date()
+    date = parse_report_date(request.GET.get('date'), timezone.localdate())
     
-    # Получаем все кассы и валюты
-    cash_registers = CashRegister.objects.filter(is_active=True)
-    currencies = Currency.objects.filter(is_active=True)
+    # Получаем все кассы и валюты (списки: используются и в таблице, и в контексте)
+    cash_registers = get_active_references(CashRegister)
+    currencies = get_active_references(Currency)
     
-    # Формируем таблицу остатков
-    balances = []
-    totals_by_currency = {}
-    
-    for cash_register in cash_registers:
-        for currency in currencies:
-            balance = cash_register.get_balance(currency, date)
-            balances.append({
-                'cash_register': cash_register,
-                'currency': currency,
-                'balance': balance
-            })
-            
-            if currency.code not in totals_by_currency:
-                totals_by_currency[currency.code] = Decimal('0.00')
-            totals_by_currency[currency.code] += balance
+    balances, totals_by_currency = get_cached_report_data(
+        'cash_balance', (date,), lambda: build_cash_balances(cash_registers, currencies, date)
+    )
     
     context = {
         'title': 'Остатки по кассам',
@@ -97,52 +276,36 @@ def report_cash_balance(request):
 @staff_member_required
 def report_transactions_period(request):
     """Отчет об операциях и движениях денег за период"""
-    from_date = request.GET.get('from_date')
-    to_date = request.GET.get('to_date')
-    cash_register_id = request.GET.get('cash_register')
-    currency_id = request.GET.get('currency')
-    
-    # Устанавливаем значения по умолчанию
-    if not from_date:
-        from_date = (timezone.now() - timedelta(days=30)).date()
-    else:
-        try:
-            from_date = datetime.strptime(from_date, '%Y-%m-%d').date()
-        except ValueError:
-            from_date = (timezone.now() - timedelta(days=30)).date()
-    
-    if not to_date:
-        to_date = timezone.now().date()
-    else:
-        try:
-            to_date = datetime.strptime(to_date, '%Y-%m-%d').date()
-        except ValueError:
-            to_date = timezone.now().date()
+    from_date, to_date = parse_report_period(request)
+    cash_register_id = parse_report_id(request.GET.get('cash_register'))
+    currency_id = parse_report_id(request.GET.get('currency'))
     
     # Фильтруем операции
-    transactions = Transaction.objects.filter(
-        date__date__gte=from_date,
-        date__date__lte=to_date
-    )
+    transactions = period_transactions(from_date, to_date, cash_register_id=cash_register_id, currency_id=currency_id)
     
-    if cash_register_id:
-        transactions = transactions.filter(cash_register_id=cash_register_id)
-    if currency_id:
-        transactions = transactions.filter(currency_id=currency_id)
+    # Выгрузка всех операций отчета в CSV (потоком, без разбиения на страницы)
+    if request.GET.get('format') == 'csv':
+        return transactions_csv_response(transactions, 'transactions_period.csv')
     
-    transactions = transactions.select_related(
-        'cash_register', 'currency', 'employee', 'item'
-    ).order_by('date')
+    # Загружаются только поля, выводимые в таблице отчета
+    transactions = transactions.with_references().only(
+        'date', 'transaction_type', 'amount', 'description',
+        'cash_register__name', 'currency__code', 'item__name',
+        'employee__last_name', 'employee__first_name', 'employee__middle_name',
+    ).order_by('date', 'pk')
+    page_obj, page_query = paginate_report(request, transactions)
     
     context = {
         'title': 'Операции и движения денег',
         'from_date': from_date,
         'to_date': to_date,
-        'transactions': transactions,
-        'cash_registers': CashRegister.objects.filter(is_active=True),
-        'currencies': Currency.objects.filter(is_active=True),
-        'selected_cash_register': int(cash_register_id) if cash_register_id else None,
-        'selected_currency': int(currency_id) if currency_id else None,
+        'transactions': page_obj.object_list,
+        'page_obj': page_obj,
+        'page_query': page_query,
+        'cash_registers': get_active_references(CashRegister),
+        'currencies': get_active_references(Currency),
+        'selected_cash_register': cash_register_id,
+        'selected_currency': currency_id,
     }
     return render(request, 'accounting/reports/transactions_period.html', context)
 
@@ -150,48 +313,35 @@ def report_transactions_period(request):
 @staff_member_required
 def report_advance_balance(request):
     """Отчет об остатках по подотчетным деньгам"""
-    date = request.GET.get('date')
-    employee_id = request.GET.get('employee')
-    currency_id = request.GET.get('currency')
+    date = parse_report_date(request.GET.get('date'), timezone.localdate())
+    employee_id = parse_report_id(request.GET.get('employee'))
+    currency_id = parse_report_id(request.GET.get('currency'))
     
-    if not date:
-        date = timezone.now().date()
-    else:
-        try:
-            date = datetime.strptime(date, '%Y-%m-%d').date()
-        except ValueError:
-            date = timezone.now().date()
-    
-    # Получаем сотрудников
-    employees = Employee.objects.filter(is_active=True)
+    # Получаем сотрудников и валюты (списки: обходятся во вложенном цикле).
+    # Выбранные в фильтре записи берутся из тех же кэшированных списков, что и для формы
+    active_employees = get_active_references(Employee)
+    active_currencies = get_active_references(Currency)
+    employees = active_employees
+    currencies = active_currencies
     if employee_id:
-        employees = employees.filter(id=employee_id)
-    
-    # Получаем валюты
-    currencies = Currency.objects.filter(is_active=True)
+        employees = [employee for employee in employees if employee.pk == employee_id]
     if currency_id:
-        currencies = currencies.filter(id=currency_id)
+        currencies = [currency for currency in currencies if currency.pk == currency_id]
     
-    # Формируем данные по остаткам
-    balances_data = []
-    for employee in employees:
-        for currency in currencies:
-            balance = employee.get_advance_balance(currency)
-            if balance != 0 or not employee_id:  # Показываем только ненулевые, если не выбран конкретный сотрудник
-                balances_data.append({
-                    'employee': employee,
-                    'currency': currency,
-                    'balance': balance
-                })
+    # Показываем только ненулевые остатки, если выбран конкретный сотрудник
+    balances_data = get_cached_report_data(
+        'advance_balance', (employee_id, currency_id),
+        lambda: build_advance_balances(employees, currencies, nonzero_only=bool(employee_id))
+    )
     
     context = {
         'title': 'Остатки по подотчетным деньгам',
         'date': date,
         'balances_data': balances_data,
-        'employees': Employee.objects.filter(is_active=True),
-        'currencies': Currency.objects.filter(is_active=True),
-        'selected_employee': int(employee_id) if employee_id else None,
-        'selected_currency': int(currency_id) if currency_id else None,
+        'employees': active_employees,
+        'currencies': active_currencies,
+        'selected_employee': employee_id,
+        'selected_currency': currency_id,
     }
     return render(request, 'accounting/reports/advance_balance.html', context)
 
@@ -199,27 +349,9 @@ def report_advance_balance(request):
 @staff_member_required
 def report_advance_operations(request):
     """Отчет «Касса по дням» - операции по подотчетным средствам"""
-    from_date = request.GET.get('from_date')
-    to_date = request.GET.get('to_date')
-    employee_id = request.GET.get('employee')
-    currency_id = request.GET.get('currency')
-    
-    # Устанавливаем значения по умолчанию
-    if not from_date:
-        from_date = (timezone.now() - timedelta(days=30)).date()
-    else:
-        try:
-            from_date = datetime.strptime(from_date, '%Y-%m-%d').date()
-        except ValueError:
-            from_date = (timezone.now() - timedelta(days=30)).date()
-    
-    if not to_date:
-        to_date = timezone.now().date()
-    else:
-        try:
-            to_date = datetime.strptime(to_date, '%Y-%m-%d').date()
-        except ValueError:
-            to_date = timezone.now().date()
+    from_date, to_date = parse_report_period(request)
+    employee_id = parse_report_id(request.GET.get('employee'))
+    currency_id = parse_report_id(request.GET.get('currency'))
     
     # Фильтруем операции по подотчетным средствам
     transaction_types = [
@@ -227,31 +359,35 @@ def report_advance_operations(request):
         'advance_report', 'advance_return_report', 'advance_additional'
     ]
     
-    transactions = Transaction.objects.filter(
-        date__date__gte=from_date,
-        date__date__lte=to_date,
-        transaction_type__in=transaction_types
+    transactions = period_transactions(
+        from_date, to_date, currency_id=currency_id, employee_id=employee_id, transaction_types=transaction_types
     )
     
-    if employee_id:
-        transactions = transactions.filter(employee_id=employee_id)
-    if currency_id:
-        transactions = transactions.filter(currency_id=currency_id)
+    # Выгрузка всех операций отчета в CSV (потоком, без разбиения на страницы)
+    if request.GET.get('format') == 'csv':
+        return transactions_csv_response(transactions, 'advance_operations.csv')
     
+    # Загружаются только поля, выводимые в таблице отчета; сумма расхода по модулю - из базы данных
     transactions = transactions.select_related(
-        'employee', 'currency', 'advance_payment',
-        'advance_report', 'advance_return', 'additional_advance_payment'
-    ).order_by('date')
+        'employee', 'currency', 'advance_payment', 'advance_report', 'advance_return'
+    ).only(
+        'date', 'amount', 'description', 'currency__code',
+        'employee__last_name', 'employee__first_name', 'employee__middle_name',
+        'advance_payment__number', 'advance_report__number', 'advance_return__number',
+    ).annotate(abs_amount=Abs('amount')).order_by('date', 'pk')
+    page_obj, page_query = paginate_report(request, transactions)
     
     context = {
         'title': 'Касса по дням',
         'from_date': from_date,
         'to_date': to_date,
-        'transactions': transactions,
-        'employees': Employee.objects.filter(is_active=True),
-        'currencies': Currency.objects.filter(is_active=True),
-        'selected_employee': int(employee_id) if employee_id else None,
-        'selected_currency': int(currency_id) if currency_id else None,
+        'transactions': page_obj.object_list,
+        'page_obj': page_obj,
+        'page_query': page_query,
+        'employees': get_active_references(Employee),
+        'currencies': get_active_references(Currency),
+        'selected_employee': employee_id,
+        'selected_currency': currency_id,
     }
     return render(request, 'accounting/reports/advance_operations.html', context)
 
@@ -259,60 +395,23 @@ def report_advance_operations(request):
 @staff_member_required
 def report_expenses_by_items(request):
     """Отчет «Расход денежных средств по статьям»"""
-    from_date = request.GET.get('from_date')
-    to_date = request.GET.get('to_date')
-    cash_register_id = request.GET.get('cash_register')
-    currency_id = request.GET.get('currency')
-    
-    # Устанавливаем значения по умолчанию
-    if not from_date:
-        from_date = (timezone.now() - timedelta(days=30)).date()
-    else:
-        try:
-            from_date = datetime.strptime(from_date, '%Y-%m-%d').date()
-        except ValueError:
-            from_date = (timezone.now() - timedelta(days=30)).date()
+    from_date, to_date = parse_report_period(request)
+    cash_register_id = parse_report_id(request.GET.get('cash_register'))
+    currency_id = parse_report_id(request.GET.get('currency'))
     
-    if not to_date:
-        to_date = timezone.now().date()
-    else:
-        try:
-            to_date = datetime.strptime(to_date, '%Y-%m-%d').date()
-        except ValueError:
-            to_date = timezone.now().date()
-    
-    # Получаем строки авансовых отчетов за период
-    from django.db.models import Sum, Q
-    from collections import defaultdict
-    
-    report_items = AdvanceReportItem.objects.filter(
-        report__date__date__gte=from_date,
-        report__date__date__lte=to_date,
-        report__status='confirmed',
-        report__is_deleted=False
+    items_data = get_cached_report_data(
+        'expenses_by_items', (from_date, to_date, cash_register_id, currency_id),
+        lambda: build_expenses_by_items(from_date, to_date, cash_register_id, currency_id)
     )
     
-    if cash_register_id:
-        report_items = report_items.filter(report__advance_payment__cash_register_id=cash_register_id)
-    if currency_id:
-        report_items = report_items.filter(report__currency_id=currency_id)
-    
-    # Группируем по статьям расходов
-    items_data = defaultdict(lambda: {'items': [], 'total': Decimal('0.00')})
-    
-    for item in report_items.select_related('item', 'report', 'report__advance_payment'):
-        expense_item = item.item
-        items_data[expense_item]['items'].append(item)
-        items_data[expense_item]['total'] += item.amount
-    
     context = {
         'title': 'Расход денежных средств по статьям',
         'from_date': from_date,
         'to_date': to_date,
-        'items_data': dict(items_data),
-        'cash_registers': CashRegister.objects.filter(is_active=True),
-        'currencies': Currency.objects.filter(is_active=True),
-        'selected_cash_register': int(cash_register_id) if cash_register_id else None,
-        'selected_currency': int(currency_id) if currency_id else None,
+        'items_data': items_data,
+        'cash_registers': get_active_references(CashRegister),
+        'currencies': get_active_references(Currency),
+        'selected_cash_register': cash_register_id,
+        'selected_currency': currency_id,
     }
     return render(request, 'accounting/reports/expenses_by_items.html', context)
@@ -144,6 +144,42 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Общий кэш для всех процессов приложения (несколько worker-ов Gunicorn) задается CACHE_URL:
+# redis://host:6379/0 (нужен пакет redis) или memcached://host:11211 (нужен пакет pymemcache).
+# Без CACHE_URL используется локальный кэш в памяти процесса: он не виден другим worker-ам,
+# поэтому кэширование справочников и отчетов в этом случае отключается (см. accounting.signals)
+CACHE_URL = os.getenv('CACHE_URL', '')
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL.removeprefix('memcached://'),
+        }
+    }
+elif CACHE_URL:
+    raise ValueError(
+        f"Неподдерживаемый CACHE_URL: {CACHE_URL}. "
+        f"Укажите redis://host:port/db или memcached://host:port"
+    )
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 